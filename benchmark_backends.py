@@ -0,0 +1,48 @@
+import argparse
+import dataclasses
+import time
+
+from ecosystem_simulation.simulator import ArrayEcosystemSimulator, EcosystemSimulator, SimulationOptions
+from ecosystem_simulation.simulator.random_stream import RandomStreamMode
+
+BACKENDS = {
+    "object": EcosystemSimulator,
+    "array": ArrayEcosystemSimulator,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark simulation throughput of the simulator backends.")
+    parser.add_argument("--options", type=str, default="optimization_results/best_20250116-224426_5000.json", help="Simulation options to run.")
+    parser.add_argument("--ticks", type=int, default=300, help="Number of ticks to simulate.")
+    parser.add_argument("--backends", type=str, nargs="*", default=list(BACKENDS), choices=list(BACKENDS), help="Backends to compare.")
+    parser.add_argument("--random-stream", type=str, default=RandomStreamMode.COMPAT.name, choices=[mode.name for mode in RandomStreamMode], help="Random stream of the object backend.")
+    parser.add_argument("--profile", type=str, default=None, help="Profile the phases of the object backend, and export the tick profiles to this file (.csv or JSON lines).")
+    args = parser.parse_args()
+
+    opts = dataclasses.replace(SimulationOptions.from_json_file(args.options), random_stream=RandomStreamMode[args.random_stream])
+    for name in args.backends:
+        time_before = time.perf_counter()
+        simulator = BACKENDS[name](opts)
+        init_time = time.perf_counter() - time_before
+        profiler = simulator.enable_profiling() if args.profile is not None and isinstance(simulator, EcosystemSimulator) else None
+
+        creature_ticks = 0
+        time_before = time.perf_counter()
+        for _ in range(args.ticks):
+            state = simulator.next_simulation_tick().state
+            creature_ticks += state.predator_count() + state.prey_count()
+        run_time = time.perf_counter() - time_before
+
+        print(
+            f"{name:>6}: init {init_time * 1e3:8.1f} ms, {run_time / args.ticks * 1e3:8.2f} ms per tick, "
+            f"{creature_ticks / run_time:10.0f} creature updates/s, "
+            f"final predators {state.predator_count()}, prey {state.prey_count()}, food {state.food_count()}"
+        )
+        if profiler is not None:
+            print(profiler.format_summary())
+            profiler.export(args.profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import random
+import time
+from sys import maxsize
+
+import numpy as np
+
+from ecosystem_simulation.simulator import EcosystemSimulator, SimulationOptions
+from ecosystem_simulation.simulator.fuzzy_logic import FuzzyDecisionTable, FuzzyStateController, fuzzy_inputs
+
+
+def sample_decision_inputs(opts: SimulationOptions, count: int, seed: int) -> list[list[float]]:
+    """
+    Builds fuzzy system inputs from creatures of a freshly initialized simulation, with random target distances.
+    """
+    rng = random.Random(seed)
+    state = EcosystemSimulator(opts)._current_state
+    creatures = list(state.predators()) + list(state.prey())
+
+    def random_distance(vision: int) -> float:
+        return rng.choice([maxsize, 0, rng.uniform(0, vision * 1.5)])
+
+    inputs = []
+    for _ in range(count):
+        creature = rng.choice(creatures)
+        vision = max(1, round(creature.genes.vision * opts.max_vision_distance))
+        inputs.append(fuzzy_inputs(creature, vision, random_distance(vision), random_distance(vision)))
+    return inputs
+
+
+def time_per_decision(func, inputs: list[list[float]]) -> float:
+    time_before = time.perf_counter()
+    for row in inputs:
+        func(row)
+    return (time.perf_counter() - time_before) / len(inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy state decisions.")
+    parser.add_argument("--options", type=str, default="optimization_results/best_20250116-224426_5000.json", help="Simulation options used to sample creatures.")
+    parser.add_argument("--decisions", type=int, default=2000, help="Number of decisions to time.")
+    parser.add_argument("--table-resolutions", type=int, nargs="*", default=[16, 32, 64, 128], help="Decision table resolutions to compare with exact inference.")
+    args = parser.parse_args()
+
+    inputs = sample_decision_inputs(SimulationOptions.from_json_file(args.options), args.decisions, seed=0)
+    controller = FuzzyStateController()
+
+    # Rebuilding the whole system is slow, so only a fraction of the decisions is timed
+    rebuilt = time_per_decision(lambda row: FuzzyStateController().reference_output(row), inputs[:max(1, len(inputs) // 50)])
+    reference = time_per_decision(controller.reference_output, inputs[:max(1, len(inputs) // 10)])
+    compiled = time_per_decision(controller.output, inputs)
+
+    matrix = np.array(inputs)
+    time_before = time.perf_counter()
+    batch_outputs = controller.batch_outputs(matrix)
+    batched = (time.perf_counter() - time_before) / len(inputs)
+
+    mismatches = sum(controller.output(row) != controller.reference_output(row) for row in inputs)
+    batch_mismatches = sum(
+        not (output == batch_output or (output is None and np.isnan(batch_output)))
+        for output, batch_output in zip((controller.output(row) for row in inputs), batch_outputs.tolist())
+    )
+
+    print(f"Rebuilt skfuzzy system per decision: {rebuilt * 1e6:10.1f} us")
+    print(f"Cached skfuzzy system:               {reference * 1e6:10.1f} us ({rebuilt / reference:.1f}x)")
+    print(f"Compiled controller:                 {compiled * 1e6:10.1f} us ({rebuilt / compiled:.1f}x)")
+    print(f"Batched controller ({len(inputs)} rows):  {batched * 1e6:10.1f} us ({rebuilt / batched:.1f}x)")
+    print(f"Outputs differing from skfuzzy: {mismatches}/{len(inputs)}")
+    print(f"Batched outputs differing from compiled: {batch_mismatches}/{len(inputs)}")
+
+    for resolution in args.table_resolutions:
+        time_before = time.perf_counter()
+        table = FuzzyDecisionTable(controller, resolution)
+        load_time = time.perf_counter() - time_before
+
+        time_before = time.perf_counter()
+        table.batch_outputs(matrix)
+        tabulated = (time.perf_counter() - time_before) / len(inputs)
+
+        accuracy = table.accuracy_report(matrix)
+        print(
+            f"Table {resolution:4d}: load/build {load_time:6.2f} s, {tabulated * 1e6:6.2f} us per decision, "
+            f"same state {accuracy.state_agreement * 100:7.3f}%, "
+            f"output error max {accuracy.max_abs_error:.4f} mean {accuracy.mean_abs_error:.5f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import dataclasses
+import random
+import time
+
+from ecosystem_simulation.simulation_optimizer import (
+    EvaluationPool, TPESampler, UniformSampler, parameter_search, robust_evaluate, successive_halving,
+)
+from ecosystem_simulation.simulator import SimulationOptions
+
+
+def perturb(base: SimulationOptions, rng: random.Random, seed: int, world_size: int) -> SimulationOptions:
+    """
+    A candidate around `base`, so that candidates survive for different numbers of ticks.
+    """
+    def entity(opts):
+        return dataclasses.replace(
+            opts,
+            satiation_per_feeding=opts.satiation_per_feeding * rng.uniform(0.6, 1.4),
+            satiation_loss_per_tick=opts.satiation_loss_per_tick * rng.uniform(0.6, 1.4),
+        )
+
+    return dataclasses.replace(
+        base,
+        randomness_seed=seed,
+        world_width=world_size,
+        world_height=world_size,
+        food_item_spawning_rate_per_tick=base.food_item_spawning_rate_per_tick * rng.uniform(0.6, 1.4),
+        predator=entity(base.predator),
+        prey=entity(base.prey),
+    )
+
+
+def compare_halving(args):
+    base = SimulationOptions.from_json_file(args.options)
+    rng = random.Random(1)
+    candidates = [perturb(base, rng, i, args.world_size) for i in range(args.candidates)]
+
+    time_before = time.perf_counter()
+    ticks = 0
+    survivors = 0
+    with EvaluationPool(args.workers) as pool:
+        for evaluation in pool.evaluate((options, args.max_ticks) for options in candidates):
+            ticks += evaluation.ticks
+            survivors += evaluation.survived
+    full_time = time.perf_counter() - time_before
+    print(f"        full: {survivors} of {len(candidates)} survive {args.max_ticks} ticks, {ticks} ticks simulated in {full_time:.1f} s")
+
+    time_before = time.perf_counter()
+    best = successive_halving(len(candidates), args.max_ticks, args.eta, workers=args.workers, candidates=candidates, save_best=False)
+    halving_time = time.perf_counter() - time_before
+    print(f"successive halving: best seed {best.randomness_seed} in {halving_time:.1f} s ({full_time / halving_time:.1f}x faster)")
+
+
+def compare_search(args):
+    """
+    Time and simulations until a sampler finds options surviving `max_ticks`, on a budget of
+    `simulations` simulations, for `repeats` seeds of each sampler.
+    """
+    results = {}
+    for name, sampler in (("random", UniformSampler), ("tpe", TPESampler)):
+        for seed in range(args.repeats):
+            time_before = time.perf_counter()
+            progress = {"count": 0, "best": 0, "found": None}
+
+            def on_evaluation(evaluation):
+                progress["count"] += 1
+                progress["best"] = max(progress["best"], evaluation.score)
+                if progress["found"] is None and evaluation.score >= args.max_ticks:
+                    progress["found"] = (time.perf_counter() - time_before, progress["count"])
+
+            parameter_search(sampler(seed=seed), args.simulations, args.max_ticks, args.workers, world_size=args.world_size,
+                             seed=seed, target_score=args.max_ticks, save_best=False, on_evaluation=on_evaluation)
+            results.setdefault(name, []).append(progress)
+
+    for name, runs in results.items():
+        for seed, progress in enumerate(runs):
+            found = progress["found"]
+            if found is None:
+                print(f"{name:>6} seed {seed}: not found in {progress['count']} simulations, best {progress['best']} ticks")
+            else:
+                print(f"{name:>6} seed {seed}: {args.max_ticks} ticks after {found[0]:.1f} s, {found[1]} simulations")
+
+
+def compare_replicates(args):
+    """
+    Scores the candidates over `replicates` seeds, with every replicate and with the
+    replicates that can not change the best candidate skipped. Candidates are seeded apart,
+    and again all with the same seed, so they are compared on the same replicate seeds.
+    """
+    base = SimulationOptions.from_json_file(args.options)
+    rng = random.Random(1)
+    candidates = [perturb(base, rng, i, args.world_size) for i in range(args.candidates)]
+    shared_seed = [dataclasses.replace(candidate, randomness_seed=base.randomness_seed) for candidate in candidates]
+
+    for seeds, group in (("distinct", candidates), ("shared", shared_seed)):
+        for name, keep in (("all", None), ("racing", 1)):
+            time_before = time.perf_counter()
+            scores = robust_evaluate(group, args.max_ticks, args.replicates, args.workers, keep=keep)
+            elapsed = time.perf_counter() - time_before
+            simulations = sum(len(score.scores) for score in scores)
+            best = scores[0]
+            print(f"{seeds:>8} seeds, {name:>6}: {simulations} of {len(group) * args.replicates} replicates in "
+                  f"{elapsed:.1f} s, best candidate {group.index(best.options)} {best.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare evaluating every candidate fully with successive halving, "
+                                                 "random search with model based search, or scoring candidates over seeds with and without racing.")
+    parser.add_argument("--compare", choices=("halving", "search", "replicates"), default="halving", help="What to compare.")
+    parser.add_argument("--options", type=str, default="optimization_results/best_20250116-224426_5000.json", help="Options the candidates are varied from (halving, replicates).")
+    parser.add_argument("--candidates", type=int, default=27, help="Number of candidates (halving, replicates).")
+    parser.add_argument("--replicates", type=int, default=8, help="Seeds every candidate is scored over (replicates).")
+    parser.add_argument("--max-ticks", type=int, default=None, help="Ticks a candidate has to survive (300 for halving and replicates, 5000 for search).")
+    parser.add_argument("--eta", type=int, default=3, help="Successive halving promotes 1 / eta of every rung.")
+    parser.add_argument("--simulations", type=int, default=2000, help="Budget of simulations of every search.")
+    parser.add_argument("--repeats", type=int, default=3, help="Searches per sampler, with different seeds.")
+    parser.add_argument("--world-size", type=int, default=None, help="World width and height of the candidates (128 for halving and replicates, 256 for search).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (all cores by default).")
+    args = parser.parse_args()
+
+    if args.compare in ("halving", "replicates"):
+        args.max_ticks = args.max_ticks if args.max_ticks is not None else 300
+        args.world_size = args.world_size if args.world_size is not None else 128
+        if args.compare == "halving":
+            compare_halving(args)
+        else:
+            compare_replicates(args)
+    else:
+        args.max_ticks = args.max_ticks if args.max_ticks is not None else 5000
+        args.world_size = args.world_size if args.world_size is not None else 256
+        compare_search(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import os
+import tempfile
+import time
+
+from ecosystem_simulation.simulation_player import PlayerMode, SimulationPlayer
+from ecosystem_simulation.simulation_recorder import SimulationRecorder
+from ecosystem_simulation.simulator import EcosystemSimulator, SimulationOptions
+
+
+def play(player: SimulationPlayer, ticks: int, frame_time: float, seek_every: int) -> list[float]:
+    """
+    Plays like the visualizer does: one `next_tick` per frame, `frame_time` of rendering in between.
+    Returns how long every `next_tick` call blocked.
+    """
+    stalls = []
+    for i in range(ticks):
+        if seek_every > 0 and i > 0 and i % seek_every == 0:
+            player.seek((player.tick * 7919 + 101) % max(player.tick_count(), 1))
+        time_before = time.perf_counter()
+        player.next_tick()
+        stalls.append(time.perf_counter() - time_before)
+        # Rendering, waiting for vsync
+        time.sleep(frame_time)
+    return stalls
+
+
+def summarize(stalls: list[float]) -> str:
+    ordered = sorted(stalls)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"mean {sum(stalls) / len(stalls) * 1e3:6.2f} ms, p99 {p99 * 1e3:6.2f} ms, max {ordered[-1] * 1e3:6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long SimulationPlayer.next_tick blocks the render thread.")
+    parser.add_argument("--options", type=str, default="optimization_results/best_20250116-224426_5000.json", help="Simulation options to run.")
+    parser.add_argument("--ticks", type=int, default=300, help="Number of ticks to record and play.")
+    parser.add_argument("--frame-time", type=float, default=1 / 60, help="Time spent rendering between two ticks.")
+    parser.add_argument("--seek-every", type=int, default=50, help="Seek to a random tick every this many ticks (recordings only, 0 disables).")
+    args = parser.parse_args()
+
+    opts = SimulationOptions.from_json_file(args.options)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.eesrec")
+        simulator = EcosystemSimulator(opts)
+        with SimulationRecorder(simulator, filename=path):
+            for _ in range(args.ticks):
+                simulator.next_simulation_tick()
+
+        for background in (False, True):
+            name = "prefetch" if background else "sync"
+            player = SimulationPlayer(PlayerMode.FILE, path, background=background)
+            stalls = play(player, args.ticks, args.frame_time, args.seek_every)
+            player.close()
+            print(f"    file {name:>8}: {summarize(stalls)}")
+
+    for background in (False, True):
+        name = "ahead" if background else "sync"
+        player = SimulationPlayer(PlayerMode.SIMULATOR, EcosystemSimulator(opts), background=background)
+        stalls = play(player, args.ticks // 3, args.frame_time * 2, 0)
+        player.close()
+        print(f"simulator {name:>8}: {summarize(stalls)}")
+
+
+if __name__ == '__main__':
+    main()
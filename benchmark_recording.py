@@ -0,0 +1,144 @@
+import argparse
+import dataclasses
+import json
+import os
+import random
+import tempfile
+import time
+
+from ecosystem_simulation.recording import Codec, RecordingReader, TickEncoder, write_recording
+from ecosystem_simulation.simulation_recorder import SimulationRecorder
+from ecosystem_simulation.simulator import EcosystemSimulator, SimulationOptions, SimulatedTick
+
+
+def json_tick(tick: SimulatedTick) -> dict:
+    """
+    A tick as the JSON recordings used to store it, one object per entity.
+    """
+    state = tick.state
+    return {
+        "tick_number": tick.tick_number,
+        "state": {
+            "predators": [dataclasses.asdict(c) for c in state.predators()],
+            "prey": [dataclasses.asdict(c) for c in state.prey()],
+            "food": [dataclasses.asdict(f) for f in state.food()],
+            "food_spawning_accumulator": state.food_spawning_accumulator,
+        },
+    }
+
+
+def read_times(reader: RecordingReader, random_order: list[int]) -> tuple[float, float]:
+    """
+    Mean time to decode a tick reading the recording sequentially and in `random_order`.
+    """
+    time_before = time.perf_counter()
+    for i in range(len(reader)):
+        reader.tick(i)
+    decode_time = (time.perf_counter() - time_before) / len(reader)
+
+    time_before = time.perf_counter()
+    for i in random_order:
+        reader.tick(i)
+    seek_time = (time.perf_counter() - time_before) / len(random_order)
+    return decode_time, seek_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare binary recordings (full snapshots and keyframes with deltas) with JSON recordings.")
+    parser.add_argument("--options", type=str, default="optimization_results/best_20250116-224426_5000.json", help="Simulation options to run.")
+    parser.add_argument("--ticks", type=int, default=1000, help="Number of ticks to record.")
+    parser.add_argument("--json-ticks", type=int, default=50, help="Number of evenly spread ticks written as JSON, the JSON size of all ticks is extrapolated from them.")
+    parser.add_argument("--stream-ticks", type=int, default=300, help="Number of ticks simulated with and without a streaming recorder.")
+    parser.add_argument("--keyframe-intervals", type=int, nargs="*", default=[1, 8, 32], help="Keyframe intervals to compare, 1 stores full snapshots only.")
+    parser.add_argument("--codecs", type=str, nargs="*", default=[c.name.lower() for c in Codec], choices=[c.name.lower() for c in Codec], help="Codecs to compare (on the last keyframe interval).")
+    args = parser.parse_args()
+
+    opts = SimulationOptions.from_json_file(args.options)
+    simulator = EcosystemSimulator(opts)
+
+    encoders = {k: TickEncoder(k) for k in args.keyframe_intervals}
+    chunks = {k: [] for k in args.keyframe_intervals}
+    encode_time = {k: 0.0 for k in args.keyframe_intervals}
+    json_size = 0
+    json_time = 0.0
+    json_every = max(1, args.ticks // args.json_ticks)
+    ticks = []
+    for i in range(args.ticks):
+        tick = simulator.next_simulation_tick()
+        for k, encoder in encoders.items():
+            time_before = time.perf_counter()
+            chunks[k].append(encoder.encode(tick))
+            encode_time[k] += time.perf_counter() - time_before
+        if i % json_every == 0:
+            time_before = time.perf_counter()
+            json_size += len(json.dumps(json_tick(tick)))
+            json_time += time.perf_counter() - time_before
+            ticks.append(tick)
+
+    json_estimate = json_size / len(ticks) * args.ticks
+    print(f"{args.ticks} ticks of {args.options}")
+    print(f"    json: {json_estimate / 2 ** 20:9.2f} MiB (extrapolated), encode {json_time / len(ticks) * 1e3:6.2f} ms/tick")
+
+    random_order = random.Random(1).sample(range(args.ticks), min(args.ticks, 200))
+    with tempfile.TemporaryDirectory() as tmp:
+        for k in args.keyframe_intervals:
+            path = os.path.join(tmp, f"recording_{k}.eesrec")
+            time_before = time.perf_counter()
+            write_recording(path, opts, chunks[k], k)
+            write_time = time.perf_counter() - time_before
+            size = os.path.getsize(path)
+
+            time_before = time.perf_counter()
+            reader = RecordingReader(path)
+            open_time = time.perf_counter() - time_before
+
+            decode_time, seek_time = read_times(reader, random_order)
+
+            # Decoded ticks hold the same entities
+            for tick in ticks:
+                decoded = reader.tick(tick.tick_number - 1).state.materialize()
+                for name in ("predators", "prey", "food"):
+                    assert sorted(map(dataclasses.astuple, getattr(decoded, name)())) == sorted(map(dataclasses.astuple, getattr(tick.state, name)())), name
+
+            name = "snapshot" if k == 1 else f"K={k}"
+            print(f"{name:>8}: {size / 2 ** 20:9.2f} MiB ({json_estimate / size:6.1f}x smaller), encode {encode_time[k] / args.ticks * 1e3:6.2f} ms/tick, "
+                  f"write {write_time * 1e3:7.1f} ms, open {open_time * 1e3:6.1f} ms, "
+                  f"sequential {decode_time * 1e3:6.2f} ms/tick, random {seek_time * 1e3:6.2f} ms/tick")
+            reader.close()
+
+        k = args.keyframe_intervals[-1]
+        raw_size = sum(map(len, chunks[k]))
+        for name in args.codecs:
+            path = os.path.join(tmp, f"recording_{name}.eesrec")
+            time_before = time.perf_counter()
+            write_recording(path, opts, chunks[k], k, Codec[name.upper()])
+            write_time = time.perf_counter() - time_before
+            size = os.path.getsize(path)
+            with RecordingReader(path) as reader:
+                decode_time, seek_time = read_times(reader, random_order)
+            print(f"{name:>8}: {size / 2 ** 20:9.2f} MiB ({raw_size / size:6.2f}x smaller, K={k}), write {raw_size / 2 ** 20 / write_time:7.1f} MiB/s, "
+                  f"sequential {decode_time * 1e3:6.2f} ms/tick, random {seek_time * 1e3:6.2f} ms/tick")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        times = {}
+        for name in ["none", "memory", "streaming"] + [f"streaming {codec}" for codec in args.codecs if codec != "none"]:
+            simulator = EcosystemSimulator(opts)
+            recorder = None
+            if name == "memory":
+                recorder = SimulationRecorder(simulator)
+            elif name.startswith("streaming"):
+                codec = Codec[name.split(" ")[-1].upper()] if " " in name else Codec.NONE
+                recorder = SimulationRecorder(simulator, filename=os.path.join(tmp, "streamed.eesrec"), codec=codec)
+            time_before = time.perf_counter()
+            for _ in range(args.stream_ticks):
+                simulator.next_simulation_tick()
+            if name == "memory":
+                recorder.save(os.path.join(tmp, "saved.eesrec"))
+            elif recorder is not None:
+                recorder.close()
+            times[name] = (time.perf_counter() - time_before) / args.stream_ticks
+    print(f"simulating {args.stream_ticks} ticks: " + ", ".join(f"{name} {t * 1e3:6.2f} ms/tick" for name, t in times.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import glob
+import time
+from collections import defaultdict
+from sys import getsizeof
+
+from ecosystem_simulation.simulator import EcosystemSimulator, SimulationOptions
+from ecosystem_simulation.simulator.models import SimulationState, SpatialIndex, WorldPosition
+
+
+def legacy_index(index: SpatialIndex) -> defaultdict:
+    """
+    Copies the index into the `defaultdict(list)` the simulation state used to keep.
+    """
+    legacy = defaultdict(list)
+    for pos, entities in index.items():
+        legacy[pos].extend(entities)
+    return legacy
+
+
+def legacy_iter_window(legacy: defaultdict, x0: int, x1: int, y0: int, y1: int):
+    # Probing the defaultdict inserts an empty list for every empty cell
+    for dx in range(x0, x1):
+        for dy in range(y0, y1):
+            for e in legacy[(dx, dy)]:
+                yield e
+
+
+def legacy_memory_usage(legacy: defaultdict) -> int:
+    return getsizeof(legacy) + sum(getsizeof(pos) + getsizeof(cell) for pos, cell in legacy.items())
+
+
+def vision_windows(state: SimulationState, opts: SimulationOptions) -> list[tuple[WorldPosition, tuple[int, int, int, int]]]:
+    """
+    The positions and windows scanned by one tick of creature decisions.
+    """
+    windows = []
+    for creature in list(state.predators()) + list(state.prey()):
+        vision = round(creature.genes.vision * opts.max_vision_distance)
+        pos = creature.position
+        windows.append((pos, (max(pos.x - vision, 0), min(pos.x + vision, state.grid_width),
+                              max(pos.y - vision, 0), min(pos.y + vision, state.grid_height))))
+    return windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory use and window queries of the spatial index.")
+    parser.add_argument("--options", type=str, nargs="*", default=sorted(glob.glob("optimization_results/*.json")), help="Simulation options to run.")
+    parser.add_argument("--ticks", type=int, default=50, help="Number of ticks to simulate before measuring.")
+    parser.add_argument("--query-ticks", type=int, default=10, help="Number of ticks worth of queries to run.")
+    args = parser.parse_args()
+
+    for options_file in args.options:
+        opts = SimulationOptions.from_json_file(options_file)
+        simulator = EcosystemSimulator(opts)
+        for _ in range(args.ticks):
+            state = simulator.next_simulation_tick().state
+
+        windows = vision_windows(state, opts)
+        print(f"{options_file} ({opts.world_width}x{opts.world_height}, {len(windows)} creatures, {state.food_count()} food)")
+        for name in ("food", "prey", "predator"):
+            index: SpatialIndex = getattr(state, f"{name}_by_position")
+            legacy = legacy_index(index)
+            index_memory = index.memory_usage()
+
+            time_before = time.perf_counter()
+            for _ in range(args.query_ticks):
+                for _, window in windows:
+                    for _ in index.iter_window(*window):
+                        pass
+            index_time = (time.perf_counter() - time_before) / (args.query_ticks * len(windows))
+
+            time_before = time.perf_counter()
+            for _ in range(args.query_ticks):
+                for pos, window in windows:
+                    index.nearest(pos, *window)
+            nearest_time = (time.perf_counter() - time_before) / (args.query_ticks * len(windows))
+
+            time_before = time.perf_counter()
+            for _ in range(args.query_ticks):
+                for _, window in windows:
+                    for _ in legacy_iter_window(legacy, *window):
+                        pass
+            legacy_time = (time.perf_counter() - time_before) / (args.query_ticks * len(windows))
+            # Measured after querying, as the queries grow the dict
+            legacy_memory = legacy_memory_usage(legacy)
+
+            print(
+                f"  {name:>8}: index {len(index):6d} cells {index_memory / 1024:8.1f} KiB {index_time * 1e6:7.1f} us/query {nearest_time * 1e6:7.1f} us/nearest | "
+                f"defaultdict {len(legacy):6d} cells {legacy_memory / 1024:8.1f} KiB {legacy_time * 1e6:7.1f} us/query"
+            )
+
+
+if __name__ == '__main__':
+    main()
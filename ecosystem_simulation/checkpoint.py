@@ -0,0 +1,99 @@
+"""
+Binary checkpoints of a running `EcosystemSimulator`, from which it resumes exactly.
+
+A checkpoint reuses the chunk framing and the snapshot encoding of recordings::
+
+    CHECKPOINT_MAGIC | u16 version | u32 header length | header (JSON)
+    RNG_CHUNK: the state of the random stream (see `RandomStream.getstate`)
+    TICK_CHUNK: the current state, as a full snapshot (see `encode_tick`)
+
+The header holds the simulation options, the tick number, the next entity id and the
+random stream mode. The snapshot stores the entities in the iteration order of the spatial
+indexes (not by id), and the state is rebuilt by adding them in that order, so a restored
+simulator visits cells and entities in the same order and continues bit for bit.
+"""
+import json
+import zlib
+from typing import Optional
+
+from ecosystem_simulation.recording import (
+    CHUNK_HEADER, FILE_HEADER, TICK_CHUNK, check_options, decode_tick, encode_chunk, encode_tick,
+)
+from ecosystem_simulation.simulator import EcosystemSimulator, SimulatedTick, SimulationOptions
+from ecosystem_simulation.simulator.random_stream import RandomStreamMode, create_random_stream
+
+CHECKPOINT_MAGIC = b"EESCKPT\x01"
+CHECKPOINT_VERSION = 1
+RNG_CHUNK = b"RNGS"
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def encode_checkpoint(simulator: EcosystemSimulator) -> bytes:
+    options = simulator.options
+    check_options(options)
+    tick_number = simulator._current_tick_number
+    header = json.dumps({
+        "options": options.serialize(),
+        "tick_number": tick_number,
+        "entity_id_generator": simulator._entity_id_generator,
+        "random_stream": int(simulator._rng.mode),
+    }).encode("utf-8")
+    return b"".join((
+        FILE_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(header)),
+        header,
+        encode_chunk(RNG_CHUNK, tick_number, simulator._rng.getstate()),
+        encode_tick(SimulatedTick(tick_number=tick_number, state=simulator._current_state)),
+    ))
+
+
+def _read_chunk(data: bytes, offset: int, tag: bytes) -> tuple[bytes, int]:
+    if offset + CHUNK_HEADER.size > len(data):
+        raise CheckpointError("Truncated checkpoint")
+    chunk_tag, _, length, crc = CHUNK_HEADER.unpack_from(data, offset)
+    start = offset + CHUNK_HEADER.size
+    payload = data[start:start + length]
+    if chunk_tag != tag or len(payload) != length or zlib.crc32(payload) != crc:
+        raise CheckpointError("Corrupt checkpoint")
+    return payload, start + length
+
+
+def decode_checkpoint(data: bytes, options: Optional[SimulationOptions] = None) -> EcosystemSimulator:
+    """
+    Restores a simulator, with `options` instead of the saved ones if given.
+    The random stream continues in the saved mode and the world size can not change.
+    """
+    if len(data) < FILE_HEADER.size:
+        raise CheckpointError("Not a checkpoint (file too short)")
+    magic, version, length = FILE_HEADER.unpack_from(data, 0)
+    if magic != CHECKPOINT_MAGIC:
+        raise CheckpointError("Not a checkpoint (bad magic)")
+    if version != CHECKPOINT_VERSION:
+        raise CheckpointError(f"Unsupported checkpoint version {version}")
+    offset = FILE_HEADER.size + length
+    params = json.loads(data[FILE_HEADER.size:offset].decode("utf-8"))
+    saved_options = SimulationOptions.deserialize(params["options"])
+    if options is None:
+        options = saved_options
+    elif (options.world_width, options.world_height) != (saved_options.world_width, saved_options.world_height):
+        raise CheckpointError("A checkpoint can not be resumed with a different world size")
+
+    rng_state, offset = _read_chunk(data, offset, RNG_CHUNK)
+    payload, _ = _read_chunk(data, offset, TICK_CHUNK)
+    tick = decode_tick(payload, params["tick_number"], options)
+
+    rng = create_random_stream(0, RandomStreamMode(params["random_stream"]))
+    rng.setstate(rng_state)
+    return EcosystemSimulator.restore(options, tick.tick_number, tick.state.materialize(), rng, params["entity_id_generator"])
+
+
+def save_checkpoint(simulator: EcosystemSimulator, path: str):
+    with open(path, "wb") as f:
+        f.write(encode_checkpoint(simulator))
+
+
+def load_checkpoint(path: str, options: Optional[SimulationOptions] = None) -> EcosystemSimulator:
+    with open(path, "rb") as f:
+        return decode_checkpoint(f.read(), options)
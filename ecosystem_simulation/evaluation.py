@@ -0,0 +1,32 @@
+"""
+Results of simulating options, shared by the optimizer and its results store.
+"""
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from ecosystem_simulation.simulator import SimulationOptions
+
+
+@dataclass(slots=True, frozen=True)
+class Evaluation:
+    options: SimulationOptions
+    max_ticks: int
+    # Number of ticks both species survived
+    score: int
+    seconds: float
+    # Stopped by the time limit before reaching `max_ticks`
+    timed_out: bool = False
+    # Ticks simulated by this evaluation (resumed evaluations do not count the ticks before)
+    ticks: int = 0
+    # Predators and prey alive after the last simulated tick
+    populations: tuple[int, int] = (0, 0)
+    # Checkpoint (bytes or path) of a simulation that survived `max_ticks`, if one was requested
+    checkpoint: Optional[Union[bytes, str]] = None
+    # Taken from a results store instead of simulated
+    cached: bool = False
+    # The evaluation raised an exception, it is scored 0
+    failed: bool = False
+
+    @property
+    def survived(self) -> bool:
+        return self.score >= self.max_ticks
@@ -0,0 +1,844 @@
+"""
+Binary, column oriented recordings of simulations.
+
+A recording starts with a header holding the simulation options, followed by one chunk
+per recorded tick and, once the recording was closed, an index of the chunks::
+
+    MAGIC | u16 version | u32 header length | header (JSON)
+    chunk*: 4 byte tag | u32 tick number | u32 payload length | u32 payload CRC32 | payload
+    index chunk | u64 offset of the index chunk | INDEX_MAGIC
+
+Chunks are self-delimiting, so a recording that was never closed (for example because the
+simulation crashed) is read up to its last complete chunk.
+
+A tick payload stores the food spawning accumulator and the population counters, then
+the predators, the prey and the food as columns (one array per field, all little endian):
+
+- creatures: `u32 n`, `u32 number of partner gene rows`, then the columns of `CREATURE_COLUMNS`,
+  the `(n, len(GENE_FIELDS))` gene matrix and the partner genes of the rows flagged with
+  `PARTNER_GENES_FLAG` (other rows have none).
+- food: `u32 n`, then the columns of `FOOD_COLUMNS`.
+
+Such full snapshots (`TICK_CHUNK`) are only stored every `keyframe_interval` ticks (keyframes).
+The ticks in between are stored as deltas (`DELTA_CHUNK`) to the previous tick. Entities of
+both are ordered by id, and a delta payload stores, after the same accumulator and counters:
+
+- creatures: `u32 n of the previous tick`, `u32 number of births`, the bit mask of previous
+  rows that survived, the changes of every column of the survivors (see `_encode_column_delta`,
+  ages are predicted to grow by one), the changes of the genes and partner genes, and finally
+  the births as a full group.
+- food: the same, with the columns of `FOOD_COLUMNS`.
+
+A tick is rebuilt by applying the deltas following the closest keyframe before it.
+Values round trip exactly, decoded ticks hold a `ColumnarSimulationState`.
+
+The payloads of tick and delta chunks can be compressed with a `Codec` (named in the header).
+Every chunk is compressed on its own, so ticks are still read without reading their neighbours,
+and the CRC32 in the chunk header covers the stored (compressed) payload.
+"""
+import bz2
+import json
+import lzma
+import mmap
+import queue
+import struct
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Iterator, Optional, Union
+
+import numpy as np
+
+from ecosystem_simulation.simulator import SimulatedTick, SimulationOptions
+from ecosystem_simulation.simulator.models import (
+    ColumnarSimulationState, CreatureColumns, FoodColumns, PopulationCounters, SimulationState,
+)
+from ecosystem_simulation.simulator.models.columnar import GENE_FIELDS
+
+MAGIC = b"EESREC\x00\x01"
+FORMAT_VERSION = 4
+# Versions that can still be read, recordings before version 4 are never compressed
+SUPPORTED_VERSIONS = (3, 4)
+
+FILE_HEADER = struct.Struct("<8sHI")
+CHUNK_HEADER = struct.Struct("<4sIII")
+TICK_CHUNK = b"TICK"
+DELTA_CHUNK = b"DELT"
+# Payload: u32 n, then n u32 tick numbers, n u64 chunk offsets and n u8 keyframe flags
+INDEX_CHUNK = b"INDX"
+INDEX_TRAILER = struct.Struct("<Q8s")
+INDEX_MAGIC = b"EESRIDX\x00"
+
+# Default number of ticks from one keyframe to the next
+KEYFRAME_INTERVAL = 32
+
+# Number of encoded chunks waiting for the background writer before `write_tick` blocks
+WRITER_QUEUE_SIZE = 64
+
+# Number of threads compressing (or decompressing) chunks
+COMPRESSION_THREADS = 4
+
+# Food spawning accumulator, then births, deaths, total births and total deaths of predators, prey and food
+TICK_HEADER = struct.Struct("<d12Q")
+GROUP_HEADER = struct.Struct("<II")
+FOOD_GROUP_HEADER = struct.Struct("<I")
+
+# On disk type of every column, in the order they are stored
+CREATURE_COLUMNS = (
+    ("id", "<u4"),
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("age_ticks", "<u4"),
+    ("generation", "<u4"),
+    ("satiation", "<f8"),
+    ("reproductive_urge", "<f8"),
+    ("move_accum", "<f8"),
+    ("flags", "u1"),
+    ("pregnant_duration", "<f8"),
+    ("state_kind", "i1"),
+    ("state_target", "<i4"),
+    ("state_dir_x", "i1"),
+    ("state_dir_y", "i1"),
+)
+FOOD_COLUMNS = (
+    ("id", "<u4"),
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("age_ticks", "<u4"),
+)
+GENES_DTYPE = np.dtype("<f8")
+
+# How the changes of a column are stored in a delta: no changes, all rows (values only),
+# or a bit mask of the changed rows followed by their values
+COLUMN_UNCHANGED = 0
+COLUMN_ALL = 1
+COLUMN_MASKED = 2
+
+# Recording only bit of the creature flags, set on rows that have partner genes
+PARTNER_GENES_FLAG = 0x80
+
+# Largest world and entity ids the column types can hold (creatures can be born one cell outside of the world)
+MAX_WORLD_SIZE = (1 << 15) - 1
+MAX_ENTITY_ID = (1 << 32) - 1
+
+
+class RecordingError(Exception):
+    pass
+
+
+class Codec(IntEnum):
+    NONE = 0
+    ZLIB = 1
+    LZMA = 2
+    BZ2 = 3
+
+
+# The codecs release the GIL, so chunks are compressed in parallel on a thread pool
+_COMPRESS = {
+    Codec.ZLIB: zlib.compress,
+    Codec.LZMA: lzma.compress,
+    Codec.BZ2: bz2.compress,
+}
+_DECOMPRESS = {
+    Codec.ZLIB: zlib.decompress,
+    Codec.LZMA: lzma.decompress,
+    Codec.BZ2: bz2.decompress,
+}
+
+
+@dataclass(slots=True, frozen=True)
+class RecordingHeader:
+    options: SimulationOptions
+    keyframe_interval: int = KEYFRAME_INTERVAL
+    codec: Codec = Codec.NONE
+    version: int = FORMAT_VERSION
+
+    def encode(self) -> bytes:
+        header = json.dumps({
+            "options": self.options.serialize(),
+            "keyframe_interval": self.keyframe_interval,
+            "codec": int(self.codec),
+        }).encode("utf-8")
+        return FILE_HEADER.pack(MAGIC, self.version, len(header)) + header
+
+    @staticmethod
+    def decode(data: Union[bytes, memoryview]) -> tuple["RecordingHeader", int]:
+        """
+        Returns the header and the offset of the first chunk.
+        """
+        if len(data) < FILE_HEADER.size:
+            raise RecordingError("Not a recording (file too short)")
+        magic, version, length = FILE_HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise RecordingError("Not a recording (bad magic)")
+        if version not in SUPPORTED_VERSIONS:
+            raise RecordingError(f"Unsupported recording version {version}")
+        end = FILE_HEADER.size + length
+        params = json.loads(bytes(data[FILE_HEADER.size:end]).decode("utf-8"))
+        return RecordingHeader(
+            options=SimulationOptions.deserialize(params["options"]),
+            keyframe_interval=params.get("keyframe_interval", 1),
+            codec=Codec(params.get("codec", Codec.NONE)),
+            version=version,
+        ), end
+
+
+def state_columns(state: Union[SimulationState, ColumnarSimulationState]) -> tuple[CreatureColumns, CreatureColumns, FoodColumns]:
+    if isinstance(state, ColumnarSimulationState):
+        return state.predator_columns, state.prey_columns, state.food_columns
+    return (
+        CreatureColumns.from_creatures(list(state.predators())),
+        CreatureColumns.from_creatures(list(state.prey())),
+        FoodColumns.from_food(list(state.food())),
+    )
+
+
+def _check_ids(ids: np.ndarray):
+    if len(ids) > 0 and (ids.min() < 0 or ids.max() > MAX_ENTITY_ID):
+        raise RecordingError("Entity id does not fit into a recording")
+
+
+def _encode_creatures(columns: CreatureColumns, parts: list[bytes]):
+    _check_ids(columns.id)
+    has_partner = ~np.isnan(columns.partner_genes[:, 0])
+    parts.append(GROUP_HEADER.pack(len(columns), int(has_partner.sum())))
+    for name, dtype in CREATURE_COLUMNS:
+        values = getattr(columns, name)
+        if name == "flags":
+            values = values | (has_partner * PARTNER_GENES_FLAG).astype(np.uint8)
+        parts.append(values.astype(dtype).tobytes())
+    parts.append(columns.genes.astype(GENES_DTYPE).tobytes())
+    parts.append(columns.partner_genes[has_partner].astype(GENES_DTYPE).tobytes())
+
+
+def _encode_food(columns: FoodColumns, parts: list[bytes]):
+    _check_ids(columns.id)
+    parts.append(FOOD_GROUP_HEADER.pack(len(columns)))
+    for name, dtype in FOOD_COLUMNS:
+        parts.append(getattr(columns, name).astype(dtype).tobytes())
+
+
+def _encode_tick_header(state: Union[SimulationState, ColumnarSimulationState]) -> bytes:
+    counters = []
+    for c in (state.predator_counters, state.prey_counters, state.food_counters):
+        counters += [c.births, c.deaths, c.total_births, c.total_deaths]
+    return TICK_HEADER.pack(state.food_spawning_accumulator, *counters)
+
+
+def encode_tick(tick: SimulatedTick) -> bytes:
+    """
+    Encodes a tick into a full snapshot chunk (including the chunk header).
+    """
+    predators, prey, food = state_columns(tick.state)
+    parts = [_encode_tick_header(tick.state)]
+    _encode_creatures(predators, parts)
+    _encode_creatures(prey, parts)
+    _encode_food(food, parts)
+    return encode_chunk(TICK_CHUNK, tick.tick_number, b"".join(parts))
+
+
+def _pack_mask(mask: np.ndarray) -> bytes:
+    return np.packbits(mask, bitorder="little").tobytes()
+
+
+def _changed_rows(previous: np.ndarray, current: np.ndarray) -> np.ndarray:
+    if previous.dtype.kind == "f":
+        # NaN marks missing partner genes
+        same = (previous == current) | (np.isnan(previous) & np.isnan(current))
+    else:
+        same = previous == current
+    if same.ndim == 2:
+        same = same.all(axis=1)
+    return ~same
+
+
+def _encode_column_delta(previous: np.ndarray, current: np.ndarray, dtype: Union[str, np.dtype], parts: list[bytes]):
+    """
+    Stores the rows of `current` that differ from `previous` (both hold the surviving rows).
+    """
+    changed = _changed_rows(previous, current)
+    n_changed = int(changed.sum())
+    if n_changed == 0:
+        parts.append(bytes((COLUMN_UNCHANGED,)))
+    elif n_changed == len(changed):
+        parts.append(bytes((COLUMN_ALL,)))
+        parts.append(current.astype(dtype).tobytes())
+    else:
+        parts.append(bytes((COLUMN_MASKED,)))
+        parts.append(_pack_mask(changed))
+        parts.append(current[changed].astype(dtype).tobytes())
+
+
+def _match_rows(previous_ids: np.ndarray, current_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the mask of previous rows that still exist, the current rows of those survivors
+    (in the previous order) and the current rows of the births (ordered by id).
+    """
+    order = np.argsort(current_ids, kind="stable")
+    sorted_ids = current_ids[order]
+    pos = np.minimum(np.searchsorted(sorted_ids, previous_ids), max(len(sorted_ids) - 1, 0))
+    alive = (sorted_ids[pos] == previous_ids) if len(sorted_ids) > 0 else np.zeros(len(previous_ids), dtype=bool)
+    survivors = order[pos[alive]]
+    born = np.ones(len(current_ids), dtype=bool)
+    born[survivors] = False
+    births = order[born[order]]
+    return alive, survivors, births
+
+
+def _encode_creature_delta(previous: CreatureColumns, current: CreatureColumns, parts: list[bytes]) -> CreatureColumns:
+    """
+    Encodes `current` relative to `previous`, returns `current` in the order the delta decodes to.
+    """
+    alive, survivors, births = _match_rows(previous.id, current.id)
+    parts.append(GROUP_HEADER.pack(len(previous), len(births)))
+    parts.append(_pack_mask(alive))
+    before = previous.take(alive)
+    after = current.take(survivors)
+    before.age_ticks += 1
+    for name, dtype in CREATURE_COLUMNS:
+        _encode_column_delta(getattr(before, name), getattr(after, name), dtype, parts)
+    _encode_column_delta(before.genes, after.genes, GENES_DTYPE, parts)
+    _encode_column_delta(before.partner_genes, after.partner_genes, GENES_DTYPE, parts)
+    born = current.take(births)
+    _encode_creatures(born, parts)
+    return CreatureColumns.concatenate([after, born])
+
+
+def _encode_food_delta(previous: FoodColumns, current: FoodColumns, parts: list[bytes]) -> FoodColumns:
+    alive, survivors, births = _match_rows(previous.id, current.id)
+    parts.append(GROUP_HEADER.pack(len(previous), len(births)))
+    parts.append(_pack_mask(alive))
+    before = previous.take(alive)
+    after = current.take(survivors)
+    before.age_ticks += 1
+    for name, dtype in FOOD_COLUMNS:
+        _encode_column_delta(getattr(before, name), getattr(after, name), dtype, parts)
+    born = current.take(births)
+    _encode_food(born, parts)
+    return FoodColumns.concatenate([after, born])
+
+
+class TickEncoder:
+    """
+    Encodes consecutive ticks into keyframes and deltas to the previous tick.
+    """
+    keyframe_interval: int
+    _previous: Optional[tuple[CreatureColumns, CreatureColumns, FoodColumns]]
+    _since_keyframe: int
+
+    def __init__(self, keyframe_interval: int = KEYFRAME_INTERVAL):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1")
+        self.keyframe_interval = keyframe_interval
+        self._previous = None
+        self._since_keyframe = 0
+
+    def encode(self, tick: SimulatedTick) -> bytes:
+        """
+        Encodes the tick following the previously encoded one into a chunk.
+        """
+        predators, prey, food = state_columns(tick.state)
+        parts = [_encode_tick_header(tick.state)]
+        if self._previous is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            predators = predators.take(np.argsort(predators.id, kind="stable"))
+            prey = prey.take(np.argsort(prey.id, kind="stable"))
+            food = food.take(np.argsort(food.id, kind="stable"))
+            _encode_creatures(predators, parts)
+            _encode_creatures(prey, parts)
+            _encode_food(food, parts)
+            tag = TICK_CHUNK
+            self._since_keyframe = 0
+        else:
+            previous_predators, previous_prey, previous_food = self._previous
+            predators = _encode_creature_delta(previous_predators, predators, parts)
+            prey = _encode_creature_delta(previous_prey, prey, parts)
+            food = _encode_food_delta(previous_food, food, parts)
+            tag = DELTA_CHUNK
+            self._since_keyframe += 1
+        self._previous = (predators, prey, food)
+        return encode_chunk(tag, tick.tick_number, b"".join(parts))
+
+
+def encode_chunk(tag: bytes, tick_number: int, payload: bytes) -> bytes:
+    return CHUNK_HEADER.pack(tag, tick_number, len(payload), zlib.crc32(payload)) + payload
+
+
+def compress_chunk(chunk: bytes, codec: Codec) -> bytes:
+    """
+    The chunk with its payload compressed.
+    """
+    if codec == Codec.NONE:
+        return chunk
+    tag, tick_number, _, _ = CHUNK_HEADER.unpack_from(chunk, 0)
+    return encode_chunk(tag, tick_number, _COMPRESS[codec](memoryview(chunk)[CHUNK_HEADER.size:]))
+
+
+def decompress_payload(payload: Union[bytes, memoryview], codec: Codec) -> Union[bytes, memoryview]:
+    if codec == Codec.NONE:
+        return payload
+    return _DECOMPRESS[codec](payload)
+
+
+class _PayloadReader:
+    __slots__ = ("data", "offset")
+
+    def __init__(self, data: Union[bytes, memoryview], offset: int = 0):
+        self.data = data
+        self.offset = offset
+
+    def unpack(self, s: struct.Struct) -> tuple:
+        values = s.unpack_from(self.data, self.offset)
+        self.offset += s.size
+        return values
+
+    def array(self, dtype: Union[str, np.dtype], count: int) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        values = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.offset)
+        self.offset += dtype.itemsize * count
+        return values
+
+    def byte(self) -> int:
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def mask(self, count: int) -> np.ndarray:
+        packed = self.array(np.uint8, (count + 7) // 8)
+        return np.unpackbits(packed, count=count, bitorder="little").view(bool)
+
+
+def _decode_creatures(reader: _PayloadReader) -> CreatureColumns:
+    n, n_partner = reader.unpack(GROUP_HEADER)
+    columns = CreatureColumns.empty(n)
+    for name, dtype in CREATURE_COLUMNS:
+        target = getattr(columns, name)
+        target[:] = reader.array(dtype, n)
+    has_partner = (columns.flags & PARTNER_GENES_FLAG) != 0
+    columns.flags &= ~np.uint8(PARTNER_GENES_FLAG)
+    columns.genes[:] = reader.array(GENES_DTYPE, n * len(GENE_FIELDS)).reshape(n, len(GENE_FIELDS))
+    columns.partner_genes[has_partner] = reader.array(GENES_DTYPE, n_partner * len(GENE_FIELDS)).reshape(n_partner, len(GENE_FIELDS))
+    return columns
+
+
+def _decode_food(reader: _PayloadReader) -> FoodColumns:
+    n, = reader.unpack(FOOD_GROUP_HEADER)
+    columns = FoodColumns.empty(n)
+    for name, dtype in FOOD_COLUMNS:
+        getattr(columns, name)[:] = reader.array(dtype, n)
+    return columns
+
+
+def _decode_tick_header(reader: _PayloadReader) -> tuple[float, list[PopulationCounters]]:
+    accumulator, *counters = reader.unpack(TICK_HEADER)
+    return accumulator, [PopulationCounters(*counters[i:i + 4]) for i in range(0, 12, 4)]
+
+
+def _columnar_state(options: SimulationOptions, accumulator: float, counters: list[PopulationCounters],
+                    predators: CreatureColumns, prey: CreatureColumns, food: FoodColumns) -> ColumnarSimulationState:
+    return ColumnarSimulationState(
+        grid_width=options.world_width,
+        grid_height=options.world_height,
+        predator_columns=predators,
+        prey_columns=prey,
+        food_columns=food,
+        food_max_age=options.food_item_life_tick,
+        food_spawning_accumulator=accumulator,
+        predator_counters=counters[0],
+        prey_counters=counters[1],
+        food_counters=counters[2],
+    )
+
+
+def decode_tick(payload: Union[bytes, memoryview], tick_number: int, options: SimulationOptions) -> SimulatedTick:
+    """
+    Decodes the payload of a full snapshot chunk.
+    """
+    reader = _PayloadReader(payload)
+    accumulator, counters = _decode_tick_header(reader)
+    predators = _decode_creatures(reader)
+    prey = _decode_creatures(reader)
+    food = _decode_food(reader)
+    return SimulatedTick(tick_number=tick_number, state=_columnar_state(options, accumulator, counters, predators, prey, food))
+
+
+def _apply_column_delta(reader: _PayloadReader, values: np.ndarray, dtype: Union[str, np.dtype]):
+    """
+    Applies the changes stored by `_encode_column_delta` to `values` (in place).
+    """
+    mode = reader.byte()
+    width = values.shape[1] if values.ndim == 2 else 1
+    if mode == COLUMN_ALL:
+        values[:] = reader.array(dtype, len(values) * width).reshape(values.shape)
+    elif mode == COLUMN_MASKED:
+        changed = reader.mask(len(values))
+        n_changed = int(changed.sum())
+        values[changed] = reader.array(dtype, n_changed * width).reshape((n_changed,) + values.shape[1:])
+    elif mode != COLUMN_UNCHANGED:
+        raise RecordingError(f"Unknown column delta {mode}")
+
+
+def _survivors(reader: _PayloadReader, n_previous: int, previous_len: int) -> np.ndarray:
+    if n_previous != previous_len:
+        raise RecordingError("Delta does not follow the previous tick")
+    return reader.mask(n_previous)
+
+
+def _apply_creature_delta(reader: _PayloadReader, previous: CreatureColumns) -> CreatureColumns:
+    n_previous, _ = reader.unpack(GROUP_HEADER)
+    columns = previous.take(_survivors(reader, n_previous, len(previous)))
+    columns.age_ticks += 1
+    for name, dtype in CREATURE_COLUMNS:
+        _apply_column_delta(reader, getattr(columns, name), dtype)
+    _apply_column_delta(reader, columns.genes, GENES_DTYPE)
+    _apply_column_delta(reader, columns.partner_genes, GENES_DTYPE)
+    return CreatureColumns.concatenate([columns, _decode_creatures(reader)])
+
+
+def _apply_food_delta(reader: _PayloadReader, previous: FoodColumns) -> FoodColumns:
+    n_previous, _ = reader.unpack(GROUP_HEADER)
+    columns = previous.take(_survivors(reader, n_previous, len(previous)))
+    columns.age_ticks += 1
+    for name, dtype in FOOD_COLUMNS:
+        _apply_column_delta(reader, getattr(columns, name), dtype)
+    return FoodColumns.concatenate([columns, _decode_food(reader)])
+
+
+def apply_delta(payload: Union[bytes, memoryview], tick_number: int, previous: ColumnarSimulationState, options: SimulationOptions) -> SimulatedTick:
+    """
+    Decodes the payload of a delta chunk following the tick holding `previous`.
+    `previous` is not modified.
+    """
+    reader = _PayloadReader(payload)
+    accumulator, counters = _decode_tick_header(reader)
+    predators = _apply_creature_delta(reader, previous.predator_columns)
+    prey = _apply_creature_delta(reader, previous.prey_columns)
+    food = _apply_food_delta(reader, previous.food_columns)
+    return SimulatedTick(tick_number=tick_number, state=_columnar_state(options, accumulator, counters, predators, prey, food))
+
+
+def tick_nbytes(tick: SimulatedTick) -> int:
+    """
+    Approximate memory held by a decoded tick (its columns).
+    """
+    state = tick.state
+    if not isinstance(state, ColumnarSimulationState):
+        return 0
+    return sum(
+        getattr(columns, name).nbytes
+        for columns in (state.predator_columns, state.prey_columns, state.food_columns)
+        for name in columns.__slots__
+    )
+
+
+def check_options(options: SimulationOptions):
+    if options.world_width > MAX_WORLD_SIZE or options.world_height > MAX_WORLD_SIZE:
+        raise RecordingError(f"Worlds larger than {MAX_WORLD_SIZE}x{MAX_WORLD_SIZE} can not be recorded")
+
+
+class RecordingWriter:
+    """
+    Appends encoded chunks to a recording file as they arrive.
+
+    With `background`, chunks are written by a writer thread from a queue of at most
+    `queue_size` chunks (`write_tick` blocks while it is full), so disk writes overlap the
+    simulation. Every chunk is flushed once written. `close` appends the index.
+    Ticks are stored as a keyframe every `keyframe_interval` ticks and deltas in between.
+
+    Chunks are compressed with `codec` by `compression_threads` threads (in the calling thread
+    if there are none) and written in order, at most `queue_size` chunks are compressed at once.
+    """
+    path: str
+    tick_numbers: list[int]
+    offsets: list[int]
+    keyframes: list[bool]
+
+    def __init__(self, path: str, options: SimulationOptions, background: bool = True, queue_size: int = WRITER_QUEUE_SIZE,
+                 keyframe_interval: int = KEYFRAME_INTERVAL, codec: Codec = Codec.NONE,
+                 compression_threads: int = COMPRESSION_THREADS):
+        check_options(options)
+        self.path = path
+        self.codec = codec
+        self.tick_numbers = []
+        self.offsets = []
+        self.keyframes = []
+        self._encoder = TickEncoder(keyframe_interval)
+        self._file = open(path, "wb")
+        self._file.write(RecordingHeader(options, keyframe_interval, codec).encode())
+        self._file.flush()
+        self._offset = self._file.tell()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if codec != Codec.NONE and compression_threads > 0:
+            self._executor = ThreadPoolExecutor(compression_threads, thread_name_prefix="RecordingCompressor")
+        # Chunks being compressed while writing without a writer thread, in order
+        self._pending: deque[Future] = deque()
+        self._queue_size = queue_size
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, name="RecordingWriter", daemon=True)
+            self._thread.start()
+
+    def write_tick(self, tick: SimulatedTick):
+        self.write_chunk(self._encoder.encode(tick))
+
+    def write_chunk(self, chunk: bytes):
+        """
+        Appends an encoded chunk, deltas have to follow the chunk of the previous tick.
+        """
+        self._raise_error()
+        if self._closed:
+            raise RecordingError("Recording is closed")
+        if self._executor is not None:
+            chunk = self._executor.submit(compress_chunk, chunk, self.codec)
+        else:
+            chunk = compress_chunk(chunk, self.codec)
+        if self._queue is not None:
+            self._queue.put(chunk)
+        elif isinstance(chunk, Future):
+            self._pending.append(chunk)
+            while len(self._pending) > self._queue_size or (len(self._pending) > 0 and self._pending[0].done()):
+                self._write(self._pending.popleft())
+        else:
+            self._write(chunk)
+
+    def _write(self, chunk: Union[bytes, Future]):
+        if isinstance(chunk, Future):
+            chunk = chunk.result()
+        tag, tick_number, _, _ = CHUNK_HEADER.unpack_from(chunk, 0)
+        self._file.write(chunk)
+        self._file.flush()
+        if tag == TICK_CHUNK or tag == DELTA_CHUNK:
+            self.tick_numbers.append(tick_number)
+            self.offsets.append(self._offset)
+            self.keyframes.append(tag == TICK_CHUNK)
+        self._offset += len(chunk)
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self._write(chunk)
+                except BaseException as e:
+                    # Reported to the simulation thread, the remaining chunks are dropped
+                    self._error = e
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RecordingError(f"Writing {self.path} failed") from self._error
+
+    def close(self):
+        """
+        Waits for all queued chunks to be written and appends the index.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+        try:
+            while len(self._pending) > 0:
+                self._write(self._pending.popleft())
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._raise_error()
+            n = len(self.offsets)
+            index = (
+                struct.pack("<I", n)
+                + np.array(self.tick_numbers, dtype="<u4").tobytes()
+                + np.array(self.offsets, dtype="<u8").tobytes()
+                + np.array(self.keyframes, dtype="u1").tobytes()
+            )
+            index_offset = self._offset
+            self._file.write(encode_chunk(INDEX_CHUNK, 0, index))
+            self._file.write(INDEX_TRAILER.pack(index_offset, INDEX_MAGIC))
+        finally:
+            self._file.close()
+
+    def __enter__(self) -> "RecordingWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def write_recording(path: str, options: SimulationOptions, chunks: list[bytes], keyframe_interval: int = KEYFRAME_INTERVAL,
+                    codec: Codec = Codec.NONE):
+    """
+    Writes a recording of already encoded tick chunks (of a `TickEncoder` with `keyframe_interval`).
+    """
+    with RecordingWriter(path, options, background=False, keyframe_interval=keyframe_interval, codec=codec) as writer:
+        for chunk in chunks:
+            writer.write_chunk(chunk)
+
+
+class RecordingReader:
+    """
+    Reads a recording. Ticks are decoded when they are requested.
+
+    The file is memory mapped, so opening a recording only reads its header and index,
+    and the operating system pages in the chunks of the decoded ticks. Closed recordings
+    are opened through their index. Otherwise the chunks are scanned, and the recording ends
+    at the first incomplete or corrupt chunk (`complete` is `False`).
+
+    Deltas are applied starting from the closest keyframe, or from the last decoded tick when
+    it lies in between, so decoding consecutive ticks only applies one delta per tick and
+    seeking applies fewer than `keyframe_interval` deltas. Only the last decoded tick is kept.
+    Compressed chunks needed for one tick are decompressed in parallel.
+    """
+    header: RecordingHeader
+    complete: bool
+    tick_numbers: np.ndarray
+    # Offset of the chunk of every tick
+    _offsets: np.ndarray
+    # Index of the keyframe every tick is rebuilt from
+    _keyframes: np.ndarray
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            if f.tell() < FILE_HEADER.size:
+                raise RecordingError("Not a recording (file too short)")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = memoryview(self._mmap)
+        self.header, self._first_chunk = RecordingHeader.decode(self._data)
+        self._last: Optional[tuple[int, SimulatedTick]] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if self.header.codec != Codec.NONE:
+            self._executor = ThreadPoolExecutor(COMPRESSION_THREADS, thread_name_prefix="RecordingDecompressor")
+        self.complete = self._read_index()
+        if not self.complete:
+            self._scan_chunks()
+
+    def _set_index(self, tick_numbers: np.ndarray, offsets: np.ndarray, keyframes: np.ndarray):
+        # Copied, so that no array refers to the mapped memory once the recording is closed
+        self.tick_numbers = tick_numbers.astype(np.int64)
+        self._offsets = offsets.astype(np.int64)
+        self._keyframes = np.maximum.accumulate(np.where(keyframes, np.arange(len(keyframes)), 0)) if len(keyframes) > 0 else np.zeros(0, dtype=np.int64)
+
+    def _read_index(self) -> bool:
+        data = self._data
+        if len(data) < self._first_chunk + INDEX_TRAILER.size:
+            return False
+        index_offset, magic = INDEX_TRAILER.unpack_from(data, len(data) - INDEX_TRAILER.size)
+        if magic != INDEX_MAGIC:
+            return False
+        payload = self._chunk_payload(index_offset, INDEX_CHUNK)
+        if payload is None:
+            return False
+        n, = struct.unpack_from("<I", payload, 0)
+        self._set_index(
+            np.frombuffer(payload, dtype="<u4", count=n, offset=4),
+            np.frombuffer(payload, dtype="<u8", count=n, offset=4 + 4 * n),
+            np.frombuffer(payload, dtype="u1", count=n, offset=4 + 12 * n) != 0,
+        )
+        return True
+
+    def _scan_chunks(self):
+        tick_numbers = []
+        offsets = []
+        keyframes = []
+        offset = self._first_chunk
+        while offset + CHUNK_HEADER.size <= len(self._data):
+            tag, tick_number, length, _ = CHUNK_HEADER.unpack_from(self._data, offset)
+            if self._chunk_payload(offset, tag) is None:
+                break
+            if tag == TICK_CHUNK or (tag == DELTA_CHUNK and len(offsets) > 0):
+                tick_numbers.append(tick_number)
+                offsets.append(offset)
+                keyframes.append(tag == TICK_CHUNK)
+            offset += CHUNK_HEADER.size + length
+        self._set_index(np.array(tick_numbers, dtype=np.int64), np.array(offsets, dtype=np.int64), np.array(keyframes, dtype=bool))
+
+    def _chunk_payload(self, offset: int, tag: bytes) -> Optional[memoryview]:
+        """
+        The payload of the chunk at `offset`, `None` if it is not a complete, valid chunk with the tag.
+        """
+        if offset < self._first_chunk or offset + CHUNK_HEADER.size > len(self._data):
+            return None
+        chunk_tag, _, length, crc = CHUNK_HEADER.unpack_from(self._data, offset)
+        start = offset + CHUNK_HEADER.size
+        if chunk_tag != tag or start + length > len(self._data):
+            return None
+        payload = self._data[start:start + length]
+        if zlib.crc32(payload) != crc:
+            return None
+        return payload
+
+    @property
+    def options(self) -> SimulationOptions:
+        return self.header.options
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def _chunk(self, index: int) -> tuple[int, Union[bytes, memoryview]]:
+        """
+        Tick number and (decompressed) payload of the `index`-th tick.
+        """
+        offset = int(self._offsets[index])
+        _, tick_number, length, _ = CHUNK_HEADER.unpack_from(self._data, offset)
+        start = offset + CHUNK_HEADER.size
+        return tick_number, decompress_payload(self._data[start:start + length], self.header.codec)
+
+    def _chunks(self, start: int, stop: int) -> Iterator[tuple[int, Union[bytes, memoryview]]]:
+        if self._executor is None or stop - start < 2:
+            return map(self._chunk, range(start, stop))
+        return self._executor.map(self._chunk, range(start, stop))
+
+    def keyframe_index(self, index: int) -> int:
+        """
+        Index of the closest keyframe at or before the `index`-th tick.
+        """
+        return int(self._keyframes[index])
+
+    def tick(self, index: int) -> SimulatedTick:
+        """
+        Decodes the `index`-th recorded tick.
+        """
+        if index < 0:
+            index += len(self._offsets)
+        if not 0 <= index < len(self._offsets):
+            raise IndexError("Tick index out of range")
+
+        keyframe = self.keyframe_index(index)
+        # Read once, the reader may be used from several threads
+        last = self._last
+        if last is not None and keyframe <= last[0] <= index:
+            (current, tick), chunks = last, self._chunks(last[0] + 1, index + 1)
+        else:
+            chunks = self._chunks(keyframe, index + 1)
+            tick_number, payload = next(chunks)
+            current, tick = keyframe, decode_tick(payload, tick_number, self.options)
+        for tick_number, payload in chunks:
+            current += 1
+            tick = apply_delta(payload, tick_number, tick.state, self.options)
+        self._last = (current, tick)
+        return tick
+
+    def __iter__(self) -> Iterator[SimulatedTick]:
+        for i in range(len(self)):
+            yield self.tick(i)
+
+    def close(self):
+        self._last = None
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._data.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "RecordingReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,206 @@
+"""
+Persistent store of optimizer evaluations and searches, in an SQLite database.
+
+Rows are only ever appended. The tables are:
+
+- `options`: the JSON of every evaluated `SimulationOptions`, by `options_hash` (the seed is
+  part of the options, so the hash identifies the simulation).
+- `evaluations`: one row per finished evaluation, with its options hash, tick budget, score,
+  simulated ticks, timing, final populations and the `SIMULATION_VERSION` it was simulated with.
+- `searches`: the sampler and settings of every named search.
+- `proposals`: the options a search proposed, in order, with the sampler state after proposing.
+- `results`: the scores told to a search's sampler, in the order they were told.
+
+Simulations are deterministic, so an evaluation of the same options and tick budget by the
+same simulation version that was not stopped by a time limit is reused instead of simulated
+again (see `ResultsStore.lookup`).
+A search resumes by telling its sampler the logged results, proposing the unfinished proposals
+again and continuing from the sampler state of its last proposal.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from ecosystem_simulation.evaluation import Evaluation
+from ecosystem_simulation.simulator import SIMULATION_VERSION, SimulationOptions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS options (
+    hash TEXT PRIMARY KEY,
+    json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY,
+    options_hash TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    max_ticks INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    timed_out INTEGER NOT NULL,
+    predators INTEGER NOT NULL,
+    prey INTEGER NOT NULL,
+    created REAL NOT NULL,
+    simulation_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS searches (
+    name TEXT PRIMARY KEY,
+    sampler TEXT NOT NULL,
+    max_ticks INTEGER NOT NULL,
+    world_size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS proposals (
+    search TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    vector TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    sampler_state TEXT NOT NULL,
+    seeds_state TEXT NOT NULL,
+    PRIMARY KEY (search, number)
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    search TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    score REAL NOT NULL
+);
+"""
+
+
+def options_hash(options: SimulationOptions) -> str:
+    """
+    SHA-256 of the canonical JSON of `options` (sorted keys, no whitespace).
+    """
+    return hashlib.sha256(_canonical_json(options).encode("utf-8")).hexdigest()
+
+
+def _canonical_json(options: SimulationOptions) -> str:
+    return json.dumps(options.serialize(), sort_keys=True, separators=(",", ":"))
+
+
+@dataclass(slots=True, frozen=True)
+class Proposal:
+    number: int
+    vector: list[float]
+    seed: int
+    # States of the sampler and of the seed generator after proposing
+    sampler_state: dict
+    seeds_state: list
+    # Score told to the sampler, `None` while unfinished
+    score: Optional[float] = None
+
+
+class ResultsStore:
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.executescript(SCHEMA)
+            # Stores created before versions were recorded, their evaluations count as version 0
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(evaluations)")]
+            if "simulation_version" not in columns:
+                self._db.execute("ALTER TABLE evaluations ADD COLUMN simulation_version INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS evaluations_version_key "
+                             "ON evaluations (options_hash, max_ticks, simulation_version)")
+
+    def lookup(self, options: SimulationOptions, max_ticks: int) -> Optional[Evaluation]:
+        """
+        A stored evaluation of `options` to `max_ticks` ticks by the current `SIMULATION_VERSION`,
+        that finished within its time limit.
+        """
+        row = self._db.execute(
+            "SELECT score, ticks, seconds, predators, prey FROM evaluations "
+            "WHERE options_hash = ? AND max_ticks = ? AND simulation_version = ? AND timed_out = 0 ORDER BY id LIMIT 1",
+            (options_hash(options), max_ticks, SIMULATION_VERSION),
+        ).fetchone()
+        if row is None:
+            return None
+        score, ticks, seconds, predators, prey = row
+        return Evaluation(options, max_ticks, score, seconds, ticks=ticks, populations=(predators, prey), cached=True)
+
+    def add(self, evaluation: Evaluation):
+        options = evaluation.options
+        key = options_hash(options)
+        with self._db:
+            self._db.execute("INSERT OR IGNORE INTO options VALUES (?, ?)", (key, _canonical_json(options)))
+            self._db.execute(
+                "INSERT INTO evaluations (options_hash, seed, max_ticks, score, ticks, seconds, timed_out, predators, prey, "
+                "created, simulation_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, options.randomness_seed, evaluation.max_ticks, evaluation.score, evaluation.ticks, evaluation.seconds,
+                 int(evaluation.timed_out), *evaluation.populations, time.time(), SIMULATION_VERSION),
+            )
+
+    def options(self, key: str) -> Optional[SimulationOptions]:
+        row = self._db.execute("SELECT json FROM options WHERE hash = ?", (key,)).fetchone()
+        return SimulationOptions.deserialize(json.loads(row[0])) if row is not None else None
+
+    def best(self, count: int = 10) -> list[tuple[int, int, SimulationOptions]]:
+        """
+        The `count` highest scores as `(score, max_ticks, options)`, one per options.
+        """
+        rows = self._db.execute(
+            "SELECT MAX(score), max_ticks, json FROM evaluations JOIN options ON options.hash = options_hash "
+            "GROUP BY options_hash ORDER BY MAX(score) DESC LIMIT ?",
+            (count,),
+        ).fetchall()
+        return [(score, max_ticks, SimulationOptions.deserialize(json.loads(data))) for score, max_ticks, data in rows]
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def start_search(self, name: str, sampler: str, max_ticks: int, world_size: int):
+        """
+        Registers the search `name`, which must have been run with the same settings if it exists.
+        """
+        row = self._db.execute("SELECT sampler, max_ticks, world_size FROM searches WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            with self._db:
+                self._db.execute("INSERT INTO searches VALUES (?, ?, ?, ?, ?)", (name, sampler, max_ticks, world_size, time.time()))
+        elif tuple(row) != (sampler, max_ticks, world_size):
+            raise ValueError(f"Search {name!r} was run as {row}, not {(sampler, max_ticks, world_size)}")
+
+    def add_proposal(self, search: str, proposal: Proposal):
+        with self._db:
+            self._db.execute(
+                "INSERT INTO proposals VALUES (?, ?, ?, ?, ?, ?)",
+                (search, proposal.number, json.dumps(proposal.vector), proposal.seed,
+                 json.dumps(proposal.sampler_state), json.dumps(proposal.seeds_state)),
+            )
+
+    def add_result(self, search: str, number: int, score: float):
+        with self._db:
+            self._db.execute("INSERT INTO results (search, number, score) VALUES (?, ?, ?)", (search, number, score))
+
+    def search_history(self, search: str) -> tuple[list[Proposal], list[Proposal]]:
+        """
+        The proposals of `search` in proposing order, and the finished ones in the order
+        their scores were told.
+        """
+        proposals = [
+            Proposal(number, json.loads(vector), seed, json.loads(sampler_state), json.loads(seeds_state))
+            for number, vector, seed, sampler_state, seeds_state in self._db.execute(
+                "SELECT number, vector, seed, sampler_state, seeds_state FROM proposals WHERE search = ? ORDER BY number",
+                (search,),
+            )
+        ]
+        told = [
+            Proposal(p.number, p.vector, p.seed, p.sampler_state, p.seeds_state, score)
+            for number, score in self._db.execute("SELECT number, score FROM results WHERE search = ? ORDER BY id", (search,))
+            for p in (proposals[number],)
+        ]
+        return proposals, told
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
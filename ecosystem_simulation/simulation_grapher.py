@@ -1,10 +1,22 @@
+import functools
+import hashlib
+import json
+import math
+import os
+import re
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 
 import matplotlib.pyplot as plt
-from typing import List, Optional
+import numpy as np
+from typing import List, Optional, Union
 
-from ecosystem_simulation.simulator import Creature, EcosystemSimulator, EntitySimulationOptions, SimulationOptions
+from ecosystem_simulation.recording import RecordingReader
+from ecosystem_simulation.simulator import Creature, CreatureView, EcosystemSimulator, EntitySimulationOptions, SimulationOptions
+
+# Recorded ticks are tracked over read-only `CreatureView`s, simulated ones over creatures
+TrackingFunc = Callable[[List[Union[Creature, CreatureView]], SimulationOptions, EntitySimulationOptions], Optional[float]]
 
 
 @dataclass(frozen=True)
@@ -14,42 +26,170 @@ class GraphOpts:
     y_label: str
     filled: bool
     out_file: str
-    tracking_func: Callable[[List[Creature], SimulationOptions, EntitySimulationOptions], Optional[float]]
+    tracking_func: TrackingFunc
     plot_prey: bool = True
     plot_pred: bool = True
 
-class SimulationGrapher:
-    def __init__(self, simulator: EcosystemSimulator):
-        self.simulator = simulator
 
-    def plot(self, num_ticks: int, opts: List[GraphOpts]):
+# Cached values of a tracking function, see `_metric_key`
+_CACHE_FILE = re.compile(r".+-[0-9a-f]{16}\.npy")
 
-        for opt in opts:
-            assert opt.tracking_func is not None
 
+def _code_digest(code, digest) -> None:
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode("utf-8"))
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _code_digest(const, digest)
+        else:
+            digest.update(repr(const).encode("utf-8"))
+
+
+def _callable_digest(func: Callable, digest) -> None:
+    if isinstance(func, functools.partial):
+        _callable_digest(func.func, digest)
+        digest.update(repr((func.args, sorted(func.keywords.items()))).encode("utf-8"))
+        return
+    code = getattr(func, "__code__", None)
+    if code is None:
+        # Callable objects, by the code of their `__call__`
+        code = getattr(getattr(type(func), "__call__", None), "__code__", None)
+    if code is not None:
+        _code_digest(code, digest)
 
-        plt.figure(figsize=(10, 6))
 
-        pred_values = [[] for _ in range(len(opts))]
-        prey_values = [[] for _ in range(len(opts))]
+def _metric_key(func: TrackingFunc) -> str:
+    """
+    Name of a tracking function and a hash of its code (and arguments bound by `functools.partial`),
+    so editing the function invalidates its cache.
+    """
+    digest = hashlib.sha256()
+    _callable_digest(func, digest)
+    named = func.func if isinstance(func, functools.partial) else func
+    module = getattr(named, "__module__", None) or type(named).__module__
+    name = getattr(named, "__qualname__", None) or type(named).__qualname__
+    return re.sub(r"[^\w.]", "_", f"{module}.{name}") + f"-{digest.hexdigest()[:16]}"
 
+
+def _track_recording(path: str, start: int, stop: int, funcs: list[TrackingFunc]) -> np.ndarray:
+    """
+    Values of `funcs` for predators and prey of the recorded ticks `start` to `stop`,
+    as a `(len(funcs), 2, stop - start)` array with NaN where a function returned `None`.
+    """
+    values = np.full((len(funcs), 2, stop - start), np.nan)
+    with RecordingReader(path) as recording:
+        options = recording.options
+        for t in range(start, stop):
+            state = recording.tick(t).state
+            # Lazy row views (fields are only read when a function accesses them), shared by all functions
+            pred = list(state.predators())
+            prey = list(state.prey())
+            for i, func in enumerate(funcs):
+                value = func(pred, options, options.predator)
+                values[i, 0, t - start] = np.nan if value is None else value
+                value = func(prey, options, options.prey)
+                values[i, 1, t - start] = np.nan if value is None else value
+    return values
+
+
+class SimulationGrapher:
+    """
+    Graphs tracked values of a simulator, which is run to produce the ticks, or of a recording.
+
+    Recordings are read in chunks of ticks by `processes` worker processes (tracking functions
+    then have to be picklable, module level functions or static methods). The values of every
+    tracking function are cached in a directory of the recording in `cache_dir` (next to the
+    recording by default), so plotting a recording again only computes functions it has not seen.
+    """
+    def __init__(self, simulator: Optional[EcosystemSimulator] = None, recording: Optional[str] = None,
+                 cache_dir: Optional[str] = None, processes: Optional[int] = None):
+        if (simulator is None) == (recording is None):
+            raise ValueError("Either a simulator or a recording has to be graphed")
+        self.simulator = simulator
+        self.recording = recording
+        self.cache_dir = cache_dir if cache_dir is not None or recording is None else recording + ".stats"
+        self.processes = processes if processes is not None else os.cpu_count()
+
+    def track(self, num_ticks: int, funcs: List[TrackingFunc]) -> tuple[List[List[Optional[float]]], List[List[Optional[float]]]]:
+        """
+        Values of every function for predators and prey of the first `num_ticks` ticks
+        (all recorded ticks if the recording is shorter).
+        """
+        if self.recording is not None:
+            values = self._track_recording(funcs)[:, :, :num_ticks]
+            values = [[[None if math.isnan(v) else v for v in series] for series in func] for func in values.tolist()]
+            return [v[0] for v in values], [v[1] for v in values]
+
+        pred_values = [[] for _ in range(len(funcs))]
+        prey_values = [[] for _ in range(len(funcs))]
         options = self.simulator.options
-        max_prey_gen = 0
-        max_pred_gen = 0
         for tick in range(num_ticks):
             print(tick)
             state = self.simulator.next_simulation_tick().state
             pred = list(state.predators())
             prey = list(state.prey())
-            max_pred_gen = max(max_pred_gen, max([x.generation for x in pred] + [0]))
-            max_prey_gen = max(max_prey_gen, max([x.generation for x in prey] + [0]))
             if len(pred) == 0:
                 print("Predators died out")
             if len(prey) == 0:
                 print("Prey died out")
-            for i, opt in enumerate(opts):
-                pred_values[i].append(opt.tracking_func(pred, options, options.predator))
-                prey_values[i].append(opt.tracking_func(prey, options, options.prey))
+            for i, func in enumerate(funcs):
+                pred_values[i].append(func(pred, options, options.predator))
+                prey_values[i].append(func(prey, options, options.prey))
+        return pred_values, prey_values
+
+    def _track_recording(self, funcs: List[TrackingFunc]) -> np.ndarray:
+        recording_path = os.path.abspath(self.recording)
+        # One directory per recording, so several recordings can share `cache_dir`
+        path_hash = hashlib.sha256(recording_path.encode("utf-8")).hexdigest()[:16]
+        cache_dir = os.path.join(self.cache_dir, f"{os.path.basename(recording_path)}-{path_hash}")
+        os.makedirs(cache_dir, exist_ok=True)
+        stat = os.stat(recording_path)
+        # The cache belongs to this version of the recording
+        source = {"path": recording_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        manifest_path = os.path.join(cache_dir, "recording.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                if json.load(f) != source:
+                    for name in os.listdir(cache_dir):
+                        if _CACHE_FILE.fullmatch(name):
+                            os.remove(os.path.join(cache_dir, name))
+        with open(manifest_path, "w") as f:
+            json.dump(source, f)
+
+        cached = {}
+        for func in funcs:
+            path = os.path.join(cache_dir, _metric_key(func) + ".npy")
+            if os.path.exists(path):
+                cached[_metric_key(func)] = np.load(path)
+        missing = list({_metric_key(func): func for func in funcs if _metric_key(func) not in cached}.values())
+        if len(missing) > 0:
+            with RecordingReader(self.recording) as recording:
+                num_ticks = len(recording)
+                chunk_size = max(recording.header.keyframe_interval, math.ceil(num_ticks / max(1, self.processes * 2)))
+            chunks = [(start, min(num_ticks, start + chunk_size)) for start in range(0, num_ticks, chunk_size)]
+            if self.processes > 1 and len(chunks) > 1:
+                with ProcessPoolExecutor(self.processes) as executor:
+                    parts = list(executor.map(_track_recording, *zip(*[(self.recording, start, stop, missing) for start, stop in chunks])))
+            else:
+                parts = [_track_recording(self.recording, start, stop, missing) for start, stop in chunks]
+            values = np.concatenate(parts, axis=2) if len(parts) > 0 else np.zeros((len(missing), 2, 0))
+            for func, func_values in zip(missing, values):
+                np.save(os.path.join(cache_dir, _metric_key(func) + ".npy"), func_values)
+                cached[_metric_key(func)] = func_values
+        return np.stack([cached[_metric_key(func)] for func in funcs]) if len(funcs) > 0 else np.zeros((0, 2, 0))
+
+    def plot(self, num_ticks: int, opts: List[GraphOpts]):
+
+        for opt in opts:
+            assert opt.tracking_func is not None
+
+
+        plt.figure(figsize=(10, 6))
+
+        pred_values, prey_values = self.track(num_ticks, [opt.tracking_func for opt in opts] + [SimulationGrapher.max_generation])
+        num_ticks = len(pred_values[-1])
+        max_pred_gen = int(max([x for x in pred_values.pop() if x is not None] + [0]))
+        max_prey_gen = int(max([x for x in prey_values.pop() if x is not None] + [0]))
 
         timestamps = list(range(num_ticks))
         print("Max prey gen:", max_prey_gen)
@@ -76,6 +216,10 @@ class SimulationGrapher:
             plt.savefig(opt.out_file, format="pdf", bbox_inches="tight")
             plt.close()
 
+    @staticmethod
+    def max_generation(entities: list[Creature], opts: SimulationOptions, entity_opts: EntitySimulationOptions) -> Optional[float]:
+        return max([x.generation for x in entities] + [0])
+
     @staticmethod
     def population(entities: list[Creature], opts: SimulationOptions, entity_opts: EntitySimulationOptions) -> Optional[float]:
         return len(entities)
@@ -1,67 +1,570 @@
-from dataclasses import asdict
+import math
+import os
+import signal
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
-from queue import Empty
 
-import multiprocessing as mp
 from datetime import datetime
 import random
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+from scipy.special import logsumexp
 
+from ecosystem_simulation.checkpoint import decode_checkpoint, encode_checkpoint, load_checkpoint, save_checkpoint
+from ecosystem_simulation.evaluation import Evaluation
+from ecosystem_simulation.results_store import Proposal, ResultsStore, options_hash
 from ecosystem_simulation.simulator import EcosystemSimulator
 from ecosystem_simulation.simulator.options import *
 
-def generate_random_entity_options() -> EntitySimulationOptions:
-    return EntitySimulationOptions(
-        initial_number=random.randint(200, 800),
-        initial_satiation_on_spawn=random.randint(10, 25) / 100,
-        max_juvenile_in_ticks=20,
-        max_gestation_in_ticks=20,
-        max_age_in_ticks=80,
-        max_children_per_birth=8,
-        satiation_per_feeding=random.randint(4, 9) / 10,
-        satiation_loss_per_tick=random.randint(1, 40) / 100,
-    )
+# Tasks submitted per worker process, so workers never wait for the parent to propose the next one
+TASKS_PER_WORKER = 2
+# Yielded by a task source of `EvaluationPool.evaluate` that has no task until running ones finish
+TASK_NOT_READY = object()
+# Ranks candidates by the scores of their replicates
+Statistic = Callable[[np.ndarray], float]
+# Default results store of the command line search
+RESULTS_PATH = "optimization_results/results.sqlite"
+
+# Searched options as (field, low, high, divisor): values are `randint(low, high) / divisor`,
+# fields of `predator` and `prey` are prefixed with `entity.`
+PARAMETERS: list[tuple[str, int, int, int]] = [
+    ("child_gene_mutation_chance_when_mating", 1, 20, 100),
+    ("child_gene_mutation_magnitude_when_mating", 1, 20, 100),
+    ("food_item_spawning_rate_per_tick", 10, 40, 1),
+    ("food_item_life_tick", 50, 100, 1),
+    ("initial_number_of_food_items", 500, 1000, 1),
+    ("max_number_of_food_items", 1000, 3000, 1),
+    *((f"{entity}.{field}", low, high, divisor) for entity in ("predator", "prey") for field, low, high, divisor in (
+        ("initial_number", 200, 800, 1),
+        ("initial_satiation_on_spawn", 10, 25, 100),
+        ("satiation_per_feeding", 4, 9, 10),
+        ("satiation_loss_per_tick", 1, 40, 100),
+    )),
+]
+
+
+def _parameter_values(vector: Sequence[float], prefix: str) -> dict[str, Union[int, float]]:
+    """
+    Values of the `PARAMETERS` starting with `prefix`, from coordinates in `[0, 1]`.
+    Every integer of a range is mapped to an equally long interval of its coordinate.
+    """
+    values = {}
+    for (name, low, high, divisor), x in zip(PARAMETERS, vector):
+        if name.startswith(prefix) and "." not in name[len(prefix):]:
+            value = low + min(int(x * (high - low + 1)), high - low)
+            values[name[len(prefix):]] = value / divisor if divisor != 1 else value
+    return values
+
+
+def options_from_vector(vector: Sequence[float], seed: int, world_size: int = 256) -> SimulationOptions:
+    """
+    Options with the `PARAMETERS` given as coordinates in `[0, 1]`.
+    """
+    def entity(name: str) -> EntitySimulationOptions:
+        return EntitySimulationOptions(
+            max_juvenile_in_ticks=20,
+            max_gestation_in_ticks=20,
+            max_age_in_ticks=80,
+            max_children_per_birth=8,
+            **_parameter_values(vector, f"{name}."),
+        )
 
-def generate_random_sim_options(seed: int) -> SimulationOptions:
     return SimulationOptions(
         randomness_seed=seed,
-        world_width=256,
-        world_height=256,
+        logic_determine_creature_state=LogicType.NORMAL,
+        world_width=world_size,
+        world_height=world_size,
         max_vision_distance=8,
-        child_gene_mutation_chance_when_mating=random.randint(1, 20) / 100,
-        child_gene_mutation_magnitude_when_mating=random.randint(1, 20) / 100,
-        food_item_spawning_rate_per_tick=random.randint(10, 40),
-        food_item_life_tick=random.randint(50, 100),
-        initial_number_of_food_items=random.randint(500, 1000),
-        max_number_of_food_items=random.randint(1000, 3000),
-        predator=generate_random_entity_options(),
-        prey=generate_random_entity_options(),
+        predator=entity("predator"),
+        prey=entity("prey"),
+        **_parameter_values(vector, ""),
     )
 
 
-def evaluate_sim(max_ticks: int, options: SimulationOptions) -> int:
-    simulator = EcosystemSimulator(options)
+def options_to_vector(options: SimulationOptions) -> np.ndarray:
+    """
+    Coordinates of the `PARAMETERS` of `options`, the centers of their intervals.
+    """
+    vector = np.empty(len(PARAMETERS))
+    for i, (name, low, high, divisor) in enumerate(PARAMETERS):
+        value = options
+        for part in name.split("."):
+            value = getattr(value, part)
+        vector[i] = (round(value * divisor) - low + 0.5) / (high - low + 1)
+    return np.clip(vector, 0, 1)
+
+
+def generate_random_entity_options() -> EntitySimulationOptions:
+    return options_from_vector([random.random() for _ in PARAMETERS], 0).predator
+
+def generate_random_sim_options(seed: int) -> SimulationOptions:
+    return options_from_vector([random.random() for _ in PARAMETERS], seed)
+
+
+class UniformSampler:
+    """
+    Proposes options uniformly at random, the original random search.
+    """
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = np.random.default_rng(seed)
+
+    def ask(self) -> np.ndarray:
+        return self.rng.random(len(PARAMETERS))
+
+    def tell(self, vector: np.ndarray, score: float):
+        pass
+
+    def getstate(self) -> dict:
+        return self.rng.bit_generator.state
+
+    def setstate(self, state: dict):
+        self.rng.bit_generator.state = state
+
+
+class TPESampler:
+    """
+    Tree-structured Parzen estimator over the coordinates of the `PARAMETERS`.
+
+    After `startup` uniform proposals, the best `gamma` of the scored vectors and the rest are
+    modelled by Gaussian kernel densities `l` and `g` (each mixed with the uniform density).
+    A proposal is the one of `candidates` samples of `l` maximizing `l / g`. Proposing is
+    cheap and uses every score told so far, so proposals are made one at a time, whenever a
+    worker frees up, instead of in generations that wait for their slowest simulation.
+    Past `max_points` scores, `g` is fitted to a random subset of the rest.
+    """
+    def __init__(self, gamma: float = 0.15, startup: int = 20, candidates: int = 64, max_points: int = 2000,
+                 seed: Optional[int] = None):
+        self.gamma = gamma
+        self.max_points = max_points
+        self.startup = startup
+        self.candidates = candidates
+        self.rng = np.random.default_rng(seed)
+        self.vectors: list[np.ndarray] = []
+        self.scores: list[float] = []
 
-    for i_tick in range(max_ticks):
+    def ask(self) -> np.ndarray:
+        if len(self.vectors) < self.startup:
+            return self.rng.random(len(PARAMETERS))
+        vectors = np.array(self.vectors)
+        order = np.argsort(-np.array(self.scores), kind="stable")
+        n_good = max(2, math.ceil(self.gamma * min(len(vectors), self.max_points)))
+        good, bad = vectors[order[:n_good]], vectors[order[n_good:]]
+        if len(bad) > self.max_points:
+            bad = bad[self.rng.choice(len(bad), self.max_points, replace=False)]
+
+        bandwidth = self._bandwidth(good)
+        centers = good[self.rng.integers(len(good), size=self.candidates)]
+        samples = np.clip(centers + self.rng.normal(size=centers.shape) * bandwidth, 0, 1)
+        ratio = self._log_density(samples, good, bandwidth) - self._log_density(samples, bad, self._bandwidth(bad))
+        return samples[np.argmax(ratio)]
+
+    def tell(self, vector: np.ndarray, score: float):
+        self.vectors.append(np.asarray(vector, dtype=np.float64))
+        self.scores.append(float(score))
+
+    def getstate(self) -> dict:
+        """
+        State of the random generator, the told scores are not included.
+        """
+        return self.rng.bit_generator.state
+
+    def setstate(self, state: dict):
+        self.rng.bit_generator.state = state
+
+    @staticmethod
+    def _bandwidth(points: np.ndarray) -> np.ndarray:
+        # Scott's rule per coordinate, wide enough to keep exploring around few points
+        return np.clip(points.std(axis=0) * len(points) ** (-1 / (points.shape[1] + 4)), 0.05, 0.5)
+
+    @staticmethod
+    def _log_density(x: np.ndarray, points: np.ndarray, bandwidth: np.ndarray) -> np.ndarray:
+        if len(points) == 0:
+            return np.zeros(len(x))
+        z = (x[:, None, :] - points[None, :, :]) / bandwidth
+        kernels = -0.5 * np.sum(z * z, axis=2) - np.sum(np.log(bandwidth)) - 0.5 * x.shape[1] * np.log(2 * np.pi)
+        # One part of uniform density (1 on the unit cube) per `len(points)` parts of kernels
+        return logsumexp(np.concatenate((kernels, np.zeros((len(x), 1))), axis=1), axis=1) - np.log(len(points) + 1)
+
+
+Sampler = Union[UniformSampler, TPESampler]
+
+
+def evaluate_task(options: SimulationOptions, max_ticks: int, time_limit: Optional[float] = None,
+                  resume: Optional[Union[bytes, str]] = None, checkpoint: Union[bool, str] = False) -> Evaluation:
+    """
+    Simulates until a species dies out, `max_ticks` ticks or `time_limit` seconds pass.
+
+    With `resume` (a checkpoint's bytes or path) the simulation continues from the checkpoint
+    instead of tick 0. If the simulation survives `max_ticks`, `checkpoint` keeps its checkpoint
+    in memory (`True`) or saves it to the given path.
+    """
+    start = time.perf_counter()
+    if resume is None:
+        simulator = EcosystemSimulator(options)
+    elif isinstance(resume, bytes):
+        simulator = decode_checkpoint(resume, options)
+    else:
+        simulator = load_checkpoint(resume, options)
+    first_tick = simulator._current_tick_number
+    state = simulator._current_state
+
+    score = max_ticks
+    timed_out = False
+    for i_tick in range(first_tick, max_ticks):
         state = simulator.next_simulation_tick().state
         if state.prey_count() == 0 or state.predator_count() == 0:
-            return i_tick
+            score = i_tick
+            break
+        if time_limit is not None and time.perf_counter() - start > time_limit:
+            score = i_tick + 1
+            timed_out = i_tick + 1 < max_ticks
+            break
+
+    saved = None
+    if score >= max_ticks and checkpoint is not False:
+        if checkpoint is True:
+            saved = encode_checkpoint(simulator)
+        else:
+            save_checkpoint(simulator, checkpoint)
+            saved = checkpoint
+    return Evaluation(
+        options, max_ticks, score, time.perf_counter() - start, timed_out,
+        ticks=simulator._current_tick_number - first_tick,
+        populations=(state.predator_count(), state.prey_count()),
+        checkpoint=saved,
+    )
 
-    return max_ticks
 
-import traceback
+def evaluate_sim(max_ticks: int, options: SimulationOptions) -> int:
+    return evaluate_task(options, max_ticks).score
+
+
+def _init_worker():
+    # Interrupts are handled by the parent, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class EvaluationPool:
+    """
+    Evaluates simulation options on `workers` worker processes, which are started once.
+
+    `evaluate` pulls the next task from its iterable only while fewer than `max_in_flight`
+    tasks are unfinished, so the parent proposes options as workers free up, and proposals
+    can depend on the results received so far. `stop` stops pulling tasks and lets the
+    submitted ones finish (they are still yielded), `cancel` also drops those that have not
+    started. Tasks are stopped after `time_limit` seconds and scored by the ticks survived so far.
+    A task source that yields `TASK_NOT_READY` is asked again once a running task finished.
+    Tasks that raise are yielded as failed evaluations scoring 0, so callers account for them.
+
+    With a `store` (a `ResultsStore`), every result is stored, and tasks already stored are
+    yielded from it without simulating them, unless they ask for a checkpoint.
+    """
+    def __init__(self, workers: Optional[int] = None, max_in_flight: Optional[int] = None, time_limit: Optional[float] = None,
+                 store: Optional[ResultsStore] = None):
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.max_in_flight = max_in_flight if max_in_flight is not None else self.workers * TASKS_PER_WORKER
+        self.time_limit = time_limit
+        self.store = store
+        self.completed = 0
+        self.failed = 0
+        # Results taken from the store
+        self.cached = 0
+        # Time the workers spent simulating
+        self.busy_seconds = 0.0
+        self._stopping = False
+        # Running tasks as `(options, max_ticks)` by their future
+        self._in_flight: dict[Future, tuple[SimulationOptions, int]] = {}
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        self._start = time.perf_counter()
+
+    def evaluate(self, tasks: Iterable[tuple]) -> Iterator[Evaluation]:
+        """
+        Evaluates `(options, max_ticks)` tasks, yields their results as they finish.
+        Tasks can be followed by the `resume` and `checkpoint` arguments of `evaluate_task`.
+        """
+        tasks = iter(tasks)
+        exhausted = False
+        while True:
+            while not exhausted and not self._stopping and len(self._in_flight) < self.max_in_flight:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                    break
+                if task is TASK_NOT_READY:
+                    if len(self._in_flight) == 0:
+                        raise RuntimeError("The task source waits for results while no task is running")
+                    break
+                options, max_ticks, *resume = task
+                if self.store is not None and (len(resume) < 2 or resume[1] is False):
+                    evaluation = self.store.lookup(options, max_ticks)
+                    if evaluation is not None:
+                        self.cached += 1
+                        yield evaluation
+                        continue
+                future = self._executor.submit(evaluate_task, options, max_ticks, self.time_limit, *resume)
+                self._in_flight[future] = (options, max_ticks)
+            if len(self._in_flight) == 0:
+                return
+
+            done, _ = wait(self._in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                options, max_ticks = self._in_flight.pop(future)
+                if future.cancelled():
+                    continue
+                try:
+                    evaluation = future.result()
+                except Exception:
+                    self.failed += 1
+                    print(traceback.format_exc())
+                    yield Evaluation(options, max_ticks, 0, 0.0, failed=True)
+                    continue
+                self.completed += 1
+                self.busy_seconds += evaluation.seconds
+                if self.store is not None:
+                    self.store.add(evaluation)
+                yield evaluation
+
+    def drain(self) -> Iterator[Evaluation]:
+        """
+        Stops pulling tasks and yields the results of the submitted ones.
+        """
+        self.stop()
+        return self.evaluate(())
+
+    def stop(self):
+        self._stopping = True
 
-def evaluate_worker(worker_id: int, max_ticks: int, result_queue: mp.Queue) -> (int, SimulationOptions):
-    while True:
-        try:
-            params = generate_random_sim_options(random.randint(1, 2 ** 32))
-            num_ticks = evaluate_sim(max_ticks, params)
-            result_queue.put((num_ticks, params))
-        except Exception as e:
-            print(traceback.format_exc())
-            print(f"Worker {worker_id} encountered error: {e}")
+    def cancel(self):
+        self._stopping = True
+        for future in self._in_flight:
+            future.cancel()
 
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
 
-def save_best_params(score: int, params: SimulationOptions):
+    def throughput(self) -> float:
+        """
+        Finished evaluations per second and worker process.
+        """
+        return self.completed / max(self.elapsed, 1e-9) / self.workers
+
+    def close(self, cancel: bool = False):
+        if cancel:
+            self.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def __enter__(self) -> "EvaluationPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(cancel=exc_type is not None)
+
+
+def replicate_options(options: SimulationOptions, replicate: int) -> SimulationOptions:
+    """
+    Options of a replicate, a simulation with another seed. Replicate 0 keeps the seed of `options`.
+    The seeds only depend on the seed of `options`, so candidates with the same seed are compared
+    on the same seeds.
+    """
+    if replicate == 0:
+        return options
+    return replace(options, randomness_seed=random.Random(f"{options.randomness_seed}/{replicate}").randint(1, 2 ** 32))
+
+
+@dataclass(slots=True, eq=False)
+class RobustScore:
+    """
+    Scores of the replicates of a candidate.
+    """
+    options: SimulationOptions
+    max_ticks: int
+    replicates: int
+    scores: list[int] = field(default_factory=list)
+    # Replicates scheduled (finished or not)
+    scheduled: int = 0
+    # Replicates left out, since they could not change the rank of the candidate
+    skipped: int = 0
+
+    @property
+    def running(self) -> int:
+        return self.scheduled - len(self.scores)
+
+    @property
+    def remaining(self) -> int:
+        """
+        Replicates neither scheduled nor skipped.
+        """
+        return self.replicates - self.scheduled - self.skipped
+
+    @property
+    def done(self) -> bool:
+        return self.running == 0 and self.remaining == 0
+
+    def bounds(self, statistic: Statistic) -> tuple[float, float]:
+        """
+        Lowest and highest `statistic` of all replicates, whatever the unfinished ones score.
+        """
+        missing = self.replicates - len(self.scores)
+        return (float(statistic(np.array(self.scores + [0] * missing))),
+                float(statistic(np.array(self.scores + [self.max_ticks] * missing))))
+
+    def value(self, statistic: Statistic) -> float:
+        """
+        `statistic` of the finished replicates.
+        """
+        return float(statistic(np.array(self.scores)))
+
+    def summary(self) -> dict[str, float]:
+        scores = np.array(self.scores)
+        return {
+            "replicates": len(scores),
+            "skipped": self.skipped,
+            "mean": float(scores.mean()),
+            "min": int(scores.min()),
+            "q25": float(np.quantile(scores, 0.25)),
+            "median": float(np.median(scores)),
+            "max": int(scores.max()),
+        }
+
+
+class ReplicateRace:
+    """
+    Schedules the replicates of candidates, skipping those that can not change which
+    candidates rank among the best `keep` by `statistic`.
+
+    A candidate is hopeless once, even with its remaining replicates surviving `max_ticks`, it
+    would rank below the lowest possible `statistic` of the `keep`-th best other candidate.
+    `schedule` starts every candidate with one replicate. Whenever all running replicates of
+    a candidate finished, its next replicate is scheduled unless it is hopeless, before new
+    candidates are started. Once there are no new candidates, idle workers get a further
+    replicate of the candidate with the highest possible `statistic`, so the leaders are
+    settled first and the others turn hopeless before their replicates run. Replicates are
+    only chosen when a task is pulled, so results that arrived until then count.
+    `statistic` must not decrease when a score grows, like the mean, the minimum or quantiles.
+    """
+    def __init__(self, max_ticks: int, replicates: int, statistic: Statistic = np.mean, keep: int = 1):
+        if replicates < 1:
+            raise ValueError("replicates must be at least 1")
+        self.max_ticks = max_ticks
+        self.replicates = replicates
+        self.statistic = statistic
+        self.keep = keep
+        # Candidates with unfinished replicates
+        self._active: list[RobustScore] = []
+        # Lowest possible statistics of the best `keep` finished candidates
+        self._best_finished: list[float] = []
+        # Candidates of the scheduled replicates by the hash of their options, in scheduling
+        # order (identical candidates simulate identically, so any of them can take a result)
+        self._by_options: dict[str, deque[RobustScore]] = {}
+        self._ready: deque[tuple[SimulationOptions, int]] = deque()
+
+    def schedule(self, candidates: Iterable[SimulationOptions]) -> Iterator[tuple[SimulationOptions, int]]:
+        """
+        Tasks of the replicates of `candidates`, for `EvaluationPool.evaluate`. Every task has
+        to be passed to `record` once finished (or failed). While no replicate is worth running
+        yet, the race waits for results (`TASK_NOT_READY`).
+        """
+        candidates = iter(candidates)
+        while True:
+            if len(self._ready) > 0:
+                yield self._ready.popleft()
+                continue
+            options = next(candidates, None)
+            if options is None:
+                break
+            candidate = RobustScore(options, self.max_ticks, self.replicates)
+            self._active.append(candidate)
+            self._schedule(candidate)
+        while len(self._active) > 0:
+            if len(self._ready) == 0:
+                candidate = self._most_promising()
+                if candidate is None:
+                    yield TASK_NOT_READY
+                    continue
+                self._schedule(candidate)
+            yield self._ready.popleft()
+
+    def record(self, evaluation: Evaluation) -> Optional[RobustScore]:
+        """
+        Adds the score of a replicate. Returns its candidate once it is done.
+        """
+        key = options_hash(evaluation.options)
+        waiting = self._by_options[key]
+        candidate = waiting.popleft()
+        if len(waiting) == 0:
+            del self._by_options[key]
+        candidate.scores.append(evaluation.score)
+        if candidate.running == 0 and candidate.remaining > 0:
+            if self.hopeless(candidate):
+                candidate.skipped += candidate.remaining
+            else:
+                # Every active candidate keeps a replicate running, so it is done in `record`
+                self._schedule(candidate)
+        if not candidate.done:
+            return None
+        self._active.remove(candidate)
+        self._best_finished = sorted(self._best_finished + [candidate.bounds(self.statistic)[0]], reverse=True)[:self.keep]
+        return candidate
+
+    def hopeless(self, candidate: RobustScore) -> bool:
+        lows = sorted(self._best_finished + [c.bounds(self.statistic)[0] for c in self._active if c is not candidate],
+                      reverse=True)
+        return len(lows) >= self.keep and candidate.bounds(self.statistic)[1] < lows[self.keep - 1]
+
+    def _most_promising(self) -> Optional[RobustScore]:
+        """
+        The candidate with replicates left and the highest possible `statistic` (the fewest
+        running replicates among equals), skipping the replicates of hopeless candidates.
+        """
+        best = None
+        best_key = None
+        for candidate in self._active:
+            if candidate.remaining == 0:
+                continue
+            if self.hopeless(candidate):
+                candidate.skipped += candidate.remaining
+                continue
+            key = (candidate.bounds(self.statistic)[1], -candidate.running)
+            if best is None or key > best_key:
+                best, best_key = candidate, key
+        return best
+
+    def _schedule(self, candidate: RobustScore):
+        options = replicate_options(candidate.options, candidate.scheduled)
+        self._by_options.setdefault(options_hash(options), deque()).append(candidate)
+        self._ready.append((options, self.max_ticks))
+        candidate.scheduled += 1
+
+
+def robust_evaluate(candidates: Iterable[SimulationOptions], max_ticks: int = 5000, replicates: int = 8,
+                    workers: Optional[int] = None, statistic: Statistic = np.mean, keep: Optional[int] = 1,
+                    time_limit: Optional[float] = None, results: Optional[str] = None) -> list[RobustScore]:
+    """
+    Scores candidates over `replicates` seeds, best first by `statistic`, skipping replicates
+    that can not change which candidates are the best `keep` (see `ReplicateRace`, all
+    replicates are run with `keep=None`). Replicates are stored in the `results` store.
+    """
+    candidates = list(candidates)
+    race = ReplicateRace(max_ticks, replicates, statistic, keep if keep is not None else len(candidates))
+    scores = []
+    with ResultsStore(results) if results is not None else nullcontext() as store, \
+            EvaluationPool(workers, time_limit=time_limit, store=store) as pool:
+        for evaluation in pool.evaluate(race.schedule(candidates)):
+            candidate = race.record(evaluation)
+            if candidate is not None:
+                scores.append(candidate)
+    scores.sort(key=lambda c: c.value(statistic), reverse=True)
+    return scores
+
+
+def save_best_params(score: int, params: SimulationOptions, replicates: Optional[dict] = None):
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
     output_dir = Path("optimization_results")
     output_dir.mkdir(exist_ok=True)
@@ -72,6 +575,9 @@ def save_best_params(score: int, params: SimulationOptions):
         "score": score,
         "params": json.dumps(asdict(params)),
     }
+    if replicates is not None:
+        # Statistics of the scores over seeds (see `RobustScore.summary`)
+        data["replicates"] = replicates
 
     output_path = output_dir / f"best_{timestamp}_{score}.json"
     with open(output_path, 'w') as f:
@@ -80,55 +586,231 @@ def save_best_params(score: int, params: SimulationOptions):
     print(f"Saved best parameters to {output_path}")
 
 
-def random_search(max_simulations: int, max_ticks: int=5000):
-    best_score: int = 0
-    best_params: SimulationOptions = generate_random_sim_options(0)
+def parameter_search(sampler: Sampler, max_simulations: int, max_ticks: int = 5000, workers: Optional[int] = None,
+                     time_limit: Optional[float] = None, world_size: int = 256, seed: Optional[int] = None,
+                     target_score: Optional[int] = None, save_best: bool = True,
+                     on_evaluation: Optional[Callable[[Evaluation], None]] = None,
+                     results: Optional[str] = None, search: Optional[str] = None,
+                     replicates: int = 1, statistic: Statistic = np.mean) -> SimulationOptions:
+    """
+    Evaluates up to `max_simulations` options proposed by `sampler`, telling it every score.
+
+    Options are proposed only when a worker is about to free up, so model based samplers
+    learn from every finished simulation. The search stops early once a simulation scores
+    `target_score`. `seed` seeds the simulations, `on_evaluation` is called with every result.
+
+    With a `results` store (path of a `ResultsStore`), stored evaluations are not simulated
+    again. A named `search` also logs its proposals and results there, and when started again
+    it resumes: the sampler is told the logged results, unfinished proposals are evaluated
+    first and `max_simulations` counts the proposals of earlier runs.
+
+    With `replicates`, every proposal is simulated with as many seeds and scored by the
+    `statistic` of their scores, skipping replicates of proposals that can not become the
+    best one (see `ReplicateRace`). `max_simulations` then counts proposals.
+    """
+    if search is not None and results is None:
+        raise ValueError("A named search needs a results store")
+    best_score: float = 0
+    best_params: SimulationOptions = options_from_vector(np.full(len(PARAMETERS), 0.5), 0, world_size)
+    best_summary: Optional[dict] = None
     simulation_count: int = 0
+    seeds = random.Random(seed)
+    race = ReplicateRace(max_ticks, replicates, statistic)
+    # Numbers and vectors of the unfinished proposals by the hash of their options, in proposing order
+    proposed: dict[str, deque[tuple[int, np.ndarray]]] = {}
 
-    num_cores = mp.cpu_count()
-    print(f"Using {num_cores} CPU cores")
+    def propose(options: SimulationOptions, number: int, vector: np.ndarray) -> SimulationOptions:
+        proposed.setdefault(options_hash(options), deque()).append((number, vector))
+        return options
 
-    result_queue = mp.Queue(maxsize=num_cores - 2)
+    with ResultsStore(results) if results is not None else nullcontext() as store:
+        pending = []
+        first_number = 0
+        if search is not None:
+            sampler_name = type(sampler).__name__ if replicates == 1 else f"{type(sampler).__name__} over {replicates} replicates"
+            store.start_search(search, sampler_name, max_ticks, world_size)
+            proposals, told = store.search_history(search)
+            for proposal in told:
+                sampler.tell(np.array(proposal.vector), proposal.score)
+                if proposal.score > best_score:
+                    best_score = proposal.score
+                    best_params = options_from_vector(proposal.vector, proposal.seed, world_size)
+            if len(proposals) > 0:
+                sampler.setstate(proposals[-1].sampler_state)
+                version, words, gauss_next = proposals[-1].seeds_state
+                seeds.setstate((version, tuple(words), gauss_next))
+                finished = {proposal.number for proposal in told}
+                pending = [proposal for proposal in proposals if proposal.number not in finished]
+                first_number = len(proposals)
+                print(f"Resuming search {search!r}: {len(told)} proposals done, {len(pending)} unfinished, "
+                      f"best {best_score:g} ticks")
 
+        def candidates():
+            for proposal in pending:
+                yield propose(options_from_vector(proposal.vector, proposal.seed, world_size),
+                              proposal.number, np.array(proposal.vector))
+            for number in range(first_number, max_simulations):
+                vector = sampler.ask()
+                options = options_from_vector(vector, seeds.randint(1, 2 ** 32), world_size)
+                propose(options, number, vector)
+                if search is not None:
+                    store.add_proposal(search, Proposal(number, vector.tolist(), options.randomness_seed,
+                                                        sampler.getstate(), list(seeds.getstate())))
+                yield options
 
-    workers = []
-    for i in range(num_cores):
-        p = mp.Process(
-            target=evaluate_worker,
-            args=(i, max_ticks, result_queue),
-            daemon=True,
-        )
-        workers.append(p)
-        p.start()
+        def handle(evaluation: Evaluation):
+            nonlocal best_score, best_params, best_summary, simulation_count
+            simulation_count += 1
+            if on_evaluation is not None:
+                on_evaluation(evaluation)
+            candidate = race.record(evaluation)
+            if candidate is None:
+                return
+            score = candidate.value(statistic)
+            key = options_hash(candidate.options)
+            number, vector = proposed[key].popleft()
+            if len(proposed[key]) == 0:
+                del proposed[key]
+            sampler.tell(vector, score)
+            if search is not None:
+                store.add_result(search, number, score)
+            if score > best_score:
+                best_score = score
+                best_params = candidate.options
+                best_summary = candidate.summary() if replicates > 1 else None
+                print(f"New best score at simulation_count {simulation_count}: {best_score:g} ticks survived"
+                      + (f" ({best_summary})" if best_summary is not None else ""))
+                if save_best:
+                    save_best_params(round(best_score), best_params, best_summary)
+
+            if simulation_count % 10000 == 0:
+                print(f"Completed {simulation_count} simulations. Current best: {best_score:g} ticks, "
+                      f"{pool.throughput():.3f} simulations/s per core")
 
-    try:
-        while simulation_count < max_simulations:
+        with EvaluationPool(workers, time_limit=time_limit, store=store) as pool:
+            print(f"Using {pool.workers} worker processes, {type(sampler).__name__}")
             try:
-                score, options = result_queue.get()
-                simulation_count += 1
-                if score > best_score:
-                    best_score = score
-                    best_params = options
-                    print(f"New best score at simulation_count {simulation_count}: {best_score} ticks survived")
-                    save_best_params(best_score, best_params)
-
-                if simulation_count % 10000 == 0:
-                    print(f"Completed {simulation_count} simulations. Current best: {best_score} ticks")
-
-            except Empty:
-                continue
-    except KeyboardInterrupt:
-        print("\nSearch interrupted by user. Saving best results so far...")
-        if best_params is not None:
-            save_best_params(best_score, best_params)
-        print("Results saved. Exiting...")
-        return best_score, best_params
+                for evaluation in pool.evaluate(race.schedule(candidates())):
+                    handle(evaluation)
+                    if target_score is not None and best_score >= target_score:
+                        # Running simulations are still yielded
+                        pool.cancel()
+            except KeyboardInterrupt:
+                print("\nSearch interrupted by user. Finishing running simulations...")
+                pool.cancel()
+                for evaluation in pool.drain():
+                    handle(evaluation)
+                if save_best:
+                    save_best_params(round(best_score), best_params, best_summary)
+                print("Results saved. Exiting...")
+
+            print(f"Completed {simulation_count} simulations ({pool.cached} from the results store) in "
+                  f"{pool.elapsed:.1f} s, {pool.throughput():.3f} simulations/s per core")
+
+    return best_params
+
+
+def random_search(max_simulations: int, max_ticks: int=5000, workers: Optional[int] = None,
+                  time_limit: Optional[float] = None, results: Optional[str] = None,
+                  search: Optional[str] = None, replicates: int = 1) -> SimulationOptions:
+    return parameter_search(UniformSampler(), max_simulations, max_ticks, workers, time_limit,
+                            results=results, search=search, replicates=replicates)
+
+
+def model_search(max_simulations: int, max_ticks: int = 5000, workers: Optional[int] = None,
+                 time_limit: Optional[float] = None, results: Optional[str] = None,
+                 search: Optional[str] = None, replicates: int = 1) -> SimulationOptions:
+    """
+    Like `random_search`, with options proposed by a `TPESampler`.
+    """
+    return parameter_search(TPESampler(), max_simulations, max_ticks, workers, time_limit,
+                            results=results, search=search, replicates=replicates)
+
+
+def rung_budgets(max_ticks: int, eta: int, min_ticks: int) -> list[int]:
+    """
+    Tick budgets of successive halving rungs, growing `eta` times up to `max_ticks`.
+    """
+    budgets = [max_ticks]
+    while budgets[0] // eta >= max(1, min_ticks):
+        budgets.insert(0, budgets[0] // eta)
+    return budgets
+
+
+def successive_halving(num_candidates: int, max_ticks: int = 5000, eta: int = 3, min_ticks: Optional[int] = None,
+                       workers: Optional[int] = None, time_limit: Optional[float] = None,
+                       checkpoint_dir: Optional[str] = None,
+                       candidates: Optional[list[SimulationOptions]] = None, save_best: bool = True,
+                       results: Optional[str] = None) -> SimulationOptions:
+    """
+    Evaluates candidates in rungs of growing tick budgets (see `rung_budgets`), promoting
+    the best `1 / eta` of every rung to the next one.
+
+    Candidates alive at the end of a rung are ranked by the balance of their populations (the
+    smaller one divided by the larger one, unbalanced ecosystems tend to collapse later), and
+    continue from their checkpoint (kept in memory, or in `checkpoint_dir`) instead of tick 0.
+    The first rung lasts `min_ticks` (`max_ticks / eta ** 2` by default), population balances
+    of much shorter runs say little about survival. Candidates
+    whose species died out are never promoted, their scores are final. `candidates` replaces
+    the random ones, new best options are saved unless `save_best` is `False`. Evaluations
+    are stored in and, when no checkpoint is needed, reused from the `results` store.
+    """
+    if candidates is None:
+        candidates = [generate_random_sim_options(random.randint(1, 2 ** 32)) for _ in range(num_candidates)]
+    budgets = rung_budgets(max_ticks, eta, min_ticks if min_ticks is not None else max_ticks // eta ** 2)
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    best_score = 0
+    best_params = candidates[0]
+    total_ticks = 0
+    # Candidates of the current rung with the checkpoint they continue from
+    rung: list[tuple[SimulationOptions, Optional[Union[bytes, str]]]] = [(options, None) for options in candidates]
+
+    with ResultsStore(results) if results is not None else nullcontext() as store, \
+            EvaluationPool(workers, time_limit=time_limit, store=store) as pool:
+        print(f"Using {pool.workers} worker processes, rungs of {budgets} ticks")
+        for k, budget in enumerate(budgets):
+            last = k == len(budgets) - 1
+
+            def tasks():
+                for i, (options, resume) in enumerate(rung):
+                    checkpoint = False
+                    if not last:
+                        checkpoint = True if checkpoint_dir is None else os.path.join(checkpoint_dir, f"{k}_{i}.eesckpt")
+                    yield options, budget, resume, checkpoint
+
+            alive = []
+            for evaluation in pool.evaluate(tasks()):
+                total_ticks += evaluation.ticks
+                if evaluation.score > best_score:
+                    best_score = evaluation.score
+                    best_params = evaluation.options
+                    print(f"New best score in rung {k}: {best_score} ticks survived")
+                    if save_best:
+                        save_best_params(best_score, best_params)
+                if evaluation.survived:
+                    alive.append(evaluation)
+
+            for _, resume in rung:
+                if isinstance(resume, str):
+                    os.remove(resume)
+            alive.sort(key=lambda e: min(e.populations) / max(e.populations), reverse=True)
+            promoted = alive[:math.ceil(len(rung) / eta)] if not last else []
+            for evaluation in alive[len(promoted):]:
+                if isinstance(evaluation.checkpoint, str):
+                    os.remove(evaluation.checkpoint)
+            print(f"Rung {k}: {len(rung)} candidates to {budget} ticks, {len(alive)} alive, {len(promoted)} promoted, "
+                  f"{total_ticks} ticks simulated, {pool.throughput():.3f} simulations/s per core")
+            rung = [(e.options, e.checkpoint) for e in promoted]
+            if len(rung) == 0:
+                break
 
     return best_params
 
 
 if __name__ == '__main__':
-    best = random_search(max_simulations=100000000, max_ticks=5000)
+    best = model_search(max_simulations=100000000, max_ticks=5000, results=RESULTS_PATH, search="model_search")
 
     print("\nOptimization complete. Best parameters:")
-    print(json.dumps(best, indent=4))
+    print(json.dumps(best.serialize(), indent=4))
@@ -1,21 +1,77 @@
-import json
-from typing import Union
+import queue
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
 from enum import Enum, auto
 
 from ecosystem_simulation.simulator import *
+from ecosystem_simulation.recording import RecordingReader, tick_nbytes
+
+# Number of ticks decoded (or simulated) ahead of the displayed one
+PREFETCH_TICKS = 16
+# Memory budget of the decoded tick cache
+CACHE_BYTES = 256 * 1024 * 1024
 
 class PlayerMode(Enum):
     SIMULATOR = auto()
     FILE = auto()
 
+
+class TickCache:
+    """
+    Least recently used cache of decoded ticks, holding at most `max_bytes` (see `tick_nbytes`).
+    """
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._ticks: OrderedDict[int, tuple[SimulatedTick, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, index: int) -> Optional[SimulatedTick]:
+        with self._lock:
+            entry = self._ticks.get(index)
+            if entry is None:
+                return None
+            self._ticks.move_to_end(index)
+            return entry[0]
+
+    def __contains__(self, index: int) -> bool:
+        with self._lock:
+            return index in self._ticks
+
+    def put(self, index: int, tick: SimulatedTick):
+        size = tick_nbytes(tick)
+        with self._lock:
+            old = self._ticks.pop(index, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._ticks[index] = (tick, size)
+            self.nbytes += size
+            # Keeps at least the newest tick, even if it alone exceeds the budget
+            while self.nbytes > self.max_bytes and len(self._ticks) > 1:
+                _, (_, evicted_size) = self._ticks.popitem(last=False)
+                self.nbytes -= evicted_size
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+
 class SimulationPlayer:
+    """
+    Plays a recording (`PlayerMode.FILE`) or a running simulator (`PlayerMode.SIMULATOR`).
+
+    Recordings are decoded `prefetch` ticks ahead in the playback direction on a worker thread,
+    into a `TickCache` of at most `cache_bytes`. Simulators are run up to `prefetch` ticks ahead
+    of the displayed tick on a worker thread. With `background=False` everything is computed
+    when `next_tick` is called.
+    """
     _options: SimulationOptions
 
-    def __init__(self, mode: PlayerMode, source: Union[str, EcosystemSimulator]):
+    def __init__(self, mode: PlayerMode, source: Union[str, EcosystemSimulator], prefetch: int = PREFETCH_TICKS,
+                 cache_bytes: int = CACHE_BYTES, background: bool = True):
         if mode == PlayerMode.FILE:
-            readData = self.read_json(source)
-            self.data = readData["data"]
-            self._options = SimulationOptions.deserialize(readData["options"])
+            self.recording = RecordingReader(source)
+            self._options = self.recording.options
             self.mode = PlayerMode.FILE
         elif mode == PlayerMode.SIMULATOR:
             self.simulator = source
@@ -24,27 +80,120 @@ class SimulationPlayer:
         else:
             raise ValueError("Invalid mode")
         self.tick = 0
+        # 1 plays forwards, -1 backwards
+        self.direction = 1
+        self.prefetch = prefetch
+        self.cache = TickCache(cache_bytes)
+
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._wake = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        # Ticks simulated ahead of the displayed one
+        self._simulated: Optional[queue.Queue] = None
+        if background and prefetch > 0:
+            if mode == PlayerMode.SIMULATOR:
+                self._simulated = queue.Queue(maxsize=prefetch)
+                self._worker = threading.Thread(target=self._run_simulator, name="SimulationPlayer", daemon=True)
+            else:
+                self._worker = threading.Thread(target=self._run_prefetch, name="SimulationPlayer", daemon=True)
+            self._worker.start()
 
-    def read_json(self, filename: str):
-        with open(filename, "r") as f:
-            return json.load(f)
-        
     def next_tick(self) -> SimulatedTick:
-        self.tick += 1
+        self._raise_error()
         if self.mode == PlayerMode.SIMULATOR:
-            return self.simulator.next_simulation_tick()
+            self.tick += 1
+            if self._simulated is None:
+                return self.simulator.next_simulation_tick()
+            while True:
+                try:
+                    return self._simulated.get(timeout=0.1)
+                except queue.Empty:
+                    self._raise_error()
         elif self.mode == PlayerMode.FILE:
             tick_count = self.tick_count()
-            if self.tick >= tick_count:
-                self.tick = tick_count - 1
-            return SimulatedTick.deserialize(self.data[self.tick])
+            self.tick = min(max(self.tick + self.direction, 0), tick_count - 1)
+            index = self.tick
+            tick = self.cache.get(index)
+            if tick is None:
+                tick = self.recording.tick(index)
+                self.cache.put(index, tick)
+            with self._wake:
+                self._wake.notify()
+            return tick
         else:
             raise ValueError("Invalid mode")
-        
+
+    def seek(self, tick: int):
+        """
+        Makes `next_tick` return the tick following `tick` (in the playback direction).
+        Only recordings can seek.
+        """
+        self.tick = tick
+        with self._wake:
+            self._wake.notify()
+
+    def set_direction(self, direction: int):
+        """
+        Plays recordings forwards (`1`) or backwards (`-1`).
+        """
+        if direction not in (1, -1):
+            raise ValueError("Invalid direction")
+        self.direction = direction
+        with self._wake:
+            self._wake.notify()
+
+    def _run_prefetch(self):
+        try:
+            while not self._closed:
+                with self._wake:
+                    # Checked under the lock, `close` sets it and notifies while holding it
+                    if self._closed:
+                        return
+                    position, direction = self.tick, self.direction
+                    targets = [
+                        i for i in range(position + direction, position + direction * (self.prefetch + 1), direction)
+                        if 0 <= i < len(self.recording) and i not in self.cache
+                    ]
+                    if len(targets) == 0:
+                        self._wake.wait()
+                        continue
+                # Decodes one tick at a time (the closest first), so seeking redirects the prefetching quickly
+                self.cache.put(targets[0], self.recording.tick(targets[0]))
+        except BaseException as e:
+            self._error = e
+
+    def _run_simulator(self):
+        try:
+            while not self._closed:
+                tick = self.simulator.next_simulation_tick()
+                while not self._closed:
+                    try:
+                        self._simulated.put(tick, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except BaseException as e:
+            self._error = e
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Background playback failed") from self._error
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        if self._worker is not None:
+            self._worker.join()
+        if self.mode == PlayerMode.FILE:
+            self.recording.close()
+
     def tick_count(self) -> int:
         if self.mode == PlayerMode.SIMULATOR:
-            return self.simulator._current_tick_number
+            # Ticks handed out so far (the simulator may be ahead)
+            return self.tick
         elif self.mode == PlayerMode.FILE:
-            return len(self.data)
+            return len(self.recording)
         else:
-            raise ValueError("Invalid mode")
\ No newline at end of file
+            raise ValueError("Invalid mode")
@@ -1,21 +1,43 @@
-import json
+from typing import Optional
 
 from ecosystem_simulation.simulator import *
+from ecosystem_simulation.recording import KEYFRAME_INTERVAL, Codec, RecordingWriter, TickEncoder, write_recording, check_options
 
 class SimulationRecorder:
-    def __init__(self, simulator: EcosystemSimulator):
-        self.data = []
+    """
+    Records every tick of a simulator, as a keyframe every `keyframe_interval` ticks and deltas in between.
+
+    Without `filename` the encoded ticks are kept in memory until `save`. With `filename`
+    every tick is streamed to that file as it is simulated (from a background writer thread),
+    and the recording has to be finished with `close`. Chunks are compressed with `codec`.
+    """
+    def __init__(self, simulator: EcosystemSimulator, filename: Optional[str] = None, keyframe_interval: int = KEYFRAME_INTERVAL,
+                 codec: Codec = Codec.NONE):
+        check_options(simulator.options)
+        # Encoded tick chunks (see `ecosystem_simulation.recording`)
+        self.data: list[bytes] = []
         self.options = simulator.options
+        self.keyframe_interval = keyframe_interval
+        self.codec = codec
+        self.encoder = TickEncoder(keyframe_interval)
+        self.writer = RecordingWriter(filename, simulator.options, keyframe_interval=keyframe_interval, codec=codec) if filename is not None else None
         simulator._on_tick = self.recordTick
 
     def recordTick(self, tick: SimulatedTick):
-        self.data.append(tick.serialize())
+        if self.writer is not None:
+            self.writer.write_tick(tick)
+        else:
+            self.data.append(self.encoder.encode(tick))
+
+    def save(self, filename):
+        write_recording(filename, self.options, self.data, self.keyframe_interval, self.codec)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
 
-    def saveJson(self, filename):
-        with open(filename, "w") as f:
-            save_data = {
-                "options": self.options.serialize(),
-                "data": self.data
-            }
+    def __enter__(self) -> "SimulationRecorder":
+        return self
 
-            json.dump(save_data, f)
\ No newline at end of file
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,52 +1,84 @@
-import random
-from collections import defaultdict
+import numpy as np
 from dataclasses import field, dataclass
-from typing import Callable, Optional, cast
+from typing import Callable, Optional, Union, cast
 
 from .abc import SimulatorBackend, SimulatedTick
-from .fuzzy_logic import determine_state_fuzzy, State
-from .options import SimulationOptions, EntitySimulationOptions, LogicType
+from .fuzzy_logic import FuzzyStateController, FuzzyDecisionTable, State, default_controller, default_decision_table, fuzzy_inputs
+from .options import SimulationOptions, EntitySimulationOptions, LogicType, FuzzyInference
+from .profiler import TickPhase, TickProfile, TickProfiler, TickTimer
+from .events import EventLog, EventKind, DeathCause, Species, read_events, summarize_events
+from .random_stream import RandomStream, RandomStreamMode, create_random_stream
 from .models import *
+from .array_backend import ArrayEcosystemSimulator
 from sys import maxsize
 
+# Version of the simulation rules. Bump it whenever a change makes the same options simulate
+# differently, stored optimizer results of older versions are then no longer reused.
+SIMULATION_VERSION = 1
+
 class DraftSimulationState:
     grid_width: int
     grid_height: int
     entity_by_id: dict[int, Entity]
 
-    predator_by_position: dict[tuple[int, int], list[Predator]]
-    prey_by_position: dict[tuple[int, int], list[Prey]]
-    food_by_position: dict[tuple[int, int], list[Food]]
+    predator_by_position: SpatialIndex[Predator]
+    prey_by_position: SpatialIndex[Prey]
+    food_by_position: SpatialIndex[Food]
 
     food_spawning_accumulator: float
 
-    def __init__(self, grid_width: int, grid_height: int):
+    # State the draft follows, births and deaths are added to its totals
+    previous_state: Optional[SimulationState]
+    births: dict[type, int]
+    deaths: dict[type, int]
+
+    def __init__(self, grid_width: int, grid_height: int, previous_state: Optional[SimulationState] = None):
         self.grid_width = grid_width
         self.grid_height = grid_height
 
         self.entity_by_id = {}
-        self.predator_by_position = defaultdict(list)
-        self.prey_by_position = defaultdict(list)
-        self.food_by_position = defaultdict(list)
+        self.predator_by_position = SpatialIndex()
+        self.prey_by_position = SpatialIndex()
+        self.food_by_position = SpatialIndex()
 
         self.food_spawning_accumulator = 0
 
+        self.previous_state = previous_state
+        self.births = {Predator: 0, Prey: 0, Food: 0}
+        self.deaths = {Predator: 0, Prey: 0, Food: 0}
+
     def set_food_spawning_accumulator(self, value: float):
         self.food_spawning_accumulator = value
 
-    def add_predator(self, predator: Predator):
+    def add_predator(self, predator: Predator, born: bool = False):
         self.entity_by_id[predator.id] = predator
-        self.predator_by_position[predator.position.to_tuple()].append(predator)
+        self.predator_by_position.add(predator.position.to_tuple(), predator)
+        if born:
+            self.births[Predator] += 1
 
-    def add_prey(self, prey: Prey):
+    def add_prey(self, prey: Prey, born: bool = False):
         self.entity_by_id[prey.id] = prey
-        self.prey_by_position[prey.position.to_tuple()].append(prey)
+        self.prey_by_position.add(prey.position.to_tuple(), prey)
+        if born:
+            self.births[Prey] += 1
 
-    def add_food(self, food: Food):
+    def add_food(self, food: Food, born: bool = False):
+        """
+        `born` marks food spawned this tick.
+        """
         self.entity_by_id[food.id] = food
-        self.food_by_position[food.position.to_tuple()].append(food)
+        self.food_by_position.add(food.position.to_tuple(), food)
+        if born:
+            self.births[Food] += 1
+
+    def record_death(self, entity: Entity):
+        """
+        Counts an entity of the previous state that is not carried over.
+        """
+        self.deaths[type(entity)] += 1
 
     def into_final_simulation_state(self) -> SimulationState:
+        previous = self.previous_state
         return SimulationState(
             grid_width=self.grid_width,
             grid_height=self.grid_height,
@@ -54,7 +86,10 @@ class DraftSimulationState:
             predator_by_position=self.predator_by_position,
             prey_by_position=self.prey_by_position,
             food_by_position=self.food_by_position,
-            food_spawning_accumulator=self.food_spawning_accumulator
+            food_spawning_accumulator=self.food_spawning_accumulator,
+            predator_counters=(previous.predator_counters if previous else PopulationCounters()).next(self.births[Predator], self.deaths[Predator]),
+            prey_counters=(previous.prey_counters if previous else PopulationCounters()).next(self.births[Prey], self.deaths[Prey]),
+            food_counters=(previous.food_counters if previous else PopulationCounters()).next(self.births[Food], self.deaths[Food]),
         )
 
 
@@ -64,20 +99,112 @@ class EcosystemSimulator(SimulatorBackend):
     _current_tick_number: int
     _current_state: SimulationState
     _on_tick: Optional[Callable[[SimulatedTick], None]]
-    _rng: random.Random
+    _rng: RandomStream
     _entity_id_generator: int
+    _fuzzy_controller: Optional[Union[FuzzyStateController, FuzzyDecisionTable]]
+    _profiler: Optional[TickProfiler]
+    _events: Optional[EventLog]
 
     def __init__(self, options_: SimulationOptions):
+        self._configure(options_)
+        self._current_state = self._prepare_initial_state()
+
+    def _configure(self, options_: SimulationOptions):
         self.options = options_
         self._current_tick_number = 0
         self._on_tick = None
-        self._rng = random.Random(x=options_.randomness_seed)
+        self._rng = create_random_stream(options_.randomness_seed, options_.random_stream)
         self._entity_id_generator = 1
-        self._current_state = self._prepare_initial_state()
+        self._profiler = None
+        self._events = None
+        # The compiled fuzzy rule base (or decision table) is shared by all simulators in the process
+        self._fuzzy_controller = None
+        if options_.logic_determine_creature_state == LogicType.FUZZY:
+            if options_.fuzzy_inference == FuzzyInference.TABULATED:
+                self._fuzzy_controller = default_decision_table(options_.fuzzy_table_resolution)
+            else:
+                self._fuzzy_controller = default_controller()
+
+    @classmethod
+    def restore(cls, options_: SimulationOptions, tick_number: int, state: SimulationState, rng: RandomStream,
+                entity_id_generator: int) -> "EcosystemSimulator":
+        """
+        Simulator continuing from `state` at `tick_number`, without preparing an initial state.
+        """
+        simulator = cls.__new__(cls)
+        simulator._configure(options_)
+        simulator._current_tick_number = tick_number
+        simulator._current_state = state
+        simulator._rng = rng
+        simulator._entity_id_generator = entity_id_generator
+        return simulator
+
+    def save_checkpoint(self, path: str):
+        """
+        Saves the full simulator state (see `ecosystem_simulation.checkpoint`).
+        """
+        # Imported here, the checkpoint format builds on recordings, which import the simulator
+        from ecosystem_simulation.checkpoint import save_checkpoint
+        save_checkpoint(self, path)
+
+    @classmethod
+    def from_checkpoint(cls, path: str, options_: Optional[SimulationOptions] = None) -> "EcosystemSimulator":
+        """
+        Resumes a saved simulator. Passing `options_` forks a variant with other parameters
+        from the saved state (the world size must stay the same).
+        """
+        from ecosystem_simulation.checkpoint import load_checkpoint
+        return load_checkpoint(path, options_)
+
+    @property
+    def profiler(self) -> Optional[TickProfiler]:
+        return self._profiler
+
+    def enable_profiling(self, profiler: Optional[TickProfiler] = None) -> TickProfiler:
+        """
+        Records the phase timings of every following tick into `profiler` (or a new one).
+        """
+        self._profiler = profiler if profiler is not None else TickProfiler()
+        return self._profiler
+
+    def disable_profiling(self) -> Optional[TickProfiler]:
+        """
+        Stops recording timings, returns the profiler that was recording them.
+        """
+        profiler = self._profiler
+        self._profiler = None
+        return profiler
+
+    @property
+    def events(self) -> Optional[EventLog]:
+        return self._events
+
+    def enable_events(self, events: Optional[EventLog] = None) -> EventLog:
+        """
+        Logs the births, deaths, kills and matings of every following tick into `events` (or a new log).
+        The simulator never closes the log, the caller does (see `disable_events`).
+        """
+        self._events = events if events is not None else EventLog()
+        return self._events
+
+    def disable_events(self) -> Optional[EventLog]:
+        """
+        Stops logging events, returns the log that was receiving them, which the caller closes
+        if it persists events to a file.
+        """
+        events = self._events
+        self._events = None
+        return events
 
     def next_simulation_tick(self) -> SimulatedTick:
-        next_state = self._next_state()
         next_tick_number = self._current_tick_number + 1
+        profiler = self._profiler
+        timer = TickTimer(next_tick_number) if profiler is not None else None
+        next_state = self._next_state(timer)
+        if timer is not None:
+            profiler.record(timer.finish(next_state.predator_count(), next_state.prey_count(), next_state.food_count()))
+        if self._events is not None:
+            self._events.end_tick(next_tick_number)
 
         self._current_state = next_state
         self._current_tick_number = next_tick_number
@@ -175,16 +302,22 @@ class EcosystemSimulator(SimulatorBackend):
         return new_state.into_final_simulation_state()
 
 
-    def _next_state(self) -> SimulationState:
+    def _next_state(self, timer: Optional[TickTimer] = None) -> SimulationState:
         """
         Will perform a single simulation tick. Because we want to track changes
         over time, **THIS FUNCTION MUST NOT MUTATE `state`**, but instead return a new one!
+        The tick is simulated on a fork of the current state, which shares all unchanged values.
+        If `timer` is given, the time spent in each phase of the tick is recorded into it.
+        Births, deaths, kills and matings are logged into the attached `EventLog`, if any.
         """
 
-        world = self._current_state
+        world = self._current_state.fork()
         opts = self.options
+        events = self._events
 
-        new_world = DraftSimulationState(opts.world_width, opts.world_height)
+        new_world = DraftSimulationState(opts.world_width, opts.world_height, world)
+        if timer is not None:
+            timer.lap(TickPhase.FORK, len(world.entity_by_id))
 
         def add_offsprings(c: Creature, entity_opts: EntitySimulationOptions):
             num_offsprings = round(self._rng.uniform(c.genes.min_children, c.genes.max_children) * entity_opts.max_children_per_birth)
@@ -208,13 +341,15 @@ class EcosystemSimulator(SimulatorBackend):
                     'pregnant_partner_genes': None,
                 }
                 if isinstance(c, Prey):
-                    prey = Prey(**common_args)
-                    new_world.add_prey(prey)
+                    child = Prey(**common_args)
+                    new_world.add_prey(child, born=True)
                 elif isinstance(c, Predator):
-                    predator = Predator(**common_args)
-                    new_world.add_predator(predator)
+                    child = Predator(**common_args)
+                    new_world.add_predator(child, born=True)
                 else:
                     assert False
+                if events is not None:
+                    events.birth(child, c)
 
 
         def creature_update(c: Creature, entity_opts: EntitySimulationOptions) -> bool:
@@ -246,39 +381,50 @@ class EcosystemSimulator(SimulatorBackend):
 
 
         def update_state(c: Creature, entity_opts: EntitySimulationOptions):
+            # Positions and states are shared with the previous tick, so they are replaced instead of mutated
             state = c.state
+            x = c.position.x
+            y = c.position.y
             if isinstance(state, WanderingState):
                 # Note: So entities wonder in somewhat similar direction (no back and forth)
+                dir_x = state.dir_x
+                dir_y = state.dir_y
                 change_x = self._rng.choice([True, False])
                 if change_x:
-                    c.state.dir_x = max(-1, min(1, state.dir_x + self._rng.choice([-1, 0, 0, 1])))
+                    dir_x = max(-1, min(1, dir_x + self._rng.choice([-1, 0, 0, 1])))
                 else:
-                    c.state.dir_y = max(-1, min(1, state.dir_y + self._rng.choice([-1, 0, 0, 1])))
+                    dir_y = max(-1, min(1, dir_y + self._rng.choice([-1, 0, 0, 1])))
 
-                new_x = c.position.x + c.state.dir_x
-                new_y = c.position.y + c.state.dir_y
+                new_x = x + dir_x
+                new_y = y + dir_y
                 if new_x < 0 or new_x >= opts.world_width:
-                    c.state.dir_x = -c.state.dir_x
+                    dir_x = -dir_x
                 if new_y < 0 or new_y >= opts.world_height:
-                    c.state.dir_y = -c.state.dir_y
+                    dir_y = -dir_y
 
-                c.position.x += c.state.dir_x
-                c.position.y += c.state.dir_y
+                c.state = WanderingState(dir_x, dir_y)
+                x += dir_x
+                y += dir_y
             elif isinstance(state, HuntState) or isinstance(state, MateState):
                 # Move towards (same for both states)
                 target = cast(Creature, world.entity_by_id[state.target_id])
                 dir = c.position.direction_to(target.position)
-                c.position.x += dir.x
-                c.position.y += dir.y
-                if c.position == target.position and isinstance(state, HuntState):
+                x += dir.x
+                y += dir.y
+                reached = x == target.position.x and y == target.position.y
+                if reached and isinstance(state, HuntState):
                     # Multiple hunters can share a meal
                     # Hunted
+                    if events is not None:
+                        events.kill(c, target)
                     target.alive = False
                     c.satiation += entity_opts.satiation_per_feeding
                     c.satiation = min(1.0, c.satiation)
-                elif target.alive and c.position == target.position and isinstance(state, MateState):
+                elif target.alive and reached and isinstance(state, MateState):
                     # Mated
                     if not target.pregnant:
+                        if events is not None:
+                            events.mating(c, target)
                         target.pregnant = True
                         target.pregnant_duration = 0
                         target.pregnant_partner_genes = c.genes
@@ -290,48 +436,46 @@ class EcosystemSimulator(SimulatorBackend):
             elif isinstance(state, FleeState):
                 # Move away
                 dir = c.position.direction_to(world.entity_by_id[state.target_id].position)
-                c.position.x -= dir.x
-                c.position.y -= dir.y
+                x -= dir.x
+                y -= dir.y
             else:
                 assert False
 
-            c.position.x = min(max(0, c.position.x), opts.world_width - 1)
-            c.position.y = min(max(0, c.position.y), opts.world_height - 1)
+            x = min(max(0, x), opts.world_width - 1)
+            y = min(max(0, y), opts.world_height - 1)
+            if x != c.position.x or y != c.position.y:
+                c.position = WorldPosition(x=x, y=y)
 
-        def determine_creature_state_fuzzy(_creature: Creature, vision) -> any:
+        def find_fuzzy_targets(_creature: Creature, vision: int) -> tuple[Optional[int], float, Optional[int], float]:
             """
-            Common logic for determining next creature state.
+            Finds the closest food and mate of a creature (fuzzy logic inputs).
             """
+            def is_mate(mate: Creature) -> bool:
+                return mate is not _creature and mate.mature and not mate.pregnant
+
             if isinstance(_creature, Prey):
-                food_iterator = world.iter_nearby_food(_creature.position, vision)
-                mate_iterator = world.iter_nearby_prey(_creature.position, vision)
+                closest_food = world.nearest_food(_creature.position, vision)
+                closest_mate = world.nearest_prey(_creature.position, vision, is_mate)
             else:
-                food_iterator = world.iter_nearby_prey(_creature.position, vision)
-                mate_iterator = world.iter_nearby_predator(_creature.position, vision)
+                closest_food = world.nearest_prey(_creature.position, vision)
+                closest_mate = world.nearest_predator(_creature.position, vision, is_mate)
 
             # Get the closest food and mate
             closest_food_id = None
             food_dst = maxsize
-            for food in food_iterator:
-                dst = _creature.position.distance_from(food.position)
-                if dst < food_dst:
-                    closest_food_id = food.id
-                    food_dst = dst
+            if closest_food is not None:
+                closest_food_id = closest_food.id
+                food_dst = _creature.position.distance_from(closest_food.position)
 
             closest_mate_id = None
             mate_dst = maxsize
-            for mate in mate_iterator:
-                if mate == _creature:
-                    continue
-                if not mate.mature or mate.pregnant:
-                    continue
-                dst = _creature.position.distance_from(mate.position)
-                if dst < mate_dst:
-                    closest_mate_id = mate.id
-                    mate_dst = dst
+            if closest_mate is not None:
+                closest_mate_id = closest_mate.id
+                mate_dst = _creature.position.distance_from(closest_mate.position)
 
-            _new_state = determine_state_fuzzy(_creature, vision, food_dst, mate_dst)
+            return closest_food_id, food_dst, closest_mate_id, mate_dst
 
+        def fuzzy_state_to_entity_state(_new_state: State, closest_food_id: Optional[int], closest_mate_id: Optional[int]) -> EntityState:
             # In case the creature wants to mate or eat food without having a nearby target
             # (If the fuzzy logic is correctly constructed this should not occur)
             if _new_state == State.FOOD and not closest_food_id or \
@@ -345,22 +489,54 @@ class EcosystemSimulator(SimulatorBackend):
             else:
                 return WanderingState(self._rng.randint(-1, 1), self._rng.randint(-1, 1))
 
-
-        def determine_prey_state(prey: Prey, logic: LogicType) -> EntityState:
+        def process_creatures_fuzzy(creatures: list[Creature], entity_opts: EntitySimulationOptions):
+            """
+            Updates all creatures of one species with a single batched fuzzy inference.
+            All of them decide on the world as it was before any of them moved this tick.
+            """
+            movers = []
+            for c in creatures:
+                if not c.alive:
+                    continue
+                moves = creature_update(c, entity_opts)
+                if timer is not None:
+                    timer.lap(TickPhase.METABOLISM)
+                if not moves:
+                    continue
+                vision = round(c.genes.vision * opts.max_vision_distance)
+                movers.append((c, vision, *find_fuzzy_targets(c, vision)))
+                if timer is not None:
+                    timer.lap(TickPhase.DECIDE)
+
+            if len(movers) == 0:
+                return
+
+            states = self._fuzzy_controller.determine_states(np.array([
+                fuzzy_inputs(c, vision, food_dst, mate_dst)
+                for c, vision, _, food_dst, _, mate_dst in movers
+            ]))
+            if timer is not None:
+                timer.lap(TickPhase.DECIDE, 0)
+            for (c, _, closest_food_id, _, closest_mate_id, _), fuzzy_state in zip(movers, states):
+                new_state = fuzzy_state_to_entity_state(fuzzy_state, closest_food_id, closest_mate_id)
+                if not (isinstance(new_state, WanderingState) and isinstance(c.state, WanderingState)):
+                    # Note: WanderingState should remain the same...
+                    c.state = new_state
+                if timer is not None:
+                    timer.lap(TickPhase.DECIDE, 0)
+
+                update_state(c, entity_opts)
+                if timer is not None:
+                    timer.lap(TickPhase.MOVE)
+
+
+        def determine_prey_state(prey: Prey) -> EntityState:
             vision = round(prey.genes.vision * opts.max_vision_distance)
 
-            if logic == LogicType.FUZZY:
-                return determine_creature_state_fuzzy(prey, vision)
-
             # Check flee first (highest priority for survival)
-            closest_pred = None
-            pred_dst = opts.world_width * opts.world_height
-            for pred in world.iter_nearby_predator(prey.position, vision):
-                dst = prey.position.distance_from(pred.position)
-                if dst < pred_dst:
-                    closest_pred = pred
-                    pred_dst = dst
+            closest_pred = world.nearest_predator(prey.position, vision)
             if closest_pred is not None:
+                pred_dst = prey.position.distance_from(closest_pred.position)
                 flee_threshold = prey.genes.timidity * (1 / max(1, pred_dst))
                 #print(pred_dst, (1 / max(1, pred_dst)))
                 if flee_threshold > 0.2: # Arbitrary (maybe put in options?)
@@ -368,68 +544,32 @@ class EcosystemSimulator(SimulatorBackend):
 
             # Check hunting (when hungry)
             if prey.satiation < prey.genes.appetite:
-                closest_food = None
-                food_dst = opts.world_width * opts.world_height
-                for food in world.iter_nearby_food(prey.position, vision):
-                    dst = prey.position.distance_from(food.position)
-                    if dst < food_dst:
-                        closest_food = food
-                        food_dst = dst
+                closest_food = world.nearest_food(prey.position, vision)
                 if closest_food is not None:
                     return HuntState(closest_food.id)
 
             # Check mating (only when mature, not hungry, not already pregnant and horny)
             if prey.satiation > 0.2 and prey.mature and not prey.pregnant and prey.reproductive_urge > 1.0:
-                closest_mate = None
-                mate_dst = opts.world_width * opts.world_height
-                for mate in world.iter_nearby_prey(prey.position, vision):
-                    if mate == prey:
-                        continue
-                    if not mate.mature or mate.pregnant:
-                        continue
-                    dst = prey.position.distance_from(mate.position)
-                    if dst < mate_dst:
-                        closest_mate = mate
-                        mate_dst = dst
+                closest_mate = world.nearest_prey(prey.position, vision, lambda mate: mate is not prey and mate.mature and not mate.pregnant)
                 if closest_mate is not None:
                     return MateState(closest_mate.id)
 
             # Wander
             return WanderingState(self._rng.randint(-1, 1), self._rng.randint(-1, 1))
 
-        def determine_predator_state(pred: Predator, logic: LogicType) -> EntityState:
+        def determine_predator_state(pred: Predator) -> EntityState:
             vision = round(pred.genes.vision * opts.max_vision_distance)
 
-            if logic == LogicType.FUZZY:
-                return determine_creature_state_fuzzy(pred, vision)
-
-
             # No need to flee
             # Check hunting (when hungry)
             if pred.satiation < pred.genes.appetite:
-                closest_food = None
-                food_dst = opts.world_width * opts.world_height
-                for food in world.iter_nearby_prey(pred.position, vision):
-                    dst = pred.position.distance_from(food.position)
-                    if dst < food_dst:
-                        closest_food = food
-                        food_dst = dst
+                closest_food = world.nearest_prey(pred.position, vision)
                 if closest_food is not None:
                     return HuntState(closest_food.id)
 
             # Check mating
             if pred.satiation > 0.2 and pred.mature and not pred.pregnant  and pred.reproductive_urge > 1.0:
-                closest_mate = None
-                mate_dst = opts.world_width * opts.world_height
-                for mate in world.iter_nearby_predator(pred.position, vision):
-                    if mate == pred:
-                        continue
-                    if not mate.mature or mate.pregnant:
-                        continue
-                    dst = pred.position.distance_from(mate.position)
-                    if dst < mate_dst:
-                        closest_mate = mate
-                        mate_dst = dst
+                closest_mate = world.nearest_predator(pred.position, vision, lambda mate: mate is not pred and mate.mature and not mate.pregnant)
                 if closest_mate is not None:
                     return MateState(closest_mate.id)
 
@@ -440,62 +580,97 @@ class EcosystemSimulator(SimulatorBackend):
         def check_creature_aliveness(c: Creature, max_age: int):
             c.age_ticks += 1
             if c.age_ticks >= round(c.genes.lifespan * max_age):
+                if events is not None:
+                    events.mark_death(c, DeathCause.AGE)
                 c.alive = False
             if c.satiation <= 0:
+                if events is not None:
+                    events.mark_death(c, DeathCause.STARVATION)
                 c.alive = False
 
         # END HELPER FUNCTIONS FOR NEXT STATE #########################################################################
 
-        # Process all predators
-        for predator in list(world.predators()):
-            if not predator.alive:
-                continue
-            if not creature_update(predator, opts.predator):
-                continue
+        if opts.logic_determine_creature_state == LogicType.FUZZY:
+            process_creatures_fuzzy(list(world.predators()), opts.predator)
+            process_creatures_fuzzy(list(world.prey()), opts.prey)
+        else:
+            # Process all predators
+            for predator in list(world.predators()):
+                if not predator.alive:
+                    continue
+                moves = creature_update(predator, opts.predator)
+                if timer is not None:
+                    timer.lap(TickPhase.METABOLISM)
+                if not moves:
+                    continue
 
-            new_state = determine_predator_state(predator, opts.logic_determine_creature_state)
-            if not (isinstance(new_state, WanderingState) and isinstance(predator.state, WanderingState)):
-                # Note: WanderingState should remain the same...
-                predator.state = new_state
+                new_state = determine_predator_state(predator)
+                if not (isinstance(new_state, WanderingState) and isinstance(predator.state, WanderingState)):
+                    # Note: WanderingState should remain the same...
+                    predator.state = new_state
+                if timer is not None:
+                    timer.lap(TickPhase.DECIDE)
 
-            update_state(predator, opts.predator)
+                update_state(predator, opts.predator)
+                if timer is not None:
+                    timer.lap(TickPhase.MOVE)
 
-        # Process all prey
-        for prey in list(world.prey()):
-            if not prey.alive:
-                continue
-            if not creature_update(prey, opts.prey):
-                continue
+            # Process all prey
+            for prey in list(world.prey()):
+                if not prey.alive:
+                    continue
+                moves = creature_update(prey, opts.prey)
+                if timer is not None:
+                    timer.lap(TickPhase.METABOLISM)
+                if not moves:
+                    continue
 
-            new_state = determine_prey_state(prey, opts.logic_determine_creature_state)
-            if not (isinstance(new_state, WanderingState) and isinstance(prey.state, WanderingState)):
-                # Note: WanderingState should remain the same...
-                prey.state = new_state
+                new_state = determine_prey_state(prey)
+                if not (isinstance(new_state, WanderingState) and isinstance(prey.state, WanderingState)):
+                    # Note: WanderingState should remain the same...
+                    prey.state = new_state
+                if timer is not None:
+                    timer.lap(TickPhase.DECIDE)
 
-            update_state(prey, opts.prey)
+                update_state(prey, opts.prey)
+                if timer is not None:
+                    timer.lap(TickPhase.MOVE)
 
         for prey in world.prey():
             check_creature_aliveness(prey, opts.predator.max_age_in_ticks)
         for predator in world.predators():
             check_creature_aliveness(predator, opts.predator.max_age_in_ticks)
+        if timer is not None:
+            timer.lap(TickPhase.ALIVENESS, world.predator_count() + world.prey_count())
 
         # Overcrowding (no more than two entities can present on the same place)
         for _, values in world.prey_by_position.items():
             if len(values) >= 3:
+                if events is not None:
+                    events.mark_death(values[0], DeathCause.OVERCROWDING)
                 values[0].alive = False
         for _, values in world.predator_by_position.items():
             if len(values) >= 3:
+                if events is not None:
+                    events.mark_death(values[0], DeathCause.OVERCROWDING)
                 values[0].alive = False
+        if timer is not None:
+            timer.lap(TickPhase.OVERCROWDING, len(world.prey_by_position) + len(world.predator_by_position))
 
         # Update food age ticks
         for food in world.food():
             food.age_ticks += 1
             if food.age_ticks >= opts.food_item_life_tick:
                 food.alive = False
+        if timer is not None:
+            timer.lap(TickPhase.FOOD_AGING, world.food_count())
 
         # Copy all old entities to the new state
         for entity in world.iter_entities():
             if not entity.alive:
+                new_world.record_death(entity)
+                if events is not None:
+                    events.death(entity)
                 continue
             if isinstance(entity, Food):
                 new_world.add_food(entity)
@@ -505,6 +680,8 @@ class EcosystemSimulator(SimulatorBackend):
                 new_world.add_predator(entity)
             else:
                 assert False
+        if timer is not None:
+            timer.lap(TickPhase.COPY, len(world.entity_by_id))
 
         # Spawns some additional food based on the spawning rate.
         new_food_spawning_accumulator = world.food_spawning_accumulator + self.options.food_item_spawning_rate_per_tick
@@ -517,12 +694,15 @@ class EcosystemSimulator(SimulatorBackend):
                 age_ticks=0,
                 max_age=self.options.food_item_life_tick,
                 position=self._random_position()
-            ))
+            ), born=True)
             new_food_spawning_accumulator -= 1.0
 
         new_world.set_food_spawning_accumulator(new_food_spawning_accumulator)
 
-        return new_world.into_final_simulation_state()
+        next_state = new_world.into_final_simulation_state()
+        if timer is not None:
+            timer.lap(TickPhase.FOOD_SPAWNING, new_world.births[Food])
+        return next_state
 
     def _gen_entity_id(self):
         self._entity_id_generator += 1
@@ -0,0 +1,491 @@
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from .abc import SimulatorBackend, SimulatedTick
+from .fuzzy_logic import FuzzyStateController, FuzzyDecisionTable, State, default_controller, default_decision_table, output_state_values
+from .options import SimulationOptions, EntitySimulationOptions, LogicType, FuzzyInference
+from .models.columnar import CreatureColumns, FoodColumns, ColumnarSimulationState, StateKind, GENE_FIELDS, GENE_INDEX
+
+APPETITE = GENE_INDEX['appetite']
+LIFESPAN = GENE_INDEX['lifespan']
+MATURITY_AGE = GENE_INDEX['maturity_age']
+GESTATION_AGE = GENE_INDEX['gestation_age']
+SPEED = GENE_INDEX['speed']
+MIN_CHILDREN = GENE_INDEX['min_children']
+MAX_CHILDREN = GENE_INDEX['max_children']
+VISION = GENE_INDEX['vision']
+REPRODUCTIVE_URGE_QUICKNESS = GENE_INDEX['reproductive_urge_quickness']
+TIMIDITY = GENE_INDEX['timidity']
+
+# Gene ranges of initially spawned creatures (same as `EcosystemSimulator`)
+INITIAL_GENE_RANGES = {
+    'appetite': (0.2, 0.8),
+    'lifespan': (0.8, 1.0),
+    'maturity_age': (0.2, 0.6),
+    'gestation_age': (0.2, 0.6),
+    'speed': (0.1, 0.8),
+    'min_children': (0.1, 0.3),
+    'max_children': (0.4, 0.6),
+    'vision': (0.3, 0.6),
+    'reproductive_urge_quickness': (0.2, 0.8),
+    'timidity': (0.2, 0.8),
+}
+
+# Wandering direction changes, drawn uniformly (same as `EcosystemSimulator`)
+WANDER_DIRECTION_CHANGES = np.array([-1, 0, 0, 1])
+
+
+def _ranges(counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of `np.arange(count)` for every count.
+    """
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def nearest_in_window(qx: np.ndarray, qy: np.ndarray, radius: np.ndarray, tx: np.ndarray, ty: np.ndarray,
+                      width: int, height: int, eligible: Optional[np.ndarray] = None,
+                      exclude: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every query position finds the closest target inside the window
+    `[x - radius, x + radius) x [y - radius, y + radius)`, the window `SimulationState.iter_nearby_*` scans.
+    Equally distant targets are resolved like the scan does: by cell x, cell y and then row order.
+
+    `eligible` masks the targets that can be found, `exclude` holds a target row per query to skip (itself).
+    Returns the closest target rows (-1 where there is none) and their distances (inf where there is none).
+    """
+    m = len(qx)
+    rows = np.full(m, -1, dtype=np.int64)
+    distances = np.full(m, np.inf)
+    if m == 0 or len(tx) == 0:
+        return rows, distances
+
+    # Targets sorted by cell, the sort is stable so rows keep their order within a cell
+    cells = tx * height + ty
+    order = np.argsort(cells, kind='stable')
+    cell_start = np.zeros(width * height + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=width * height), out=cell_start[1:])
+
+    x0 = np.maximum(qx - radius, 0)
+    x1 = np.minimum(qx + radius, width)
+    y0 = np.maximum(qy - radius, 0)
+    y1 = np.minimum(qy + radius, height)
+    columns = np.where(y1 > y0, np.maximum(x1 - x0, 0), 0)
+
+    # Every window column is a contiguous range of the sorted targets
+    column_query = np.repeat(np.arange(m), columns)
+    column_x = x0[column_query] + _ranges(columns)
+    lo = cell_start[column_x * height + y0[column_query]]
+    hi = cell_start[column_x * height + y1[column_query]]
+    counts = hi - lo
+
+    pair_query = np.repeat(column_query, counts)
+    pair_target = order[np.repeat(lo, counts) + _ranges(counts)]
+    if eligible is not None or exclude is not None:
+        keep = np.ones(len(pair_query), dtype=bool)
+        if eligible is not None:
+            keep &= eligible[pair_target]
+        if exclude is not None:
+            keep &= pair_target != exclude[pair_query]
+        pair_query = pair_query[keep]
+        pair_target = pair_target[keep]
+    if len(pair_query) == 0:
+        return rows, distances
+
+    distances_sq = (tx[pair_target] - qx[pair_query]) ** 2 + (ty[pair_target] - qy[pair_query]) ** 2
+    # lexsort is stable, so equally distant targets stay in scan order
+    by_distance = np.lexsort((distances_sq, pair_query))
+    pair_query = pair_query[by_distance]
+    first = np.ones(len(pair_query), dtype=bool)
+    first[1:] = pair_query[1:] != pair_query[:-1]
+    rows[pair_query[first]] = pair_target[by_distance][first]
+    distances[pair_query[first]] = np.sqrt(distances_sq[by_distance][first])
+    return rows, distances
+
+
+class ArrayEcosystemSimulator(SimulatorBackend):
+    """
+    Simulator storing creatures and food as columns (see `models.columnar`) and updating
+    a whole species at once with NumPy array operations.
+
+    Follows the rules of `EcosystemSimulator`, except:
+    - All creatures of a species decide and move based on the world as it was at the start
+      of their phase (predators still move before prey), instead of seeing the changes of
+      creatures updated before them.
+    - Random numbers come from a NumPy generator, so a seed gives a different (but reproducible)
+      run than with `EcosystemSimulator`.
+    - Spawned food, creatures and offspring are always placed inside the world.
+    """
+    options: SimulationOptions
+    _current_tick_number: int
+    _current_state: ColumnarSimulationState
+    _on_tick: Optional[Callable[[SimulatedTick], None]]
+    _rng: np.random.Generator
+    _entity_id_generator: int
+    _fuzzy_controller: Optional[Union[FuzzyStateController, FuzzyDecisionTable]]
+
+    def __init__(self, options_: SimulationOptions):
+        self.options = options_
+        self._current_tick_number = 0
+        self._on_tick = None
+        self._rng = np.random.default_rng(options_.randomness_seed)
+        self._entity_id_generator = 1
+        self._fuzzy_controller = None
+        if options_.logic_determine_creature_state == LogicType.FUZZY:
+            if options_.fuzzy_inference == FuzzyInference.TABULATED:
+                self._fuzzy_controller = default_decision_table(options_.fuzzy_table_resolution)
+            else:
+                self._fuzzy_controller = default_controller()
+        self._current_state = self._prepare_initial_state()
+
+    def next_simulation_tick(self) -> SimulatedTick:
+        next_state = self._next_state()
+        next_tick_number = self._current_tick_number + 1
+
+        self._current_state = next_state
+        self._current_tick_number = next_tick_number
+
+        if self._on_tick is not None:
+            self._on_tick(SimulatedTick(
+                tick_number=next_tick_number,
+                state=next_state
+            ))
+
+        return SimulatedTick(
+            tick_number=next_tick_number,
+            state=next_state
+        )
+
+    def _gen_entity_ids(self, n: int) -> np.ndarray:
+        ids = np.arange(self._entity_id_generator + 1, self._entity_id_generator + 1 + n, dtype=np.int64)
+        self._entity_id_generator += n
+        return ids
+
+    def _random_positions(self, n: int) -> tuple[np.ndarray, np.ndarray]:
+        return (self._rng.integers(0, self.options.world_width, n),
+                self._rng.integers(0, self.options.world_height, n))
+
+    def _spawn_creatures(self, n: int, satiation: float) -> CreatureColumns:
+        c = CreatureColumns.empty(n)
+        c.id = self._gen_entity_ids(n)
+        c.x, c.y = self._random_positions(n)
+
+        lows, highs = np.array([INITIAL_GENE_RANGES[name] for name in GENE_FIELDS]).T
+        c.genes = lows + (highs - lows) * self._rng.random((n, len(GENE_FIELDS)))
+        c.partner_genes = c.genes.copy()
+
+        mature = self._rng.random(n) < 0.5
+        pregnant = mature & (self._rng.random(n) < 0.5)
+        c.flags = CreatureColumns.pack_flags(mature, pregnant)
+        c.reproductive_urge = np.where(mature, self._rng.uniform(0, 0.5, n), 0.0)
+        c.pregnant_duration = np.where(pregnant, self._rng.random(n), 0.0)
+
+        c.age_ticks = self._rng.integers(0, 81, n)
+        c.generation[:] = 1
+        c.move_accum = self._rng.random(n)
+        c.satiation[:] = satiation
+        return c
+
+    def _spawn_food(self, n: int, random_age: bool) -> FoodColumns:
+        food = FoodColumns.empty(n)
+        food.id = self._gen_entity_ids(n)
+        food.x, food.y = self._random_positions(n)
+        if random_age:
+            food.age_ticks = self._rng.integers(0, self.options.food_item_life_tick + 1, n)
+        return food
+
+    def _prepare_initial_state(self) -> ColumnarSimulationState:
+        opts = self.options
+        predators = self._spawn_creatures(opts.predator.initial_number, opts.predator.initial_satiation_on_spawn)
+        # Prey also spawn with the predator satiation (same as `EcosystemSimulator`)
+        prey = self._spawn_creatures(opts.prey.initial_number, opts.predator.initial_satiation_on_spawn)
+        food = self._spawn_food(opts.initial_number_of_food_items, random_age=True)
+        return ColumnarSimulationState(opts.world_width, opts.world_height, predators, prey, food,
+                                       opts.food_item_life_tick, 0)
+
+    def _next_state(self) -> ColumnarSimulationState:
+        """
+        Performs a single simulation tick. The columns of the current state are copied
+        before they are updated, so returned states are never mutated afterwards.
+        """
+        world = self._current_state
+        opts = self.options
+
+        predators = world.predator_columns.copy()
+        prey = world.prey_columns.copy()
+        food = world.food_columns.copy()
+        predators_alive = np.ones(len(predators), dtype=bool)
+        prey_alive = np.ones(len(prey), dtype=bool)
+        food_alive = np.ones(len(food), dtype=bool)
+
+        # Overcrowding looks at the cells creatures occupied at the start of the tick
+        predator_cells = predators.x * opts.world_height + predators.y
+        prey_cells = prey.x * opts.world_height + prey.y
+
+        predator_offspring = self._update_species(predators, predators_alive, opts.predator,
+                                                  prey, prey_alive, threats=None)
+        prey_offspring = self._update_species(prey, prey_alive, opts.prey,
+                                              food, food_alive, threats=predators)
+
+        for c, alive in ((prey, prey_alive), (predators, predators_alive)):
+            # Prey also use the predator max age (same as `EcosystemSimulator`)
+            c.age_ticks += 1
+            alive &= c.age_ticks < np.rint(c.genes[:, LIFESPAN] * opts.predator.max_age_in_ticks)
+            alive &= c.satiation > 0
+
+        # Overcrowding (no more than two entities can present on the same place)
+        for cells, alive in ((prey_cells, prey_alive), (predator_cells, predators_alive)):
+            _, first, counts = np.unique(cells, return_index=True, return_counts=True)
+            alive[first[counts >= 3]] = False
+
+        # Update food age ticks
+        food.age_ticks += 1
+        food_alive &= food.age_ticks < opts.food_item_life_tick
+
+        # Spawns some additional food based on the spawning rate.
+        new_food_spawning_accumulator = world.food_spawning_accumulator + opts.food_item_spawning_rate_per_tick
+        spawned = 0
+        if world.food_count() < opts.max_number_of_food_items and new_food_spawning_accumulator >= 1.0:
+            spawned = int(new_food_spawning_accumulator)
+            new_food_spawning_accumulator -= spawned
+
+        return ColumnarSimulationState(
+            opts.world_width, opts.world_height,
+            CreatureColumns.concatenate([predator_offspring, predators.take(predators_alive)]),
+            CreatureColumns.concatenate([prey_offspring, prey.take(prey_alive)]),
+            FoodColumns.concatenate([food.take(food_alive), self._spawn_food(spawned, random_age=False)]),
+            opts.food_item_life_tick,
+            new_food_spawning_accumulator,
+            predator_counters=world.predator_counters.next(len(predator_offspring), int(np.count_nonzero(~predators_alive))),
+            prey_counters=world.prey_counters.next(len(prey_offspring), int(np.count_nonzero(~prey_alive))),
+            food_counters=world.food_counters.next(spawned, int(np.count_nonzero(~food_alive))),
+        )
+
+    def _update_species(self, c: CreatureColumns, alive: np.ndarray, entity_opts: EntitySimulationOptions,
+                        food: Union[CreatureColumns, FoodColumns], food_alive: np.ndarray,
+                        threats: Optional[CreatureColumns]) -> CreatureColumns:
+        """
+        Updates, decides and moves all alive creatures of one species. Eaten food is marked in `food_alive`.
+        Returns the offspring born this tick.
+        """
+        mature = c.mature
+        pregnant = c.pregnant
+
+        movers, offspring = self._creature_update(c, alive, mature, pregnant, entity_opts)
+        rows = np.flatnonzero(movers)
+        if self.options.logic_determine_creature_state == LogicType.FUZZY:
+            kinds, targets = self._determine_states_fuzzy(c, rows, mature, pregnant, food)
+        else:
+            kinds, targets = self._determine_states(c, rows, mature, pregnant, food, threats)
+        self._update_states(c, rows, kinds, targets, alive, mature, pregnant, food, food_alive, entity_opts)
+
+        c.flags = CreatureColumns.pack_flags(mature, pregnant)
+        return offspring
+
+    def _creature_update(self, c: CreatureColumns, alive: np.ndarray, mature: np.ndarray, pregnant: np.ndarray,
+                         entity_opts: EntitySimulationOptions) -> tuple[np.ndarray, CreatureColumns]:
+        """
+        Vectorized `creature_update` of `EcosystemSimulator`.
+        Returns the mask of creatures moving this tick and the offspring.
+        """
+        genes = c.genes
+
+        c.satiation[alive] -= entity_opts.satiation_loss_per_tick * (1 + genes[alive, SPEED] / 10 + genes[alive, VISION] / 20)
+        carrying = alive & pregnant
+        c.satiation[carrying] -= (genes[carrying, MIN_CHILDREN] + genes[carrying, MAX_CHILDREN]) / 200
+        urging = alive & mature & ~pregnant
+        c.reproductive_urge[urging] += genes[urging, REPRODUCTIVE_URGE_QUICKNESS]
+        mature |= alive & ~urging & (c.age_ticks >= genes[:, MATURITY_AGE] * entity_opts.max_juvenile_in_ticks)
+
+        # Check gestation completion
+        c.pregnant_duration[carrying] += 1
+        births = carrying & (c.pregnant_duration > np.rint(genes[:, GESTATION_AGE] * entity_opts.max_gestation_in_ticks))
+        offspring = self._offspring(c, np.flatnonzero(births), entity_opts)
+        pregnant[births] = False
+        c.pregnant_duration[births] = 0
+
+        c.move_accum[alive] += genes[alive, SPEED] / np.where(pregnant[alive], 1.1, 1)
+        movers = alive & (c.move_accum >= 1)
+        c.move_accum[movers] -= 1
+        return movers, offspring
+
+    def _offspring(self, c: CreatureColumns, parents: np.ndarray, entity_opts: EntitySimulationOptions) -> CreatureColumns:
+        opts = self.options
+        min_children = c.genes[parents, MIN_CHILDREN]
+        max_children = c.genes[parents, MAX_CHILDREN]
+        fertility = min_children + (max_children - min_children) * self._rng.random(len(parents))
+        counts = np.maximum(np.rint(fertility * entity_opts.max_children_per_birth).astype(np.int64), 0)
+        parent = np.repeat(parents, counts)
+        n = len(parent)
+
+        # Same as `Genes.mix`
+        genes = (c.genes[parent] + c.partner_genes[parent]) / 2
+        magnitude = opts.child_gene_mutation_magnitude_when_mating
+        mutated = self._rng.random(genes.shape) < opts.child_gene_mutation_chance_when_mating
+        genes += np.where(mutated, self._rng.uniform(-magnitude, magnitude, genes.shape), 0.0)
+        genes = np.clip(genes, 0.0, 1.0)
+        genes[:, MIN_CHILDREN] = np.minimum(genes[:, MIN_CHILDREN], genes[:, MAX_CHILDREN])
+
+        children = CreatureColumns.empty(n)
+        children.id = self._gen_entity_ids(n)
+        children.x = np.clip(c.x[parent] + self._rng.integers(-1, 2, n), 0, opts.world_width - 1)
+        children.y = np.clip(c.y[parent] + self._rng.integers(-1, 2, n), 0, opts.world_height - 1)
+        children.generation = c.generation[parent] + 1
+        children.satiation[:] = entity_opts.initial_satiation_on_spawn
+        children.genes = genes
+        return children
+
+    def _nearest(self, c: CreatureColumns, rows: np.ndarray, vision: np.ndarray,
+                 targets: Union[CreatureColumns, FoodColumns], eligible: Optional[np.ndarray] = None,
+                 exclude_self: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        return nearest_in_window(c.x[rows], c.y[rows], vision, targets.x, targets.y,
+                                 self.options.world_width, self.options.world_height,
+                                 eligible=eligible, exclude=rows if exclude_self else None)
+
+    def _determine_states(self, c: CreatureColumns, rows: np.ndarray, mature: np.ndarray, pregnant: np.ndarray,
+                          food: Union[CreatureColumns, FoodColumns],
+                          threats: Optional[CreatureColumns]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized `determine_prey_state` (with `threats`) and `determine_predator_state`.
+        Returns the state kinds and target rows (of `food`, or `c` when mating).
+        """
+        vision = np.rint(c.genes[rows, VISION] * self.options.max_vision_distance).astype(np.int64)
+        kinds = np.full(len(rows), StateKind.WANDERING, dtype=np.int8)
+        targets = np.full(len(rows), -1, dtype=np.int64)
+        undecided = np.ones(len(rows), dtype=bool)
+
+        # Check flee first (highest priority for survival)
+        if threats is not None:
+            threat_rows, threat_distances = self._nearest(c, rows, vision, threats)
+            flee = (threat_rows >= 0) & (c.genes[rows, TIMIDITY] * (1 / np.maximum(1, threat_distances)) > 0.2)
+            kinds[flee] = StateKind.FLEE
+            undecided &= ~flee
+
+        # Check hunting (when hungry)
+        hungry = np.flatnonzero(undecided & (c.satiation[rows] < c.genes[rows, APPETITE]))
+        food_rows, _ = self._nearest(c, rows[hungry], vision[hungry], food)
+        hunting = hungry[food_rows >= 0]
+        kinds[hunting] = StateKind.HUNT
+        targets[hunting] = food_rows[food_rows >= 0]
+        undecided[hunting] = False
+
+        # Check mating (only when mature, not hungry, not already pregnant and horny)
+        horny = np.flatnonzero(undecided & (c.satiation[rows] > 0.2) & mature[rows] & ~pregnant[rows] & (c.reproductive_urge[rows] > 1.0))
+        mate_rows, _ = self._nearest(c, rows[horny], vision[horny], c, eligible=mature & ~pregnant, exclude_self=True)
+        mating = horny[mate_rows >= 0]
+        kinds[mating] = StateKind.MATE
+        targets[mating] = mate_rows[mate_rows >= 0]
+        return kinds, targets
+
+    def _determine_states_fuzzy(self, c: CreatureColumns, rows: np.ndarray, mature: np.ndarray, pregnant: np.ndarray,
+                                food: Union[CreatureColumns, FoodColumns]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Fuzzy logic counterpart of `_determine_states`, with one batched inference for all creatures.
+        """
+        vision = np.rint(c.genes[rows, VISION] * self.options.max_vision_distance).astype(np.int64)
+        food_rows, food_distances = self._nearest(c, rows, vision, food)
+        mate_rows, mate_distances = self._nearest(c, rows, vision, c, eligible=mature & ~pregnant, exclude_self=True)
+
+        def distance_input(distances: np.ndarray, found: np.ndarray) -> np.ndarray:
+            # Same as `fuzzy_inputs`, targets out of range are at distance 15
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scaled = np.where(found, distances / vision * 10, 15.0)
+            return np.where(distances == 0, 0.0, scaled)
+
+        inputs = np.column_stack([
+            c.genes[rows] * 10,
+            c.satiation[rows] * 10,
+            c.reproductive_urge[rows] * 10,
+            distance_input(mate_distances, mate_rows >= 0),
+            distance_input(food_distances, food_rows >= 0),
+            np.where(pregnant[rows], 10.0, 0.0),
+            np.where(mature[rows], 10.0, 0.0),
+        ])
+        states = output_state_values(self._fuzzy_controller.batch_outputs(inputs))
+
+        kinds = np.full(len(rows), StateKind.WANDERING, dtype=np.int8)
+        targets = np.full(len(rows), -1, dtype=np.int64)
+        # Creatures wanting to eat or mate without a nearby target wander
+        hunting = (states == State.FOOD.value) & (food_rows >= 0)
+        kinds[hunting] = StateKind.HUNT
+        targets[hunting] = food_rows[hunting]
+        mating = (states == State.REPRODUCTION.value) & (mate_rows >= 0)
+        kinds[mating] = StateKind.MATE
+        targets[mating] = mate_rows[mating]
+        return kinds, targets
+
+    def _update_states(self, c: CreatureColumns, rows: np.ndarray, kinds: np.ndarray, targets: np.ndarray,
+                       alive: np.ndarray, mature: np.ndarray, pregnant: np.ndarray,
+                       food: Union[CreatureColumns, FoodColumns], food_alive: np.ndarray,
+                       entity_opts: EntitySimulationOptions):
+        """
+        Vectorized `update_state` of `EcosystemSimulator`, moving all creatures at once.
+        """
+        opts = self.options
+        start_x = c.x.copy()
+        start_y = c.y.copy()
+
+        # Note: WanderingState should remain the same...
+        starts_wandering = rows[(kinds == StateKind.WANDERING) & (c.state_kind[rows] != StateKind.WANDERING)]
+        c.state_dir_x[starts_wandering] = self._rng.integers(-1, 2, len(starts_wandering))
+        c.state_dir_y[starts_wandering] = self._rng.integers(-1, 2, len(starts_wandering))
+        c.state_kind[rows] = kinds
+        c.state_target[rows] = -1
+        hunt = kinds == StateKind.HUNT
+        mate = kinds == StateKind.MATE
+        flee = kinds == StateKind.FLEE
+        c.state_target[rows[hunt]] = food.id[targets[hunt]]
+        c.state_target[rows[mate]] = c.id[targets[mate]]
+        # Fleeing creatures target themselves, so (same as `EcosystemSimulator`) they stay in place
+        c.state_target[rows[flee]] = c.id[rows[flee]]
+
+        # Wander, so entities wonder in somewhat similar direction (no back and forth)
+        wanderers = rows[kinds == StateKind.WANDERING]
+        n = len(wanderers)
+        change_x = self._rng.random(n) < 0.5
+        change = WANDER_DIRECTION_CHANGES[self._rng.integers(0, len(WANDER_DIRECTION_CHANGES), n)]
+        dir_x = c.state_dir_x[wanderers].astype(np.int64)
+        dir_y = c.state_dir_y[wanderers].astype(np.int64)
+        dir_x = np.where(change_x, np.clip(dir_x + change, -1, 1), dir_x)
+        dir_y = np.where(change_x, dir_y, np.clip(dir_y + change, -1, 1))
+        new_x = c.x[wanderers] + dir_x
+        new_y = c.y[wanderers] + dir_y
+        dir_x = np.where((new_x < 0) | (new_x >= opts.world_width), -dir_x, dir_x)
+        dir_y = np.where((new_y < 0) | (new_y >= opts.world_height), -dir_y, dir_y)
+        c.x[wanderers] += dir_x
+        c.y[wanderers] += dir_y
+        c.state_dir_x[wanderers] = dir_x
+        c.state_dir_y[wanderers] = dir_y
+
+        # Hunt, multiple hunters can share a meal
+        hunters = rows[hunt]
+        prey_x = food.x[targets[hunt]]
+        prey_y = food.y[targets[hunt]]
+        c.x[hunters] += np.sign(prey_x - c.x[hunters])
+        c.y[hunters] += np.sign(prey_y - c.y[hunters])
+        hunted = (c.x[hunters] == prey_x) & (c.y[hunters] == prey_y)
+        food_alive[targets[hunt][hunted]] = False
+        fed = hunters[hunted]
+        c.satiation[fed] = np.minimum(1.0, c.satiation[fed] + entity_opts.satiation_per_feeding)
+
+        # Mate, moving towards where the mate was at the start of the phase
+        suitors = rows[mate]
+        mate_rows = targets[mate]
+        mate_x = start_x[mate_rows]
+        mate_y = start_y[mate_rows]
+        c.x[suitors] += np.sign(mate_x - c.x[suitors])
+        c.y[suitors] += np.sign(mate_y - c.y[suitors])
+        mated = (c.x[suitors] == mate_x) & (c.y[suitors] == mate_y) & alive[mate_rows]
+        mated_suitors = suitors[mated]
+        mated_rows = mate_rows[mated]
+        # The first suitor (in row order) reaching a mate that is not pregnant fathers the offspring
+        fertile = ~pregnant[mated_rows]
+        fertilized, first = np.unique(mated_rows[fertile], return_index=True)
+        pregnant[fertilized] = True
+        c.pregnant_duration[fertilized] = 0
+        c.partner_genes[fertilized] = c.genes[mated_suitors[fertile][first]]
+        c.reproductive_urge[fertilized] = 0
+        c.reproductive_urge[mated_suitors] = 0
+
+        c.x[rows] = np.clip(c.x[rows], 0, opts.world_width - 1)
+        c.y[rows] = np.clip(c.y[rows], 0, opts.world_height - 1)
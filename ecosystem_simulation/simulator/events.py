@@ -0,0 +1,218 @@
+"""
+Demographic events of simulation ticks.
+
+An `EventLog` attached to `EcosystemSimulator` (see `EcosystemSimulator.enable_events`) receives
+an event for every birth, death (with its `DeathCause`), kill and mating of creatures. Events
+are kept as `EVENT_DTYPE` records in a ring buffer of the latest `capacity` events, and are
+optionally appended to a file (read back with `read_events`). While no log is attached the
+simulator only pays for a `None` check where events happen.
+
+Fields of an event depend on its kind:
+
+- `BIRTH`: `entity` was born to the parent `other`.
+- `DEATH`: `entity` died of `cause`, `other` is the killer of creatures that were hunted.
+- `KILL`: the hunter `entity` reached and killed `other`.
+- `MATING`: `entity` mated with `other`, who became pregnant.
+
+`species` is always the species of `entity`.
+"""
+import struct
+from enum import IntEnum
+from typing import Optional
+
+import numpy as np
+
+from .models import Creature, Entity, Predator, Prey
+
+
+class EventKind(IntEnum):
+    BIRTH = 0
+    DEATH = 1
+    KILL = 2
+    MATING = 3
+
+
+class DeathCause(IntEnum):
+    NONE = 0
+    STARVATION = 1
+    AGE = 2
+    PREDATION = 3
+    OVERCROWDING = 4
+
+
+class Species(IntEnum):
+    PREDATOR = 0
+    PREY = 1
+
+
+SPECIES = {Predator: Species.PREDATOR, Prey: Species.PREY}
+
+EVENT_DTYPE = np.dtype([
+    ("tick", "<u4"),
+    ("kind", "u1"),
+    ("species", "u1"),
+    ("cause", "u1"),
+    ("entity", "<u4"),
+    ("other", "<u4"),
+])
+
+# Default number of events kept in memory
+EVENT_CAPACITY = 1 << 16
+
+EVENTS_MAGIC = b"EESEVT\x00\x01"
+EVENTS_VERSION = 1
+EVENTS_HEADER = struct.Struct("<8sH")
+
+
+class EventLog:
+    """
+    Collects the events of the tick being simulated, and keeps those of past ticks.
+
+    Events persisted to `path` are flushed at the end of every tick, so the file always
+    holds whole ticks. The log owns the file, close it (or use it as a context manager).
+    """
+    capacity: int
+    # Number of events logged so far, including those no longer kept
+    count: int
+
+    def __init__(self, capacity: int = EVENT_CAPACITY, path: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.count = 0
+        self._buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        # Events of the current tick as (kind, species, cause, entity, other)
+        self._pending: list[tuple[int, int, int, int, int]] = []
+        # Cause of death (and killer) of the creatures that died this tick
+        self._causes: dict[int, tuple[int, int]] = {}
+        self._file = None
+        if path is not None:
+            self._file = open(path, "wb")
+            self._file.write(EVENTS_HEADER.pack(EVENTS_MAGIC, EVENTS_VERSION))
+
+    def birth(self, child: Creature, parent: Creature):
+        self._pending.append((EventKind.BIRTH, SPECIES[type(child)], DeathCause.NONE, child.id, parent.id))
+
+    def mark_death(self, creature: Creature, cause: DeathCause, killer: int = 0):
+        """
+        Records why a creature is about to be marked dead. Only the first cause counts.
+        """
+        if creature.alive and creature.id not in self._causes:
+            self._causes[creature.id] = (cause, killer)
+
+    def kill(self, hunter: Creature, target: Entity):
+        """
+        `hunter` reached `target`, which it kills unless it is food or already dead.
+        """
+        if target.alive and type(target) in SPECIES:
+            self._pending.append((EventKind.KILL, SPECIES[type(hunter)], DeathCause.NONE, hunter.id, target.id))
+            self.mark_death(target, DeathCause.PREDATION, hunter.id)
+
+    def mating(self, creature: Creature, partner: Creature):
+        self._pending.append((EventKind.MATING, SPECIES[type(creature)], DeathCause.NONE, creature.id, partner.id))
+
+    def death(self, entity: Entity):
+        """
+        An entity of the previous state is not carried over. Food is not logged.
+        """
+        species = SPECIES.get(type(entity))
+        if species is not None:
+            cause, killer = self._causes.pop(entity.id, (DeathCause.NONE, 0))
+            self._pending.append((EventKind.DEATH, species, cause, entity.id, killer))
+
+    def end_tick(self, tick_number: int):
+        """
+        Stores the events of the finished tick.
+        """
+        self._causes.clear()
+        if len(self._pending) == 0:
+            return
+        pending = np.array(self._pending, dtype=np.int64)
+        self._pending = []
+        events = np.zeros(len(pending), dtype=EVENT_DTYPE)
+        events["tick"] = tick_number
+        for i, name in enumerate(("kind", "species", "cause", "entity", "other")):
+            events[name] = pending[:, i]
+        if self._file is not None:
+            self._file.write(events.tobytes())
+            self._file.flush()
+
+        # Only the newest `capacity` events are kept
+        events = events[-self.capacity:]
+        start = (self.count + len(pending) - len(events)) % self.capacity
+        first = min(len(events), self.capacity - start)
+        self._buffer[start:start + first] = events[:first]
+        self._buffer[:len(events) - first] = events[first:]
+        self.count += len(pending)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """
+        Number of logged events no longer kept in memory.
+        """
+        return self.count - len(self)
+
+    def events(self) -> np.ndarray:
+        """
+        The kept events, oldest first (a copy).
+        """
+        if self.count <= self.capacity:
+            return self._buffer[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self._buffer[start:], self._buffer[:start]))
+
+    def clear(self):
+        self.count = 0
+        self._pending = []
+        self._causes.clear()
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "EventLog":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_events(path: str) -> np.ndarray:
+    """
+    Events persisted by an `EventLog`, memory mapped.
+    """
+    with open(path, "rb") as f:
+        magic, version = EVENTS_HEADER.unpack(f.read(EVENTS_HEADER.size))
+        f.seek(0, 2)
+        size = f.tell() - EVENTS_HEADER.size
+    if magic != EVENTS_MAGIC:
+        raise ValueError("Not an event log")
+    if version != EVENTS_VERSION:
+        raise ValueError(f"Unsupported event log version {version}")
+    if size < EVENT_DTYPE.itemsize:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    return np.memmap(path, dtype=EVENT_DTYPE, mode="r", offset=EVENTS_HEADER.size, shape=(size // EVENT_DTYPE.itemsize,))
+
+
+def summarize_events(events: np.ndarray) -> dict[str, dict[str, int]]:
+    """
+    Births, kills, matings and deaths by cause of every species.
+    """
+    summary = {}
+    for species in Species:
+        of_species = events[events["species"] == species]
+        kinds = np.bincount(of_species["kind"], minlength=len(EventKind))
+        causes = np.bincount(of_species["cause"][of_species["kind"] == EventKind.DEATH], minlength=len(DeathCause))
+        summary[species.name.lower()] = {
+            **{kind.name.lower(): int(kinds[kind]) for kind in EventKind},
+            **{cause.name.lower(): int(causes[cause]) for cause in DeathCause if cause != DeathCause.NONE},
+        }
+    return summary
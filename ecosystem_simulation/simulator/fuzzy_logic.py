@@ -6,7 +6,13 @@ import matplotlib.pyplot as plot
 import matplotlib
 from dataclasses import dataclass, fields
 from skfuzzy.control import Antecedent, Consequent
+from skfuzzy.control.term import TermAggregate
+import hashlib
+import os
+from bisect import bisect_right
+from pathlib import Path
 from sys import maxsize
+from typing import Optional, Sequence, Union
 
 from ecosystem_simulation.simulator.models.creature import Creature, Predator, Prey
 
@@ -77,109 +83,556 @@ GENE_SCALE = 0.1  # Genes are less impactful than other attributes like satiatio
 DISTANCE_SCALE = 0.8
 standard_range = np.arange(0, 11)
 
-def determine_state_fuzzy(creature: Creature, vision: int, food_distance: float, mate_distance: float) -> State:
-    # RANGES#############################################################################
-    distance_range = np.arange(0, 21)  # An extended range to cover OUT_OF_RANGE
-
-    # Output range - two times the number of states (to easier construct graphical representation)
-    output_state_range = np.arange(0, 7)
-
-    # CLASSIFICATION ###################################################################
-    genes = FuzzyGenes(appetite=Antecedent(standard_range, Label.APPETITE),
-                       lifespan=Antecedent(standard_range, Label.LIFESPAN),
-                       maturity_age=Antecedent(standard_range, Label.MATURITY_AGE),
-                       gestation_age=Antecedent(standard_range, Label.GESTATION_AGE),
-                       speed=Antecedent(standard_range, Label.SPEED),
-                       min_children=Antecedent(standard_range, Label.MIN_CHILDREN),
-                       max_children=Antecedent(standard_range, Label.MAX_CHILDREN),
-                       vision=Antecedent(standard_range, Label.VISION),
-                       reproductive_urge_quickness=Antecedent(standard_range, Label.REPRODUCTIVE_URGE_QUICKNESS),
-                       timidity=Antecedent(standard_range, Label.TIMIDITY)
-                       )
-
-    # Other attributes
-    satiation = Antecedent(standard_range, Label.SATIATION)
-    reproductive_urge = Antecedent(standard_range, Label.REPRODUCTIVE_URGE)
-    distance_mate = Antecedent(distance_range, Label.DISTANCE_MATE)
-    distance_food = Antecedent(distance_range, Label.DISTANCE_FOOD)
-    pregnancy = Antecedent(standard_range, Label.PREGNANCY)
-    maturity = Antecedent(standard_range, Label.MATURITY)
-
-    # Output
-    state = Consequent(output_state_range, Label.STATE)
-
-    lower_triangle_shape = [0, 0, 5]
-    upper_triangle_shape = [5, 10, 10]
-
-    # All gene (and other attributes except for distance) graphical representation
-    # is the same with two triangles to form a "V" position
-    for gene in fields(genes):
-        getattr(genes, gene.name)[Level.LOW] = fuzz.trimf(getattr(genes, gene.name).universe, lower_triangle_shape) * GENE_SCALE
-        getattr(genes, gene.name)[Level.HIGH] = fuzz.trimf(getattr(genes, gene.name).universe, upper_triangle_shape) * GENE_SCALE
-
-    satiation[Level.LOW] = fuzz.trimf(satiation.universe, lower_triangle_shape)
-    satiation[Level.HIGH] = fuzz.trimf(satiation.universe, upper_triangle_shape)
-
-    reproductive_urge[Level.LOW] = fuzz.trimf(reproductive_urge.universe, lower_triangle_shape)
-    reproductive_urge[Level.HIGH] = fuzz.trimf(reproductive_urge.universe, upper_triangle_shape)
-
-    distance_food[Distance.CLOSE] = fuzz.trimf(distance_food.universe, [0, 0, 10]) * DISTANCE_SCALE
-    distance_food[Distance.FAR] = fuzz.trimf(distance_food.universe, [0, 10, 10]) * DISTANCE_SCALE
-    distance_food[Distance.OUT_OF_RANGE] = fuzz.trapmf(distance_food.universe, [11, 11, 20, 20])
-
-    distance_mate[Distance.CLOSE] = fuzz.trimf(distance_mate.universe, [0, 0, 10]) * DISTANCE_SCALE
-    distance_mate[Distance.FAR] = fuzz.trimf(distance_mate.universe, [0, 10, 10]) * DISTANCE_SCALE
-    distance_mate[Distance.OUT_OF_RANGE] = fuzz.trapmf(distance_mate.universe, [11, 11, 20, 20])
-
-    # Pregnancy and maturity are both boolean variables so only the lowest and highest value will be needed
-    pregnancy[Level.LOW] = fuzz.trimf(pregnancy.universe, lower_triangle_shape)
-    pregnancy[Level.HIGH] = fuzz.trimf(pregnancy.universe, upper_triangle_shape)
-
-    maturity[Level.LOW] = fuzz.trimf(maturity.universe, lower_triangle_shape)
-    maturity[Level.HIGH] = fuzz.trimf(maturity.universe, upper_triangle_shape)
-
-    state[State.FOOD.name] = fuzz.trimf(state.universe, [0, 0, 3])
-    # Idle shape is scaled down to reduce the likelihood of character being in idle mode
-    state[State.IDLE.name] = IDLE_STATE_SCALE * fuzz.trimf(state.universe, [2, 3, 4])
-    state[State.REPRODUCTION.name] = fuzz.trimf(state.universe, [3, 6, 6])
-
-    # RULES ###########################################################################
-    # Note: all inputs have to be used to avoid error
-
-    rules = [
-        # Main rules for FOOD and REPRODUCTION states
-        ctrl.Rule((satiation[Level.LOW] & reproductive_urge[Level.LOW]) | maturity[Level.LOW] | pregnancy[Level.HIGH], state[State.FOOD.name]),
-        ctrl.Rule(reproductive_urge[Level.HIGH] & maturity[Level.HIGH] & satiation[Level.HIGH], state[State.REPRODUCTION.name]),
-
-        # Rules for targets' distances
-        ctrl.Rule(distance_mate[Distance.CLOSE] & maturity[Level.HIGH] & pregnancy[Level.LOW], state[State.REPRODUCTION.name]),
-        ctrl.Rule(distance_mate[Distance.OUT_OF_RANGE] & distance_food[Distance.OUT_OF_RANGE], state[State.IDLE.name]),
-        ctrl.Rule(distance_food[Distance.CLOSE], state[State.FOOD.name]),
-        ctrl.Rule(distance_food[Distance.OUT_OF_RANGE] & satiation[Level.HIGH], state[State.IDLE.name]),
-        ctrl.Rule(distance_mate[Distance.OUT_OF_RANGE] & reproductive_urge[Level.LOW], state[State.IDLE.name]),
-        ctrl.Rule(distance_food[Distance.FAR] & distance_mate[Distance.CLOSE] & maturity[Level.HIGH] & pregnancy[Level.LOW], state[State.REPRODUCTION.name]),
-        ctrl.Rule(distance_mate[Distance.FAR] & distance_food[Distance.CLOSE], state[State.FOOD.name]),
-
-        # Less impactful genes' rules
-        ctrl.Rule(genes.appetite[Level.HIGH], state[State.FOOD.name]),
-        ctrl.Rule(genes.reproductive_urge_quickness[Level.HIGH], state[State.REPRODUCTION.name]),
-        ctrl.Rule(genes.lifespan[Level.HIGH], state[State.FOOD.name]),
-        ctrl.Rule(genes.lifespan[Level.LOW], state[State.REPRODUCTION.name]),
-        ctrl.Rule(genes.maturity_age[Level.HIGH], state[State.IDLE.name]),
-        ctrl.Rule(genes.gestation_age[Level.HIGH], state[State.FOOD.name]),
-        ctrl.Rule(genes.speed[Level.LOW], state[State.IDLE.name]),
-        ctrl.Rule(genes.min_children[Level.HIGH], state[State.FOOD.name]),
-        ctrl.Rule(genes.max_children[Level.LOW], state[State.REPRODUCTION.name]),
-        ctrl.Rule(genes.vision[Level.LOW], state[State.REPRODUCTION.name]),
-        ctrl.Rule(genes.timidity[Level.HIGH], state[State.IDLE.name]),
-    ]
+# Where precomputed decision tables are cached between runs
+DEFAULT_TABLE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ecosystem_simulation")
+
+class CompiledControlSystem(ctrl.ControlSystem):
+    """
+    Control system whose rule firing order is resolved only once.
 
-    # FUZZY INFERENCE SYSTEM ###########################################################
-    state_ctrl = ctrl.ControlSystem(rules)
-    state_sim = ctrl.ControlSystemSimulation(state_ctrl)
+    `ControlSystem.rules` returns a fresh `RuleOrderGenerator` on every access, which
+    rebuilds the rule graph with networkx on every `ControlSystemSimulation.compute`.
+    The rule base here never changes after construction, so the order is cached.
+    """
+    _rule_order: Optional[list[ctrl.Rule]] = None
+
+    def __init__(self, rules: list[ctrl.Rule]):
+        super().__init__(rules)
+        self._rule_order = list(super().rules)
 
-    # FUZZYFICATION #########################################################################
+    @property
+    def rules(self):
+        if self._rule_order is None:
+            # Still adding rules in `ControlSystem.__init__`
+            return super().rules
+        return self._rule_order
 
+
+class FuzzyStateController:
+    """
+    Compiled fuzzy inference system for determining the next creature state.
+
+    Building the antecedents, membership functions and rules is expensive, so it is
+    done once when the controller is created. The rule base is then compiled into
+    plain lists which are reused for every inference afterwards.
+    """
+    genes: FuzzyGenes
+    satiation: Antecedent
+    reproductive_urge: Antecedent
+    distance_mate: Antecedent
+    distance_food: Antecedent
+    pregnancy: Antecedent
+    maturity: Antecedent
+    state: Consequent
+    rules: list[ctrl.Rule]
+
+    def __init__(self):
+        # RANGES#############################################################################
+        distance_range = np.arange(0, 21)  # An extended range to cover OUT_OF_RANGE
+
+        # Output range - two times the number of states (to easier construct graphical representation)
+        output_state_range = np.arange(0, 7)
+
+        # CLASSIFICATION ###################################################################
+        genes = FuzzyGenes(appetite=Antecedent(standard_range, Label.APPETITE),
+                           lifespan=Antecedent(standard_range, Label.LIFESPAN),
+                           maturity_age=Antecedent(standard_range, Label.MATURITY_AGE),
+                           gestation_age=Antecedent(standard_range, Label.GESTATION_AGE),
+                           speed=Antecedent(standard_range, Label.SPEED),
+                           min_children=Antecedent(standard_range, Label.MIN_CHILDREN),
+                           max_children=Antecedent(standard_range, Label.MAX_CHILDREN),
+                           vision=Antecedent(standard_range, Label.VISION),
+                           reproductive_urge_quickness=Antecedent(standard_range, Label.REPRODUCTIVE_URGE_QUICKNESS),
+                           timidity=Antecedent(standard_range, Label.TIMIDITY)
+                           )
+
+        # Other attributes
+        satiation = Antecedent(standard_range, Label.SATIATION)
+        reproductive_urge = Antecedent(standard_range, Label.REPRODUCTIVE_URGE)
+        distance_mate = Antecedent(distance_range, Label.DISTANCE_MATE)
+        distance_food = Antecedent(distance_range, Label.DISTANCE_FOOD)
+        pregnancy = Antecedent(standard_range, Label.PREGNANCY)
+        maturity = Antecedent(standard_range, Label.MATURITY)
+
+        # Output
+        state = Consequent(output_state_range, Label.STATE)
+
+        lower_triangle_shape = [0, 0, 5]
+        upper_triangle_shape = [5, 10, 10]
+
+        # All gene (and other attributes except for distance) graphical representation
+        # is the same with two triangles to form a "V" position
+        for gene in fields(genes):
+            getattr(genes, gene.name)[Level.LOW] = fuzz.trimf(getattr(genes, gene.name).universe, lower_triangle_shape) * GENE_SCALE
+            getattr(genes, gene.name)[Level.HIGH] = fuzz.trimf(getattr(genes, gene.name).universe, upper_triangle_shape) * GENE_SCALE
+
+        satiation[Level.LOW] = fuzz.trimf(satiation.universe, lower_triangle_shape)
+        satiation[Level.HIGH] = fuzz.trimf(satiation.universe, upper_triangle_shape)
+
+        reproductive_urge[Level.LOW] = fuzz.trimf(reproductive_urge.universe, lower_triangle_shape)
+        reproductive_urge[Level.HIGH] = fuzz.trimf(reproductive_urge.universe, upper_triangle_shape)
+
+        distance_food[Distance.CLOSE] = fuzz.trimf(distance_food.universe, [0, 0, 10]) * DISTANCE_SCALE
+        distance_food[Distance.FAR] = fuzz.trimf(distance_food.universe, [0, 10, 10]) * DISTANCE_SCALE
+        distance_food[Distance.OUT_OF_RANGE] = fuzz.trapmf(distance_food.universe, [11, 11, 20, 20])
+
+        distance_mate[Distance.CLOSE] = fuzz.trimf(distance_mate.universe, [0, 0, 10]) * DISTANCE_SCALE
+        distance_mate[Distance.FAR] = fuzz.trimf(distance_mate.universe, [0, 10, 10]) * DISTANCE_SCALE
+        distance_mate[Distance.OUT_OF_RANGE] = fuzz.trapmf(distance_mate.universe, [11, 11, 20, 20])
+
+        # Pregnancy and maturity are both boolean variables so only the lowest and highest value will be needed
+        pregnancy[Level.LOW] = fuzz.trimf(pregnancy.universe, lower_triangle_shape)
+        pregnancy[Level.HIGH] = fuzz.trimf(pregnancy.universe, upper_triangle_shape)
+
+        maturity[Level.LOW] = fuzz.trimf(maturity.universe, lower_triangle_shape)
+        maturity[Level.HIGH] = fuzz.trimf(maturity.universe, upper_triangle_shape)
+
+        state[State.FOOD.name] = fuzz.trimf(state.universe, [0, 0, 3])
+        # Idle shape is scaled down to reduce the likelihood of character being in idle mode
+        state[State.IDLE.name] = IDLE_STATE_SCALE * fuzz.trimf(state.universe, [2, 3, 4])
+        state[State.REPRODUCTION.name] = fuzz.trimf(state.universe, [3, 6, 6])
+
+        # RULES ###########################################################################
+        # Note: all inputs have to be used to avoid error
+
+        rules = [
+            # Main rules for FOOD and REPRODUCTION states
+            ctrl.Rule((satiation[Level.LOW] & reproductive_urge[Level.LOW]) | maturity[Level.LOW] | pregnancy[Level.HIGH], state[State.FOOD.name]),
+            ctrl.Rule(reproductive_urge[Level.HIGH] & maturity[Level.HIGH] & satiation[Level.HIGH], state[State.REPRODUCTION.name]),
+
+            # Rules for targets' distances
+            ctrl.Rule(distance_mate[Distance.CLOSE] & maturity[Level.HIGH] & pregnancy[Level.LOW], state[State.REPRODUCTION.name]),
+            ctrl.Rule(distance_mate[Distance.OUT_OF_RANGE] & distance_food[Distance.OUT_OF_RANGE], state[State.IDLE.name]),
+            ctrl.Rule(distance_food[Distance.CLOSE], state[State.FOOD.name]),
+            ctrl.Rule(distance_food[Distance.OUT_OF_RANGE] & satiation[Level.HIGH], state[State.IDLE.name]),
+            ctrl.Rule(distance_mate[Distance.OUT_OF_RANGE] & reproductive_urge[Level.LOW], state[State.IDLE.name]),
+            ctrl.Rule(distance_food[Distance.FAR] & distance_mate[Distance.CLOSE] & maturity[Level.HIGH] & pregnancy[Level.LOW], state[State.REPRODUCTION.name]),
+            ctrl.Rule(distance_mate[Distance.FAR] & distance_food[Distance.CLOSE], state[State.FOOD.name]),
+
+            # Less impactful genes' rules
+            ctrl.Rule(genes.appetite[Level.HIGH], state[State.FOOD.name]),
+            ctrl.Rule(genes.reproductive_urge_quickness[Level.HIGH], state[State.REPRODUCTION.name]),
+            ctrl.Rule(genes.lifespan[Level.HIGH], state[State.FOOD.name]),
+            ctrl.Rule(genes.lifespan[Level.LOW], state[State.REPRODUCTION.name]),
+            ctrl.Rule(genes.maturity_age[Level.HIGH], state[State.IDLE.name]),
+            ctrl.Rule(genes.gestation_age[Level.HIGH], state[State.FOOD.name]),
+            ctrl.Rule(genes.speed[Level.LOW], state[State.IDLE.name]),
+            ctrl.Rule(genes.min_children[Level.HIGH], state[State.FOOD.name]),
+            ctrl.Rule(genes.max_children[Level.LOW], state[State.REPRODUCTION.name]),
+            ctrl.Rule(genes.vision[Level.LOW], state[State.REPRODUCTION.name]),
+            ctrl.Rule(genes.timidity[Level.HIGH], state[State.IDLE.name]),
+        ]
+
+        self.genes = genes
+        self.satiation = satiation
+        self.reproductive_urge = reproductive_urge
+        self.distance_mate = distance_mate
+        self.distance_food = distance_food
+        self.pregnancy = pregnancy
+        self.maturity = maturity
+        self.state = state
+        self.rules = rules
+
+        # FUZZY INFERENCE SYSTEM ###########################################################
+        # The skfuzzy control system is kept as the reference implementation (and for `view`),
+        # every inference in the simulation goes through the compiled rule base below.
+        self.control_system = CompiledControlSystem(rules)
+        self._reference_sim = ctrl.ControlSystemSimulation(self.control_system)
+
+        self._compile()
+
+    def _compile(self):
+        """
+        Flattens the skfuzzy rule base into plain lists, so an inference is only a handful of
+        interpolations, min/max operations and a centroid, without skfuzzy's per-call bookkeeping.
+        """
+        antecedents = {antecedent.label: antecedent for antecedent in self.control_system.antecedents}
+
+        # Every antecedent term gets an index into the list of memberships
+        self.term_inputs: list[int] = []
+        self.term_universes: list[list[float]] = []
+        self.term_mfs: list[list[float]] = []
+        term_index = {}
+        for input_index, label in enumerate(INPUT_LABELS):
+            antecedent = antecedents[label]
+            for term in antecedent.terms.values():
+                term_index[term] = len(self.term_mfs)
+                self.term_inputs.append(input_index)
+                self.term_universes.append(antecedent.universe.astype(float).tolist())
+                self.term_mfs.append(term.mf.astype(float).tolist())
+
+        def compile_clause(clause) -> CompiledClause:
+            if isinstance(clause, TermAggregate):
+                if clause.kind == 'not':
+                    return clause.kind, compile_clause(clause.term1), None
+                return clause.kind, compile_clause(clause.term1), compile_clause(clause.term2)
+            return term_index[clause]
+
+        self.output_labels: list[str] = list(self.state.terms.keys())
+        self.output_universe: list[float] = self.state.universe.astype(float).tolist()
+        self.output_mfs: list[list[float]] = [term.mf.astype(float).tolist() for term in self.state.terms.values()]
+
+        self.compiled_rules: list[tuple[CompiledClause, int, float]] = []
+        for rule in self.rules:
+            for consequent in rule.consequent:
+                output_index = self.output_labels.index(consequent.term.label)
+                self.compiled_rules.append((compile_clause(rule.antecedent), output_index, consequent.weight))
+
+    def activations(self, inputs: Sequence[float]) -> list[Optional[float]]:
+        """
+        Fuzzifies the crisp `inputs` (ordered as `INPUT_LABELS`) and returns the accumulated
+        activation of every output term (`None` if no rule fires into the term).
+        """
+        memberships = [
+            _interp(universe, mf, inputs[input_index])
+            for input_index, universe, mf in zip(self.term_inputs, self.term_universes, self.term_mfs)
+        ]
+
+        # Mamdani inference: AND is min, OR is max and rules accumulate with max
+        cuts: list[Optional[float]] = [None] * len(self.output_mfs)
+        for clause, output_index, weight in self.compiled_rules:
+            activation = _evaluate_clause(clause, memberships) * weight
+            current = cuts[output_index]
+            cuts[output_index] = activation if current is None else max(activation, current)
+        return cuts
+
+    def output(self, inputs: Sequence[float]) -> Optional[float]:
+        """
+        Returns the defuzzified `state` output for the crisp `inputs`, or `None` when
+        no output term has any membership.
+        """
+        return _centroid(self.output_universe, self.output_mfs, self.activations(inputs))
+
+    def batch_activations(self, inputs: np.ndarray) -> list[Optional[np.ndarray]]:
+        """
+        Vectorized version of `activations` for a `(N, len(INPUT_LABELS))` input matrix.
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.ndim != 2 or inputs.shape[1] != len(INPUT_LABELS):
+            raise ValueError(f"Expected an (N, {len(INPUT_LABELS)}) input matrix, got {inputs.shape}")
+
+        memberships = [
+            np.interp(inputs[:, input_index], universe, mf)
+            for input_index, universe, mf in zip(self.term_inputs, self.term_universes, self.term_mfs)
+        ]
+
+        cuts: list[Optional[np.ndarray]] = [None] * len(self.output_mfs)
+        for clause, output_index, weight in self.compiled_rules:
+            activation = _evaluate_clause_batch(clause, memberships) * weight
+            current = cuts[output_index]
+            cuts[output_index] = activation if current is None else np.fmax(activation, current)
+        return cuts
+
+    def batch_outputs(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of `output` for a `(N, len(INPUT_LABELS))` input matrix.
+
+        Every row goes through the same fuzzification, rule aggregation and centroid
+        arithmetic as `output`, so the results are identical. Rows without any output
+        membership are `NaN`.
+        """
+        return _centroid_batch(self.output_universe, self.output_mfs, self.batch_activations(inputs), len(inputs))
+
+    def determine_states(self, inputs: np.ndarray) -> list[State]:
+        """
+        Determines the states of all creatures in the `(N, len(INPUT_LABELS))` input matrix
+        (see `fuzzy_inputs`) in a single call.
+        """
+        return outputs_to_states(self.batch_outputs(inputs))
+
+    def reference_output(self, inputs: Sequence[float]) -> Optional[float]:
+        """
+        Computes the same output as `output` through skfuzzy itself (slow, used for validation).
+        """
+        state_sim = self._reference_sim
+        state_sim.inputs(dict(zip(INPUT_LABELS, inputs)))
+        state_sim.compute()
+        return state_sim.output.get(Label.STATE)
+
+    def determine_state(self, creature: Creature, vision: int, food_distance: float, mate_distance: float) -> State:
+        return output_to_state(self.output(fuzzy_inputs(creature, vision, food_distance, mate_distance)))
+
+
+@dataclass(slots=True, frozen=True)
+class FuzzyTableAccuracy:
+    """
+    Accuracy of a `FuzzyDecisionTable` against exact inference on a set of inputs.
+    """
+    rows: int
+    # Fraction of rows for which both determine the same `State`
+    state_agreement: float
+    max_abs_error: float
+    mean_abs_error: float
+
+
+class FuzzyDecisionTable:
+    """
+    Precomputed defuzzified `state` output served with interpolated array lookups.
+
+    A grid over the 16 crisp inputs would be far too large, but the rule base collapses
+    them into one accumulated activation (cut) per output term, and the expensive part of
+    an inference (upsampling the output universe and integrating the centroid) only depends
+    on those. The table holds the centroid over a `resolution` quantized grid of the output
+    term cuts, so an inference is the exact (cheap) fuzzification and rule aggregation
+    followed by a trilinear lookup.
+
+    Cuts above the peak of an output term do not change its clipped membership function,
+    so every axis only spans `[0, peak]`. Tables are cached in `cache_dir`, keyed by a hash
+    of the membership functions, the rules and the resolution.
+    """
+    FORMAT_VERSION = 1
+
+    controller: FuzzyStateController
+    resolution: int
+    key: str
+    table: np.ndarray
+
+    def __init__(self, controller: FuzzyStateController, resolution: int = 64, cache_dir: Optional[str] = None):
+        if resolution < 1:
+            raise ValueError("The table resolution must be at least 1")
+        self.controller = controller
+        self.resolution = resolution
+        self._peaks = np.array([max(mf) for mf in controller.output_mfs])
+        self.key = self._definitions_hash()
+
+        cache_path = Path(cache_dir if cache_dir is not None else DEFAULT_TABLE_CACHE_DIR) / f"fuzzy_table_{self.key}.npy"
+        if cache_path.exists():
+            self.table = np.load(cache_path)
+        else:
+            self.table = self._build()
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so concurrent processes never read a partial table
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, self.table)
+            os.replace(tmp_path, cache_path)
+
+    def _definitions_hash(self) -> str:
+        c = self.controller
+        definitions = repr((
+            self.FORMAT_VERSION,
+            self.resolution,
+            c.term_inputs, c.term_universes, c.term_mfs,
+            c.compiled_rules,
+            c.output_labels, c.output_universe, c.output_mfs,
+        ))
+        return hashlib.sha256(definitions.encode()).hexdigest()[:16]
+
+    def _build(self) -> np.ndarray:
+        steps = [np.linspace(0., peak, self.resolution + 1) for peak in self._peaks]
+        grid = np.meshgrid(*steps, indexing='ij')
+        cuts = [axis.ravel() for axis in grid]
+        outputs = _centroid_batch(self.controller.output_universe, self.controller.output_mfs, cuts, len(cuts[0]))
+        return outputs.reshape(grid[0].shape)
+
+    def batch_outputs(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Approximates `FuzzyStateController.batch_outputs` by interpolating the table.
+        """
+        cuts = [
+            np.zeros(len(inputs)) if cut is None else cut
+            for cut in self.controller.batch_activations(inputs)
+        ]
+        coords = np.stack([np.clip(cut / peak, 0., 1.) * self.resolution for cut, peak in zip(cuts, self._peaks)])
+        lower = np.minimum(coords.astype(np.intp), self.resolution - 1)
+        frac = coords - lower
+
+        # Trilinear interpolation over the 8 corners of the enclosing grid cell
+        result = np.zeros(len(inputs))
+        for corner in np.ndindex(*(2,) * len(cuts)):
+            weight = np.ones(len(inputs))
+            for axis, offset in enumerate(corner):
+                weight *= frac[axis] if offset else 1. - frac[axis]
+            result += weight * self.table[tuple(lower[axis] + offset for axis, offset in enumerate(corner))]
+
+        # Cells touching the all-zero corner (where no term has any membership) are computed exactly
+        undefined = np.isnan(result)
+        if undefined.any():
+            result[undefined] = _centroid_batch(
+                self.controller.output_universe, self.controller.output_mfs,
+                [cut[undefined] for cut in cuts], int(undefined.sum()),
+            )
+        return result
+
+    def determine_states(self, inputs: np.ndarray) -> list[State]:
+        return outputs_to_states(self.batch_outputs(inputs))
+
+    def determine_state(self, creature: Creature, vision: int, food_distance: float, mate_distance: float) -> State:
+        return self.determine_states(np.array([fuzzy_inputs(creature, vision, food_distance, mate_distance)]))[0]
+
+    def accuracy_report(self, inputs: np.ndarray) -> FuzzyTableAccuracy:
+        """
+        Compares the tabulated outputs with exact inference on `inputs`.
+        """
+        exact = self.controller.batch_outputs(inputs)
+        approximate = self.batch_outputs(inputs)
+        defined = ~np.isnan(exact)
+        errors = np.abs(exact[defined] - approximate[defined])
+        agreement = sum(a == b for a, b in zip(outputs_to_states(exact), outputs_to_states(approximate)))
+        return FuzzyTableAccuracy(
+            rows=len(exact),
+            state_agreement=agreement / max(1, len(exact)),
+            max_abs_error=float(errors.max(initial=0.)),
+            mean_abs_error=float(errors.mean()) if len(errors) else 0.,
+        )
+
+
+# A compiled rule antecedent, either an index of an antecedent term or a (kind, clause, clause) tuple
+CompiledClause = Union[int, tuple[str, "CompiledClause", Optional["CompiledClause"]]]
+
+
+def _evaluate_clause(clause: CompiledClause, memberships: list[float]) -> float:
+    if isinstance(clause, int):
+        return memberships[clause]
+    kind, clause1, clause2 = clause
+    if kind == 'and':
+        return min(_evaluate_clause(clause1, memberships), _evaluate_clause(clause2, memberships))
+    elif kind == 'or':
+        return max(_evaluate_clause(clause1, memberships), _evaluate_clause(clause2, memberships))
+    else:
+        return 1. - _evaluate_clause(clause1, memberships)
+
+
+def _evaluate_clause_batch(clause: CompiledClause, memberships: list[np.ndarray]) -> np.ndarray:
+    if isinstance(clause, int):
+        return memberships[clause]
+    kind, clause1, clause2 = clause
+    if kind == 'and':
+        return np.fmin(_evaluate_clause_batch(clause1, memberships), _evaluate_clause_batch(clause2, memberships))
+    elif kind == 'or':
+        return np.fmax(_evaluate_clause_batch(clause1, memberships), _evaluate_clause_batch(clause2, memberships))
+    else:
+        return 1. - _evaluate_clause_batch(clause1, memberships)
+
+
+def _interp(universe: list[float], mf: list[float], x: float) -> float:
+    """
+    Scalar version of `np.interp` (which skfuzzy uses for fuzzification), with the same arithmetic.
+    """
+    if x <= universe[0]:
+        return mf[0]
+    if x >= universe[-1]:
+        return mf[-1]
+    j = bisect_right(universe, x) - 1
+    if x == universe[j]:
+        return mf[j]
+    slope = (mf[j + 1] - mf[j]) / (universe[j + 1] - universe[j])
+    return slope * (x - universe[j]) + mf[j]
+
+
+def _centroid(universe: list[float], mfs: list[list[float]], cuts: list[Optional[float]]) -> Optional[float]:
+    """
+    Centroid defuzzification of the clipped and max-aggregated output terms.
+
+    Follows skfuzzy exactly: the universe is upsampled with the points where the terms cross
+    their cut levels and the area is then integrated piecewise linearly between the points.
+    """
+    points = set(universe)
+    for mf, cut in zip(mfs, cuts):
+        if cut is None:
+            continue
+        for j in range(len(universe) - 1):
+            if (mf[j] > cut if cut == 0. else mf[j] >= cut) != (mf[j + 1] > cut if cut == 0. else mf[j + 1] >= cut):
+                points.add(universe[j] + (cut - mf[j]) * (universe[j + 1] - universe[j]) / (mf[j + 1] - mf[j]))
+
+    xs = sorted(points)
+    ys = [0.] * len(xs)
+    for mf, cut in zip(mfs, cuts):
+        if cut is None:
+            continue
+        for i, x in enumerate(xs):
+            ys[i] = max(ys[i], min(cut, _interp(universe, mf, x)))
+
+    if sum(ys) == 0:
+        return None
+
+    sum_moment_area = 0.0
+    sum_area = 0.0
+    for i in range(1, len(xs)):
+        x1, x2 = xs[i - 1], xs[i]
+        y1, y2 = ys[i - 1], ys[i]
+        if y1 == y2 == 0.0 or x1 == x2:
+            continue
+        if y1 == y2:  # rectangle
+            moment = 0.5 * (x1 + x2)
+            area = (x2 - x1) * y1
+        elif y1 == 0.0:  # triangle, height y2
+            moment = 2.0 / 3.0 * (x2 - x1) + x1
+            area = 0.5 * (x2 - x1) * y2
+        elif y2 == 0.0:  # triangle, height y1
+            moment = 1.0 / 3.0 * (x2 - x1) + x1
+            area = 0.5 * (x2 - x1) * y1
+        else:
+            moment = (2.0 / 3.0 * (x2 - x1) * (y2 + 0.5 * y1)) / (y1 + y2) + x1
+            area = 0.5 * (x2 - x1) * (y1 + y2)
+        sum_moment_area += moment * area
+        sum_area += area
+
+    return sum_moment_area / max(sum_area, np.finfo(float).eps)
+
+
+def _centroid_batch(universe: list[float], mfs: list[list[float]], cuts: list[Optional[np.ndarray]], n: int) -> np.ndarray:
+    """
+    Row-wise `_centroid`. Every row gets the universe plus one candidate crossing point per term
+    and universe segment. Segments without a crossing repeat a universe point instead, and
+    zero-width segments do not contribute to the centroid, so the rows match the upsampled
+    universe of `_centroid`.
+    """
+    u = np.asarray(universe, dtype=float)
+    columns = [np.broadcast_to(u, (n, len(u)))]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for mf, cut in zip(mfs, cuts):
+            if cut is None:
+                continue
+            mf = np.asarray(mf, dtype=float)
+            cut = cut[:, None]
+            above = np.where(cut == 0., mf > cut, mf >= cut)
+            crossing = u[:-1] + (cut - mf[:-1]) * (u[1:] - u[:-1]) / (mf[1:] - mf[:-1])
+            columns.append(np.where(above[:, :-1] != above[:, 1:], crossing, u[:-1]))
+    xs = np.sort(np.concatenate(columns, axis=1), axis=1)
+
+    ys = np.zeros_like(xs)
+    for mf, cut in zip(mfs, cuts):
+        if cut is None:
+            continue
+        np.maximum(ys, np.minimum(cut[:, None], np.interp(xs, u, mf)), out=ys)
+
+    x1, x2 = xs[:, :-1], xs[:, 1:]
+    y1, y2 = ys[:, :-1], ys[:, 1:]
+    skip = ((y1 == 0.0) & (y2 == 0.0)) | (x1 == x2)
+    rectangle = y1 == y2
+    rising = (y1 == 0.0) & (y2 != 0.0)
+    falling = (y2 == 0.0) & (y1 != 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moment = np.select(
+            [rectangle, rising, falling],
+            [0.5 * (x1 + x2), 2.0 / 3.0 * (x2 - x1) + x1, 1.0 / 3.0 * (x2 - x1) + x1],
+            (2.0 / 3.0 * (x2 - x1) * (y2 + 0.5 * y1)) / (y1 + y2) + x1,
+        )
+    area = np.select(
+        [rectangle, rising, falling],
+        [(x2 - x1) * y1, 0.5 * (x2 - x1) * y2, 0.5 * (x2 - x1) * y1],
+        0.5 * (x2 - x1) * (y1 + y2),
+    )
+
+    # `cumsum` accumulates segment by segment (unlike the pairwise `np.sum`), keeping the rounding of `_centroid`
+    sum_moment_area = np.cumsum(np.where(skip, 0.0, moment * area), axis=1)[:, -1]
+    sum_area = np.cumsum(np.where(skip, 0.0, area), axis=1)[:, -1]
+
+    result = sum_moment_area / np.fmax(sum_area, np.finfo(float).eps)
+    result[ys.sum(axis=1) == 0] = np.nan
+    return result
+
+
+# Order of the crisp inputs of the fuzzy system
+INPUT_LABELS = tuple(label for label in Label if label != Label.STATE)
+
+
+def fuzzy_inputs(creature: Creature, vision: int, food_distance: float, mate_distance: float) -> list[float]:
+    """
+    Maps the creature attributes and target distances to crisp inputs of the fuzzy system
+    (ordered as `INPUT_LABELS`).
+    """
     # It the target is too far away set the distance to 15
     if food_distance != 0:
         food_distance = (food_distance / vision) * 10 if food_distance < maxsize else 15
@@ -187,48 +640,88 @@ def determine_state_fuzzy(creature: Creature, vision: int, food_distance: float,
     if mate_distance != 0:
         mate_distance = (mate_distance / vision) * 10 if mate_distance < maxsize else 15
 
-    state_sim.inputs({
-        Label.APPETITE: creature.genes.appetite * 10,
-        Label.LIFESPAN: creature.genes.lifespan * 10,
-        Label.MATURITY_AGE: creature.genes.maturity_age * 10,
-        Label.GESTATION_AGE: creature.genes.gestation_age * 10,
-        Label.SPEED: creature.genes.speed * 10,
-        Label.MIN_CHILDREN: creature.genes.min_children * 10,
-        Label.MAX_CHILDREN: creature.genes.max_children * 10,
-        Label.VISION: creature.genes.vision * 10,
-        Label.REPRODUCTIVE_URGE_QUICKNESS: creature.genes.reproductive_urge_quickness * 10,
-        Label.TIMIDITY: creature.genes.timidity * 10,
-
-        Label.SATIATION: creature.satiation * 10,
-        Label.REPRODUCTIVE_URGE: creature.reproductive_urge * 10,
-        Label.DISTANCE_FOOD: food_distance,
-        Label.DISTANCE_MATE: mate_distance,
-        Label.PREGNANCY: 10 if creature.pregnant else 0,
-        Label.MATURITY: 10 if creature.mature else 0,
-    })
-
-    # Compute output with centroid method
-    state_sim.compute()
-
-    # OUTPUT STATE #################################################################################
-
-    output_state_num = state_sim.output[Label.STATE] / 3
+    genes = creature.genes
+    return [
+        genes.appetite * 10,
+        genes.lifespan * 10,
+        genes.maturity_age * 10,
+        genes.gestation_age * 10,
+        genes.speed * 10,
+        genes.min_children * 10,
+        genes.max_children * 10,
+        genes.vision * 10,
+        genes.reproductive_urge_quickness * 10,
+        genes.timidity * 10,
+
+        creature.satiation * 10,
+        creature.reproductive_urge * 10,
+        mate_distance,
+        food_distance,
+        10 if creature.pregnant else 0,
+        10 if creature.mature else 0,
+    ]
+
+
+def output_to_state(output: Optional[float]) -> State:
+    """
+    Maps the defuzzified `state` output to one of the discrete states.
+    """
+    if output is None:
+        # No rule fired at all, there is nothing to decide on
+        return State.IDLE
+
+    output_state_num = output / 3
     # We should avoid Idle state, so it is smaller than other states
     if output_state_num < 0.8:
-        output_state = State.FOOD
+        return State.FOOD
     elif output_state_num > 1.2:
-        output_state = State.REPRODUCTION
+        return State.REPRODUCTION
     else:
-        output_state = State.IDLE
+        return State.IDLE
+
+
+def output_state_values(outputs: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `output_to_state`, returning `State` values. NaN outputs (no rule fired) map to idle.
+    """
+    output_state_num = outputs / 3
+    with np.errstate(invalid='ignore'):
+        return np.where(output_state_num < 0.8, State.FOOD.value,
+                        np.where(output_state_num > 1.2, State.REPRODUCTION.value, State.IDLE.value))
+
+
+def outputs_to_states(outputs: np.ndarray) -> list[State]:
+    """
+    Vectorized `output_to_state`.
+    """
+    states = list(State)
+    return [states[i] for i in output_state_values(outputs).tolist()]
+
+
+_default_controller: Optional[FuzzyStateController] = None
+
+
+def default_controller() -> FuzzyStateController:
+    """
+    Returns the process wide controller, building it on first use.
+    """
+    global _default_controller
+    if _default_controller is None:
+        _default_controller = FuzzyStateController()
+    return _default_controller
+
 
-    #output_state = State(output_state_num)
-    #if isinstance(creature, Predator):
-    #    print(f"OUTPUT STATE of predator {creature.id}: {output_state.name}")
-    #else:
-    #    print(f"OUTPUT STATE of prey {creature.id}: {output_state.name}")
+_default_tables: dict[int, FuzzyDecisionTable] = {}
 
-    # Plot the result
-    #state.view(sim=state_sim)
-    #plot.show()
 
-    return output_state
+def default_decision_table(resolution: int) -> FuzzyDecisionTable:
+    """
+    Returns the process wide decision table of the given resolution, loading or building it on first use.
+    """
+    if resolution not in _default_tables:
+        _default_tables[resolution] = FuzzyDecisionTable(default_controller(), resolution)
+    return _default_tables[resolution]
+
+
+def determine_state_fuzzy(creature: Creature, vision: int, food_distance: float, mate_distance: float) -> State:
+    return default_controller().determine_state(creature, vision, food_distance, mate_distance)
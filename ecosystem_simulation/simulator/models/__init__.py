@@ -4,5 +4,6 @@ from .food import Food
 from .genes import Genes
 from .state import EntityState, HuntState, WanderingState, MateState, FleeState
 
-from .world import SimulationState
+from .world import SimulationState, SpatialIndex, PopulationCounters
+from .columnar import CreatureColumns, FoodColumns, ColumnarSimulationState, CreatureView, FoodView, CreatureFlag, StateKind
 from .world_position import WorldPosition
@@ -0,0 +1,446 @@
+from dataclasses import dataclass, fields
+from enum import IntEnum, IntFlag
+from operator import attrgetter
+from typing import Callable, Iterator, Optional, Type, Union
+
+import numpy as np
+
+from .creature import Creature, Predator, Prey
+from .entity import Entity
+from .food import Food
+from .genes import Genes
+from .state import EntityState, WanderingState, HuntState, FleeState, MateState
+from .world import SimulationState, PopulationCounters
+from .world_position import WorldPosition
+
+# Column order of the gene matrices
+GENE_FIELDS = tuple(f.name for f in fields(Genes))
+GENE_INDEX = {name: i for i, name in enumerate(GENE_FIELDS)}
+_gene_values = attrgetter(*GENE_FIELDS)
+_NO_GENES = (np.nan,) * len(GENE_FIELDS)
+
+
+class CreatureFlag(IntFlag):
+    MATURE = 1
+    PREGNANT = 2
+
+
+class StateKind(IntEnum):
+    NONE = 0
+    WANDERING = 1
+    HUNT = 2
+    FLEE = 3
+    MATE = 4
+
+
+def _to_genes(row: list[float]) -> Optional[Genes]:
+    if row[0] != row[0]:  # NaN
+        return None
+    return Genes(*row)
+
+
+def _to_state(kind: int, target: int, dir_x: int, dir_y: int) -> Optional[EntityState]:
+    if kind == StateKind.WANDERING:
+        return WanderingState(dir_x, dir_y)
+    elif kind == StateKind.HUNT:
+        return HuntState(target)
+    elif kind == StateKind.FLEE:
+        return FleeState(target)
+    elif kind == StateKind.MATE:
+        return MateState(target)
+    return None
+
+
+@dataclass(slots=True)
+class CreatureColumns:
+    """
+    Creatures of one species stored as columns (structure of arrays), one row per creature.
+    """
+    id: np.ndarray  # int64
+    x: np.ndarray  # int64
+    y: np.ndarray  # int64
+    age_ticks: np.ndarray  # int64
+    generation: np.ndarray  # int64
+    satiation: np.ndarray  # float64
+    reproductive_urge: np.ndarray  # float64
+    move_accum: np.ndarray  # float64
+    flags: np.ndarray  # uint8, `CreatureFlag` bits
+    pregnant_duration: np.ndarray  # float64
+    # (n, len(GENE_FIELDS)) float64
+    genes: np.ndarray
+    # (n, len(GENE_FIELDS)) float64, NaN rows where the partner genes are not set
+    partner_genes: np.ndarray
+    state_kind: np.ndarray  # int8, `StateKind`
+    state_target: np.ndarray  # int64, target id of hunt, flee and mate states
+    state_dir_x: np.ndarray  # int8, direction of wandering states
+    state_dir_y: np.ndarray  # int8
+
+    @staticmethod
+    def empty(n: int = 0) -> "CreatureColumns":
+        return CreatureColumns(
+            id=np.zeros(n, dtype=np.int64),
+            x=np.zeros(n, dtype=np.int64),
+            y=np.zeros(n, dtype=np.int64),
+            age_ticks=np.zeros(n, dtype=np.int64),
+            generation=np.zeros(n, dtype=np.int64),
+            satiation=np.zeros(n),
+            reproductive_urge=np.zeros(n),
+            move_accum=np.zeros(n),
+            flags=np.zeros(n, dtype=np.uint8),
+            pregnant_duration=np.zeros(n),
+            genes=np.zeros((n, len(GENE_FIELDS))),
+            partner_genes=np.full((n, len(GENE_FIELDS)), np.nan),
+            state_kind=np.zeros(n, dtype=np.int8),
+            state_target=np.full(n, -1, dtype=np.int64),
+            state_dir_x=np.zeros(n, dtype=np.int8),
+            state_dir_y=np.zeros(n, dtype=np.int8),
+        )
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def copy(self) -> "CreatureColumns":
+        return CreatureColumns(*(getattr(self, f.name).copy() for f in fields(self)))
+
+    def take(self, rows: np.ndarray) -> "CreatureColumns":
+        """
+        Returns the selected rows (an index array or a boolean mask) as new columns.
+        """
+        return CreatureColumns(*(getattr(self, f.name)[rows] for f in fields(self)))
+
+    @staticmethod
+    def concatenate(parts: list["CreatureColumns"]) -> "CreatureColumns":
+        return CreatureColumns(*(np.concatenate([getattr(p, f.name) for p in parts]) for f in fields(CreatureColumns)))
+
+    def gene(self, name: str) -> np.ndarray:
+        return self.genes[:, GENE_INDEX[name]]
+
+    @property
+    def mature(self) -> np.ndarray:
+        return (self.flags & CreatureFlag.MATURE) != 0
+
+    @property
+    def pregnant(self) -> np.ndarray:
+        return (self.flags & CreatureFlag.PREGNANT) != 0
+
+    @staticmethod
+    def pack_flags(mature: np.ndarray, pregnant: np.ndarray) -> np.ndarray:
+        return (mature * CreatureFlag.MATURE | pregnant * CreatureFlag.PREGNANT).astype(np.uint8)
+
+    @staticmethod
+    def from_creatures(creatures: list[Creature]) -> "CreatureColumns":
+        def state_columns(state: Optional[EntityState]) -> tuple[int, int, int, int]:
+            if isinstance(state, WanderingState):
+                return StateKind.WANDERING, -1, state.dir_x, state.dir_y
+            elif isinstance(state, HuntState):
+                return StateKind.HUNT, state.target_id, 0, 0
+            elif isinstance(state, FleeState):
+                return StateKind.FLEE, state.target_id, 0, 0
+            elif isinstance(state, MateState):
+                return StateKind.MATE, state.target_id, 0, 0
+            return StateKind.NONE, -1, 0, 0
+
+        def gene_row(genes: Optional[Genes]) -> tuple[float, ...]:
+            if genes is None:
+                return _NO_GENES
+            return _gene_values(genes)
+
+        states = np.array([state_columns(c.state) for c in creatures], dtype=np.int64).reshape(-1, 4)
+        return CreatureColumns(
+            id=np.array([c.id for c in creatures], dtype=np.int64),
+            x=np.array([c.position.x for c in creatures], dtype=np.int64),
+            y=np.array([c.position.y for c in creatures], dtype=np.int64),
+            age_ticks=np.array([c.age_ticks for c in creatures], dtype=np.int64),
+            generation=np.array([c.generation for c in creatures], dtype=np.int64),
+            satiation=np.array([c.satiation for c in creatures], dtype=float),
+            reproductive_urge=np.array([c.reproductive_urge for c in creatures], dtype=float),
+            move_accum=np.array([c.move_accum for c in creatures], dtype=float),
+            flags=CreatureColumns.pack_flags(
+                np.array([c.mature for c in creatures], dtype=bool),
+                np.array([c.pregnant for c in creatures], dtype=bool),
+            ),
+            pregnant_duration=np.array([c.pregnant_duration for c in creatures], dtype=float),
+            genes=np.array([gene_row(c.genes) for c in creatures], dtype=float).reshape(-1, len(GENE_FIELDS)),
+            partner_genes=np.array([gene_row(c.pregnant_partner_genes) for c in creatures], dtype=float).reshape(-1, len(GENE_FIELDS)),
+            state_kind=states[:, 0].astype(np.int8),
+            state_target=states[:, 1],
+            state_dir_x=states[:, 2].astype(np.int8),
+            state_dir_y=states[:, 3].astype(np.int8),
+        )
+
+    def to_creatures(self, cls: Type[Creature]) -> list[Creature]:
+        to_genes, to_state = _to_genes, _to_state
+        mature = self.mature.tolist()
+        pregnant = self.pregnant.tolist()
+        return [
+            cls(
+                id=id_, alive=True, age_ticks=age, position=WorldPosition(x=x, y=y),
+                generation=generation, state=to_state(kind, target, dir_x, dir_y),
+                move_accum=move_accum, satiation=satiation, reproductive_urge=urge,
+                genes=to_genes(genes), mature=mature[i], pregnant=pregnant[i],
+                pregnant_duration=duration, pregnant_partner_genes=to_genes(partner_genes),
+            )
+            for i, (id_, x, y, age, generation, satiation, urge, move_accum, duration, genes, partner_genes, kind, target, dir_x, dir_y)
+            in enumerate(zip(
+                self.id.tolist(), self.x.tolist(), self.y.tolist(), self.age_ticks.tolist(), self.generation.tolist(),
+                self.satiation.tolist(), self.reproductive_urge.tolist(), self.move_accum.tolist(),
+                self.pregnant_duration.tolist(), self.genes.tolist(), self.partner_genes.tolist(),
+                self.state_kind.tolist(), self.state_target.tolist(), self.state_dir_x.tolist(), self.state_dir_y.tolist(),
+            ))
+        ]
+
+
+@dataclass(slots=True)
+class FoodColumns:
+    """
+    Food items stored as columns, one row per item.
+    """
+    id: np.ndarray  # int64
+    x: np.ndarray  # int64
+    y: np.ndarray  # int64
+    age_ticks: np.ndarray  # int64
+
+    @staticmethod
+    def empty(n: int = 0) -> "FoodColumns":
+        return FoodColumns(
+            id=np.zeros(n, dtype=np.int64),
+            x=np.zeros(n, dtype=np.int64),
+            y=np.zeros(n, dtype=np.int64),
+            age_ticks=np.zeros(n, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def copy(self) -> "FoodColumns":
+        return FoodColumns(*(getattr(self, f.name).copy() for f in fields(self)))
+
+    def take(self, rows: np.ndarray) -> "FoodColumns":
+        return FoodColumns(*(getattr(self, f.name)[rows] for f in fields(self)))
+
+    @staticmethod
+    def concatenate(parts: list["FoodColumns"]) -> "FoodColumns":
+        return FoodColumns(*(np.concatenate([getattr(p, f.name) for p in parts]) for f in fields(FoodColumns)))
+
+    @staticmethod
+    def from_food(food: list[Food]) -> "FoodColumns":
+        return FoodColumns(
+            id=np.array([f.id for f in food], dtype=np.int64),
+            x=np.array([f.position.x for f in food], dtype=np.int64),
+            y=np.array([f.position.y for f in food], dtype=np.int64),
+            age_ticks=np.array([f.age_ticks for f in food], dtype=np.int64),
+        )
+
+    def to_food(self, max_age: int) -> list[Food]:
+        return [
+            Food(id=id_, alive=True, age_ticks=age, position=WorldPosition(x=x, y=y), max_age=max_age)
+            for id_, x, y, age in zip(self.id.tolist(), self.x.tolist(), self.y.tolist(), self.age_ticks.tolist())
+        ]
+
+
+class ColumnLists:
+    """
+    Columns converted to Python lists, each one when it is first read.
+    """
+    __slots__ = ('_columns', '_lists')
+
+    def __init__(self, columns):
+        self._columns = columns
+        self._lists: dict[str, list] = {}
+
+    def __getitem__(self, name: str) -> list:
+        values = self._lists.get(name)
+        if values is None:
+            values = self._lists[name] = getattr(self._columns, name).tolist()
+        return values
+
+
+def _column(name: str) -> property:
+    return property(lambda self: self._lists[name][self._row])
+
+
+class CreatureView:
+    """
+    Read only view of one row of `CreatureColumns`, with the fields of a `Creature`.
+    Fields are read from the columns when accessed, positions, genes and states are built then.
+    """
+    __slots__ = ('_lists', '_row')
+    alive = True
+
+    def __init__(self, lists: ColumnLists, row: int):
+        self._lists = lists
+        self._row = row
+
+    id = _column("id")
+    age_ticks = _column("age_ticks")
+    generation = _column("generation")
+    move_accum = _column("move_accum")
+    satiation = _column("satiation")
+    reproductive_urge = _column("reproductive_urge")
+    mature = _column("mature")
+    pregnant = _column("pregnant")
+    pregnant_duration = _column("pregnant_duration")
+
+    @property
+    def position(self) -> WorldPosition:
+        return WorldPosition(x=self._lists["x"][self._row], y=self._lists["y"][self._row])
+
+    @property
+    def genes(self) -> Optional[Genes]:
+        return _to_genes(self._lists["genes"][self._row])
+
+    @property
+    def pregnant_partner_genes(self) -> Optional[Genes]:
+        return _to_genes(self._lists["partner_genes"][self._row])
+
+    @property
+    def state(self) -> Optional[EntityState]:
+        lists, row = self._lists, self._row
+        return _to_state(lists["state_kind"][row], lists["state_target"][row], lists["state_dir_x"][row], lists["state_dir_y"][row])
+
+
+class FoodView:
+    """
+    Read only view of one row of `FoodColumns`, with the fields of `Food`.
+    """
+    __slots__ = ('_lists', '_row', 'max_age')
+    alive = True
+
+    def __init__(self, lists: ColumnLists, row: int, max_age: int):
+        self._lists = lists
+        self._row = row
+        self.max_age = max_age
+
+    id = _column("id")
+    age_ticks = _column("age_ticks")
+
+    @property
+    def position(self) -> WorldPosition:
+        return WorldPosition(x=self._lists["x"][self._row], y=self._lists["y"][self._row])
+
+
+class ColumnarSimulationState:
+    """
+    Read only simulation state backed by columns.
+
+    Exposes the same read API as `SimulationState`. `predators`, `prey` and `food` yield
+    views of the column rows (`CreatureView`, `FoodView`) and counts are read from the columns
+    directly. Entity objects and the position indexes are only built when they are first
+    accessed (`materialize`, `entity_by_id`, the `*_by_position` indexes and queries).
+    """
+    __slots__ = ('grid_width', 'grid_height', 'predator_columns', 'prey_columns', 'food_columns',
+                 'food_max_age', 'food_spawning_accumulator', 'predator_counters', 'prey_counters', 'food_counters',
+                 '_predators', '_prey', '_food', '_materialized')
+
+    def __init__(self, grid_width: int, grid_height: int, predator_columns: CreatureColumns,
+                 prey_columns: CreatureColumns, food_columns: FoodColumns, food_max_age: int,
+                 food_spawning_accumulator: float, predator_counters: PopulationCounters = PopulationCounters(),
+                 prey_counters: PopulationCounters = PopulationCounters(),
+                 food_counters: PopulationCounters = PopulationCounters()):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.predator_columns = predator_columns
+        self.prey_columns = prey_columns
+        self.food_columns = food_columns
+        self.food_max_age = food_max_age
+        self.food_spawning_accumulator = food_spawning_accumulator
+        self.predator_counters = predator_counters
+        self.prey_counters = prey_counters
+        self.food_counters = food_counters
+        self._predators: Optional[ColumnLists] = None
+        self._prey: Optional[ColumnLists] = None
+        self._food: Optional[ColumnLists] = None
+        self._materialized: Optional[SimulationState] = None
+
+    def predators(self) -> Iterator[CreatureView]:
+        if self._predators is None:
+            self._predators = ColumnLists(self.predator_columns)
+        lists = self._predators
+        return (CreatureView(lists, i) for i in range(len(self.predator_columns)))
+
+    def prey(self) -> Iterator[CreatureView]:
+        if self._prey is None:
+            self._prey = ColumnLists(self.prey_columns)
+        lists = self._prey
+        return (CreatureView(lists, i) for i in range(len(self.prey_columns)))
+
+    def food(self) -> Iterator[FoodView]:
+        if self._food is None:
+            self._food = ColumnLists(self.food_columns)
+        lists, max_age = self._food, self.food_max_age
+        return (FoodView(lists, i, max_age) for i in range(len(self.food_columns)))
+
+    def predator_count(self) -> int:
+        return len(self.predator_columns)
+
+    def prey_count(self) -> int:
+        return len(self.prey_columns)
+
+    def food_count(self) -> int:
+        return len(self.food_columns)
+
+    def iter_entities(self) -> Iterator[Union[CreatureView, FoodView]]:
+        yield from self.predators()
+        yield from self.prey()
+        yield from self.food()
+
+    def materialize(self) -> SimulationState:
+        """
+        Builds (once) an object based `SimulationState` holding the same entities.
+        """
+        if self._materialized is None:
+            state = SimulationState(
+                self.grid_width, self.grid_height,
+                food_spawning_accumulator=self.food_spawning_accumulator,
+                predator_counters=self.predator_counters,
+                prey_counters=self.prey_counters,
+                food_counters=self.food_counters,
+            )
+            for predator in self.predator_columns.to_creatures(Predator):
+                state.entity_by_id[predator.id] = predator
+                state.predator_by_position.add(predator.position.to_tuple(), predator)
+            for prey in self.prey_columns.to_creatures(Prey):
+                state.entity_by_id[prey.id] = prey
+                state.prey_by_position.add(prey.position.to_tuple(), prey)
+            for food in self.food_columns.to_food(self.food_max_age):
+                state.entity_by_id[food.id] = food
+                state.food_by_position.add(food.position.to_tuple(), food)
+            self._materialized = state
+        return self._materialized
+
+    @property
+    def entity_by_id(self) -> dict[int, Entity]:
+        return self.materialize().entity_by_id
+
+    @property
+    def predator_by_position(self):
+        return self.materialize().predator_by_position
+
+    @property
+    def prey_by_position(self):
+        return self.materialize().prey_by_position
+
+    @property
+    def food_by_position(self):
+        return self.materialize().food_by_position
+
+    def iter_nearby(self, pos: WorldPosition, radius: int) -> Iterator[Entity]:
+        return self.materialize().iter_nearby(pos, radius)
+
+    def iter_nearby_food(self, pos: WorldPosition, radius: int) -> Iterator[Food]:
+        return self.materialize().iter_nearby_food(pos, radius)
+
+    def iter_nearby_prey(self, pos: WorldPosition, radius: int) -> Iterator[Prey]:
+        return self.materialize().iter_nearby_prey(pos, radius)
+
+    def iter_nearby_predator(self, pos: WorldPosition, radius: int) -> Iterator[Predator]:
+        return self.materialize().iter_nearby_predator(pos, radius)
+
+    def nearest_food(self, pos: WorldPosition, radius: int, predicate: Optional[Callable[[Food], bool]] = None) -> Optional[Food]:
+        return self.materialize().nearest_food(pos, radius, predicate)
+
+    def nearest_prey(self, pos: WorldPosition, radius: int, predicate: Optional[Callable[[Prey], bool]] = None) -> Optional[Prey]:
+        return self.materialize().nearest_prey(pos, radius, predicate)
+
+    def nearest_predator(self, pos: WorldPosition, radius: int, predicate: Optional[Callable[[Predator], bool]] = None) -> Optional[Predator]:
+        return self.materialize().nearest_predator(pos, radius, predicate)
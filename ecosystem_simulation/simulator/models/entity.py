@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from functools import cache
 
 from .world_position import WorldPosition
 
@@ -11,3 +12,17 @@ class Entity:
 
     # Current position of this entity
     position: WorldPosition
+
+    def fork(self) -> "Entity":
+        """
+        Returns a new version of this entity to be updated by the next tick.
+        Field values are shared with this version, so objects held by the fields
+        (position, genes, state) must be replaced, never mutated.
+        """
+        cls = type(self)
+        return cls(*[getattr(self, name) for name in _field_names(cls)])
+
+
+@cache
+def _field_names(cls: type) -> tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
@@ -1,5 +1,9 @@
 from dataclasses import dataclass
 from random import Random
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from ..random_stream import RandomStream
 
 
 @dataclass(slots=True)
@@ -43,7 +47,7 @@ class Genes:
     # Values: [0, 1]
     timidity: float
 
-    def mix(self, other: "Genes", rng: Random, mutation_chance: float, mutation_magnitude: float) -> "Genes":
+    def mix(self, other: "Genes", rng: Union[Random, "RandomStream"], mutation_chance: float, mutation_magnitude: float) -> "Genes":
         def mix_genes(x: float, y: float) -> float:
             final_gene = (x + y) / 2
             if rng.uniform(0, 1) < mutation_chance:
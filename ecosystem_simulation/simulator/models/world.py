@@ -1,12 +1,176 @@
-from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import Collection, Iterator
+from operator import itemgetter
+from typing import Callable, Collection, Generic, ItemsView, Iterator, KeysView, Optional, Sequence, TypeVar, ValuesView
 
 from ..models.world_position import WorldPosition
 from ..models.entity import Entity
 from ..models.food import Food
 from ..models.creature import Prey, Predator
 
+# Chunks of the spatial index cover CHUNK_SIZE x CHUNK_SIZE cells
+CHUNK_SHIFT = 3
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+CHUNK_MASK = CHUNK_SIZE - 1
+
+E = TypeVar('E', bound=Entity)
+
+
+class SpatialIndex(Generic[E]):
+    """
+    Uniform grid index of entities by cell.
+
+    Only occupied cells hold an entity list. Lists are kept in a dict (by position, in order of first
+    insertion) and bucketed into chunks of `CHUNK_SIZE`x`CHUNK_SIZE` cells, each listing its occupied
+    cells, so window queries only look at the occupied cells of the chunks they overlap.
+    Lookups never insert anything, the index only changes through `add`.
+    """
+    __slots__ = ('_cells', '_chunks', '_entity_count')
+
+    def __init__(self):
+        self._cells: dict[tuple[int, int], list[E]] = {}
+        self._chunks: dict[tuple[int, int], list[tuple[int, int, list[E]]]] = {}
+        self._entity_count = 0
+
+    def add(self, pos: tuple[int, int], entity: E):
+        cell = self._cells.get(pos)
+        if cell is None:
+            cell = self._cells[pos] = []
+            x, y = pos
+            chunk = self._chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+            if chunk is None:
+                chunk = self._chunks[(x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)] = []
+            chunk.append((x, y, cell))
+        cell.append(entity)
+        self._entity_count += 1
+
+    def entity_count(self) -> int:
+        return self._entity_count
+
+    def at(self, pos: tuple[int, int]) -> Sequence[E]:
+        """
+        Entities in the given cell (empty if there are none).
+        """
+        return self._cells.get(pos, ())
+
+    def get(self, pos: tuple[int, int], default=None) -> Optional[list[E]]:
+        return self._cells.get(pos, default)
+
+    def __getitem__(self, pos: tuple[int, int]) -> Sequence[E]:
+        return self.at(pos)
+
+    def __contains__(self, pos: tuple[int, int]) -> bool:
+        return pos in self._cells
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return iter(self._cells)
+
+    def __len__(self) -> int:
+        """
+        Number of occupied cells.
+        """
+        return len(self._cells)
+
+    def keys(self) -> KeysView[tuple[int, int]]:
+        return self._cells.keys()
+
+    def values(self) -> ValuesView[list[E]]:
+        return self._cells.values()
+
+    def items(self) -> ItemsView[tuple[int, int], list[E]]:
+        return self._cells.items()
+
+    def iter_window(self, x0: int, x1: int, y0: int, y1: int) -> Iterator[E]:
+        """
+        Entities in cells `[x0, x1) x [y0, y1)`, ordered by cell x, cell y and then insertion.
+        """
+        cells = []
+        for chunk_x in range(x0 >> CHUNK_SHIFT, ((x1 - 1) >> CHUNK_SHIFT) + 1):
+            for chunk_y in range(y0 >> CHUNK_SHIFT, ((y1 - 1) >> CHUNK_SHIFT) + 1):
+                chunk = self._chunks.get((chunk_x, chunk_y))
+                if chunk is not None:
+                    cells.extend(cell for cell in chunk if x0 <= cell[0] < x1 and y0 <= cell[1] < y1)
+        # Positions are unique, so cells are sorted by (x, y)
+        cells.sort()
+        for _, _, entities in cells:
+            yield from entities
+
+    def nearest(self, pos: WorldPosition, x0: int, x1: int, y0: int, y1: int,
+                predicate: Optional[Callable[[E], bool]] = None, moved: int = 0) -> Optional[E]:
+        """
+        Closest entity in cells `[x0, x1) x [y0, y1)` for which `predicate` holds, or `None`.
+
+        Chunks are searched in rings of increasing distance from `pos`, until no further chunk can
+        hold a closer entity. Distances are measured to the current entity positions, which may be up
+        to `moved` cells away from the cells the entities were indexed in. Equally distant entities are
+        resolved in `iter_window` order, so the result is the first closest entity `iter_window` yields.
+        """
+        px, py = pos.x, pos.y
+        rings = []
+        for chunk_x in range(x0 >> CHUNK_SHIFT, ((x1 - 1) >> CHUNK_SHIFT) + 1):
+            # Distance from pos to the closest cell of the chunk, less the cells entities may have moved
+            dx = max(0, max((chunk_x << CHUNK_SHIFT) - px, px - ((chunk_x << CHUNK_SHIFT) | CHUNK_MASK)) - moved)
+            for chunk_y in range(y0 >> CHUNK_SHIFT, ((y1 - 1) >> CHUNK_SHIFT) + 1):
+                chunk = self._chunks.get((chunk_x, chunk_y))
+                if chunk is not None:
+                    dy = max(0, max((chunk_y << CHUNK_SHIFT) - py, py - ((chunk_y << CHUNK_SHIFT) | CHUNK_MASK)) - moved)
+                    rings.append((dx * dx + dy * dy, chunk))
+        rings.sort(key=itemgetter(0))
+
+        best = None
+        best_key = None
+        for bound, chunk in rings:
+            if best_key is not None and bound > best_key[0]:
+                break
+            for x, y, cell in chunk:
+                if not (x0 <= x < x1 and y0 <= y < y1):
+                    continue
+                for i, e in enumerate(cell):
+                    if predicate is not None and not predicate(e):
+                        continue
+                    e_pos = e.position
+                    distance_sq = (e_pos.x - px) ** 2 + (e_pos.y - py) ** 2
+                    if best_key is None or distance_sq <= best_key[0]:
+                        key = (distance_sq, x, y, i)
+                        if best_key is None or key < best_key:
+                            best = e
+                            best_key = key
+        return best
+
+    def memory_usage(self) -> int:
+        """
+        Approximate size of the index structures in bytes (excluding the entities).
+        """
+        from sys import getsizeof
+        return (getsizeof(self._cells) + getsizeof(self._chunks)
+                + sum(getsizeof(pos) + getsizeof(cell) for pos, cell in self._cells.items())
+                + sum(getsizeof(key) + getsizeof(chunk) + sum(getsizeof(cell) for cell in chunk)
+                      for key, chunk in self._chunks.items()))
+
+
+@dataclass(slots=True, frozen=True)
+class PopulationCounters:
+    """
+    Births and deaths of one kind of entity (for food: spawned, and eaten or expired).
+    """
+    # During the tick that produced the state
+    births: int = 0
+    deaths: int = 0
+
+    # Since the start of the simulation
+    total_births: int = 0
+    total_deaths: int = 0
+
+    def next(self, births: int, deaths: int) -> "PopulationCounters":
+        """
+        Counters of the following state.
+        """
+        return PopulationCounters(
+            births=births,
+            deaths=deaths,
+            total_births=self.total_births + births,
+            total_deaths=self.total_deaths + deaths,
+        )
+
 
 @dataclass(slots=True, frozen=True)
 class SimulationState:
@@ -14,12 +178,16 @@ class SimulationState:
     grid_height: int
     entity_by_id: dict[int, Entity] = field(default_factory=dict)
 
-    predator_by_position: dict[tuple[int, int], list[Predator]] = field(default_factory=lambda: defaultdict(list))
-    prey_by_position: dict[tuple[int, int], list[Prey]] = field(default_factory=lambda: defaultdict(list))
-    food_by_position: dict[tuple[int, int], list[Food]] = field(default_factory=lambda: defaultdict(list))
+    predator_by_position: SpatialIndex[Predator] = field(default_factory=SpatialIndex)
+    prey_by_position: SpatialIndex[Prey] = field(default_factory=SpatialIndex)
+    food_by_position: SpatialIndex[Food] = field(default_factory=SpatialIndex)
 
     food_spawning_accumulator: float = 0
 
+    predator_counters: PopulationCounters = field(default_factory=PopulationCounters)
+    prey_counters: PopulationCounters = field(default_factory=PopulationCounters)
+    food_counters: PopulationCounters = field(default_factory=PopulationCounters)
+
     def predators(self) -> Iterator[Predator]:
         for pred_list in self.predator_by_position.values():
             for pred in pred_list:
@@ -36,13 +204,13 @@ class SimulationState:
                 yield food
 
     def predator_count(self) -> int:
-        return sum(len(preds) for preds in self.predator_by_position.values())
+        return self.predator_by_position.entity_count()
 
     def prey_count(self) -> int:
-        return sum(len(preys) for preys in self.prey_by_position.values())
+        return self.prey_by_position.entity_count()
 
     def food_count(self) -> int:
-        return sum(len(foods) for foods in self.food_by_position.values())
+        return self.food_by_position.entity_count()
 
     def iter_entities(self) -> Iterator[Entity]:
         for predator in self.predators():
@@ -52,33 +220,72 @@ class SimulationState:
         for food in self.food():
             yield food
 
+    def fork(self) -> "SimulationState":
+        """
+        Returns a working copy to simulate the next tick on, leaving this state unchanged.
+        Every entity is forked (see `Entity.fork`) and indexed in the same cell and order.
+        """
+        forked = SimulationState(
+            grid_width=self.grid_width,
+            grid_height=self.grid_height,
+            food_spawning_accumulator=self.food_spawning_accumulator,
+            predator_counters=self.predator_counters,
+            prey_counters=self.prey_counters,
+            food_counters=self.food_counters,
+        )
+        for name in ('predator_by_position', 'prey_by_position', 'food_by_position'):
+            index = getattr(forked, name)
+            for pos, entities in getattr(self, name).items():
+                for entity in entities:
+                    entity = entity.fork()
+                    index.add(pos, entity)
+                    forked.entity_by_id[entity.id] = entity
+        return forked
+
+    def _window(self, pos: WorldPosition, radius: int) -> tuple[int, int, int, int]:
+        return (max(pos.x - radius, 0), min(pos.x + radius, self.grid_width),
+                max(pos.y - radius, 0), min(pos.y + radius, self.grid_height))
+
     def iter_nearby(self, pos: WorldPosition, radius: int) -> Iterator[Entity]:
         for dx in range(max(pos.x - radius, 0), min(pos.x + radius, self.grid_width)):
             for dy in range(max(pos.y - radius, 0), min(pos.y + radius, self.grid_height)):
-                for e in self.food_by_position[(dx, dy)]:
+                for e in self.food_by_position.at((dx, dy)):
                     yield e
-                for e in self.prey_by_position[(dx, dy)]:
+                for e in self.prey_by_position.at((dx, dy)):
                     yield e
-                for e in self.predator_by_position[(dx, dy)]:
+                for e in self.predator_by_position.at((dx, dy)):
                     yield e
 
     def iter_nearby_food(self, pos: WorldPosition, radius: int) -> Iterator[Food]:
-        for dx in range(max(pos.x - radius, 0), min(pos.x + radius, self.grid_width)):
-            for dy in range(max(pos.y - radius, 0), min(pos.y + radius, self.grid_height)):
-                for e in self.food_by_position[(dx, dy)]:
-                    yield e
+        return self.food_by_position.iter_window(*self._window(pos, radius))
 
     def iter_nearby_prey(self, pos: WorldPosition, radius: int) -> Iterator[Prey]:
-        for dx in range(max(pos.x - radius, 0), min(pos.x + radius, self.grid_width)):
-            for dy in range(max(pos.y - radius, 0), min(pos.y + radius, self.grid_height)):
-                for e in self.prey_by_position[(dx, dy)]:
-                    yield e
+        return self.prey_by_position.iter_window(*self._window(pos, radius))
 
     def iter_nearby_predator(self, pos: WorldPosition, radius: int) -> Iterator[Predator]:
-        for dx in range(max(pos.x - radius, 0), min(pos.x + radius, self.grid_width)):
-            for dy in range(max(pos.y - radius, 0), min(pos.y + radius, self.grid_height)):
-                for e in self.predator_by_position[(dx, dy)]:
-                    yield e
+        return self.predator_by_position.iter_window(*self._window(pos, radius))
+
+    # Entities of the working copy being simulated (see `fork`) may have moved by one cell
+    # since they were indexed, as the simulator updates them in place during a tick.
+    NEAREST_MOVED_CELLS = 1
+
+    def nearest_food(self, pos: WorldPosition, radius: int, predicate: Optional[Callable[[Food], bool]] = None) -> Optional[Food]:
+        """
+        Closest food in the `iter_nearby_food` window (for which `predicate` holds).
+        """
+        return self.food_by_position.nearest(pos, *self._window(pos, radius), predicate, self.NEAREST_MOVED_CELLS)
+
+    def nearest_prey(self, pos: WorldPosition, radius: int, predicate: Optional[Callable[[Prey], bool]] = None) -> Optional[Prey]:
+        """
+        Closest prey in the `iter_nearby_prey` window (for which `predicate` holds).
+        """
+        return self.prey_by_position.nearest(pos, *self._window(pos, radius), predicate, self.NEAREST_MOVED_CELLS)
+
+    def nearest_predator(self, pos: WorldPosition, radius: int, predicate: Optional[Callable[[Predator], bool]] = None) -> Optional[Predator]:
+        """
+        Closest predator in the `iter_nearby_predator` window (for which `predicate` holds).
+        """
+        return self.predator_by_position.nearest(pos, *self._window(pos, radius), predicate, self.NEAREST_MOVED_CELLS)
 
 
     def serialize(self):
@@ -1,13 +1,22 @@
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from enum import IntEnum
 
+from .random_stream import RandomStreamMode
+
 
 class LogicType(IntEnum):
     NORMAL = 1
     FUZZY = 2
 
 
+class FuzzyInference(IntEnum):
+    # Every decision runs the full fuzzy inference.
+    EXACT = 1
+    # Decisions interpolate a precomputed table of defuzzified outputs.
+    TABULATED = 2
+
+
 @dataclass(slots=True, frozen=True)
 class EntitySimulationOptions:
     # The number of predators to spawn when initializing the simulation grid.
@@ -67,18 +76,40 @@ class SimulationOptions:
     predator: EntitySimulationOptions
     prey: EntitySimulationOptions
 
+    # How fuzzy logic decisions are computed (only used with `LogicType.FUZZY`).
+    fuzzy_inference: FuzzyInference = FuzzyInference.EXACT
+
+    # Number of quantization steps per axis of the table used by `FuzzyInference.TABULATED`.
+    fuzzy_table_resolution: int = 64
+
+    # Random number stream of the simulation, `RandomStreamMode.COMPAT` reproduces runs of old seeds.
+    random_stream: RandomStreamMode = RandomStreamMode.COMPAT
+
+    def serialize(self) -> dict:
+        """
+        JSON compatible dict of the options, enums are stored by value.
+        """
+        return asdict(self)
+
     @staticmethod
-    def from_json_str(json_str: str) -> "SimulationOptions":
-        params = json.loads(json_str)
+    def deserialize(data: dict) -> "SimulationOptions":
+        params = dict(data)
 
         predator = EntitySimulationOptions(**params.pop("predator"))
         prey = EntitySimulationOptions(**params.pop("prey"))
 
-        if "logic_determine_creature_state" not in params:
-            params["logic_determine_creature_state"] = LogicType.NORMAL
+        params["logic_determine_creature_state"] = LogicType(params.get("logic_determine_creature_state", LogicType.NORMAL))
+        if "fuzzy_inference" in params:
+            params["fuzzy_inference"] = FuzzyInference(params["fuzzy_inference"])
+        if "random_stream" in params:
+            params["random_stream"] = RandomStreamMode(params["random_stream"])
 
         return SimulationOptions(**params, predator=predator, prey=prey)
 
+    @staticmethod
+    def from_json_str(json_str: str) -> "SimulationOptions":
+        return SimulationOptions.deserialize(json.loads(json_str))
+
     @staticmethod
     def from_json_file(path: str) -> "SimulationOptions":
         with open(path, "r") as f:
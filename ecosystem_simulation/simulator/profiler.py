@@ -0,0 +1,241 @@
+"""
+Per-phase timing of simulation ticks.
+
+A `TickProfiler` attached to `EcosystemSimulator` (see `EcosystemSimulator.enable_profiling`)
+receives one `TickProfile` per simulated tick, with the wall time spent and the number of items
+processed in each `TickPhase`. While no profiler is attached the simulator only pays for a
+`None` check per phase.
+"""
+import csv
+import json
+import math
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from time import perf_counter
+from typing import Iterator, Optional
+
+
+class TickPhase(IntEnum):
+    # Forking the current state and preparing the draft of the next one.
+    FORK = 0
+    # Satiation, reproductive urge, pregnancy and births of each creature.
+    METABOLISM = 1
+    # Choosing the next state of creatures that move this tick (target searches, fuzzy inference).
+    DECIDE = 2
+    # Moving creatures towards their targets, eating and mating (`update_state`).
+    MOVE = 3
+    # Aging and starving creatures.
+    ALIVENESS = 4
+    # Killing creatures of overcrowded cells.
+    OVERCROWDING = 5
+    # Aging and expiring food.
+    FOOD_AGING = 6
+    # Copying the surviving entities into the draft of the next state.
+    COPY = 7
+    # Spawning new food and finalizing the next state.
+    FOOD_SPAWNING = 8
+
+
+PHASE_NAMES = tuple(phase.name.lower() for phase in TickPhase)
+
+
+class TickTimer:
+    """
+    Collects the phase timings of the tick being simulated.
+
+    Phases run one after another, so `lap` attributes the time since the previous lap
+    to the given phase. Interleaved phases (such as deciding and moving of each creature)
+    simply lap more often.
+    """
+    __slots__ = ("tick_number", "seconds", "items", "_start", "_last")
+
+    def __init__(self, tick_number: int):
+        self.tick_number = tick_number
+        self.seconds = [0.0] * len(TickPhase)
+        self.items = [0] * len(TickPhase)
+        self._start = self._last = perf_counter()
+
+    def lap(self, phase: TickPhase, items: int = 1):
+        now = perf_counter()
+        self.seconds[phase] += now - self._last
+        self.items[phase] += items
+        self._last = now
+
+    def finish(self, predators: int, prey: int, food: int) -> "TickProfile":
+        return TickProfile(
+            tick_number=self.tick_number,
+            total_seconds=self._last - self._start,
+            seconds=tuple(self.seconds),
+            items=tuple(self.items),
+            predators=predators,
+            prey=prey,
+            food=food,
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class TickProfile:
+    """
+    Timings of a single tick. `seconds` and `items` are indexed by `TickPhase`.
+    """
+    tick_number: int
+    total_seconds: float
+    seconds: tuple[float, ...]
+    items: tuple[int, ...]
+
+    # Population of the state the tick produced
+    predators: int
+    prey: int
+    food: int
+
+    def phase_seconds(self, phase: TickPhase) -> float:
+        return self.seconds[phase]
+
+    def phase_items(self, phase: TickPhase) -> int:
+        return self.items[phase]
+
+    def serialize(self) -> dict:
+        return {
+            "tick_number": self.tick_number,
+            "total_seconds": self.total_seconds,
+            "predators": self.predators,
+            "prey": self.prey,
+            "food": self.food,
+            "phases": {
+                name: {"seconds": seconds, "items": items}
+                for name, seconds, items in zip(PHASE_NAMES, self.seconds, self.items)
+            },
+        }
+
+    @staticmethod
+    def deserialize(data: dict) -> "TickProfile":
+        phases = data["phases"]
+        return TickProfile(
+            tick_number=data["tick_number"],
+            total_seconds=data["total_seconds"],
+            seconds=tuple(phases[name]["seconds"] for name in PHASE_NAMES),
+            items=tuple(phases[name]["items"] for name in PHASE_NAMES),
+            predators=data["predators"],
+            prey=data["prey"],
+            food=data["food"],
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class PhaseSummary:
+    """
+    Statistics of one phase (or of whole ticks) over the profiled window.
+    """
+    mean_seconds: float
+    max_seconds: float
+    p95_seconds: float
+    # Share of the mean tick time
+    share: float
+    mean_items: float
+
+
+class TickProfiler:
+    """
+    Keeps the profiles of the last `history` ticks and summarizes the last `window` of them.
+    """
+    history: deque[TickProfile]
+    window: int
+
+    def __init__(self, history: int = 10000, window: int = 100):
+        self.history = deque(maxlen=history)
+        self.window = window
+
+    def record(self, profile: TickProfile):
+        self.history.append(profile)
+
+    def clear(self):
+        self.history.clear()
+
+    def last(self) -> Optional[TickProfile]:
+        return self.history[-1] if len(self.history) > 0 else None
+
+    def recent(self) -> list[TickProfile]:
+        """
+        Profiles of the summarized window, oldest first.
+        """
+        n = min(self.window, len(self.history))
+        return [self.history[i] for i in range(len(self.history) - n, len(self.history))]
+
+    def summary(self) -> dict[str, PhaseSummary]:
+        """
+        Summary of every phase over the window, keyed by the phase name, plus `"tick"` for whole ticks.
+        """
+        profiles = self.recent()
+        if len(profiles) == 0:
+            return {}
+
+        totals = [p.total_seconds for p in profiles]
+        mean_total = sum(totals) / len(totals)
+
+        def summarize(seconds: list[float], items: list[int]) -> PhaseSummary:
+            mean = sum(seconds) / len(seconds)
+            return PhaseSummary(
+                mean_seconds=mean,
+                max_seconds=max(seconds),
+                p95_seconds=_percentile(seconds, 0.95),
+                share=mean / mean_total if mean_total > 0 else 0.0,
+                mean_items=sum(items) / len(items),
+            )
+
+        res = {
+            name: summarize([p.seconds[phase] for p in profiles], [p.items[phase] for p in profiles])
+            for phase, name in zip(TickPhase, PHASE_NAMES)
+        }
+        res["tick"] = summarize(totals, [p.predators + p.prey for p in profiles])
+        return res
+
+    def slowest(self, n: int = 10) -> list[TickProfile]:
+        """
+        The `n` slowest ticks of the whole history, slowest first.
+        """
+        return sorted(self.history, key=lambda p: p.total_seconds, reverse=True)[:n]
+
+    def format_summary(self) -> str:
+        lines = [f"{'phase':>14} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9} {'share':>6} {'items':>9}"]
+        for name, s in self.summary().items():
+            lines.append(
+                f"{name:>14} {s.mean_seconds * 1e3:9.3f} {s.p95_seconds * 1e3:9.3f} {s.max_seconds * 1e3:9.3f} "
+                f"{s.share * 100:5.1f}% {s.mean_items:9.1f}"
+            )
+        return "\n".join(lines)
+
+    def export(self, path: str):
+        """
+        Writes the whole history to `path`, as CSV if it ends with `.csv`, otherwise as JSON lines.
+        """
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(
+                    ["tick_number", "total_seconds", "predators", "prey", "food"]
+                    + [f"{name}_seconds" for name in PHASE_NAMES]
+                    + [f"{name}_items" for name in PHASE_NAMES]
+                )
+                for p in self.history:
+                    writer.writerow([p.tick_number, p.total_seconds, p.predators, p.prey, p.food, *p.seconds, *p.items])
+        else:
+            with open(path, "w") as f:
+                for p in self.history:
+                    f.write(json.dumps(p.serialize()))
+                    f.write("\n")
+
+    @staticmethod
+    def load(path: str) -> Iterator[TickProfile]:
+        """
+        Reads profiles exported as JSON lines.
+        """
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield TickProfile.deserialize(json.loads(line))
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
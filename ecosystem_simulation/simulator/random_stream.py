@@ -0,0 +1,178 @@
+"""
+Random number streams used by the simulator.
+
+Two streams are available (see `RandomStreamMode`):
+
+- `CompatRandomStream` draws from `random.Random(seed)`, exactly as the simulator always did,
+  so old seeds reproduce old simulations.
+- `BatchedRandomStream` pre-draws blocks of uniform numbers from a NumPy `PCG64` bit generator
+  and hands them out one by one, which is much cheaper than the scalar `random.Random` calls.
+
+Determinism guarantee of `BatchedRandomStream`: every value is derived from exactly one
+53-bit uniform number taken from the raw `PCG64(seed)` output (whose stream NumPy keeps stable
+across versions and platforms), in the order of the calls. The same seed and the same sequence
+of calls therefore always produce the same values, regardless of the block size. Its values
+differ from `CompatRandomStream` for the same seed.
+"""
+import random
+import struct
+from abc import ABCMeta, abstractmethod
+from enum import IntEnum
+from typing import Sequence, TypeVar
+
+import numpy as np
+
+T = TypeVar('T')
+
+# Number of uniform numbers drawn at once by `BatchedRandomStream`
+BATCH_SIZE = 4096
+
+
+class RandomStreamMode(IntEnum):
+    # `random.Random`, the sequence of old seeds stays the same.
+    COMPAT = 1
+    # Uniform numbers pre-drawn in blocks from NumPy.
+    BATCHED = 2
+
+
+class RandomStream(metaclass=ABCMeta):
+    """
+    The subset of the `random.Random` interface used by the simulator.
+    """
+    mode: RandomStreamMode
+
+    @abstractmethod
+    def random(self) -> float:
+        """
+        Uniform float in `[0, 1)`.
+        """
+        return NotImplemented
+
+    @abstractmethod
+    def uniform(self, a: float, b: float) -> float:
+        """
+        Uniform float between `a` and `b`.
+        """
+        return NotImplemented
+
+    @abstractmethod
+    def randint(self, a: int, b: int) -> int:
+        """
+        Uniform integer in `[a, b]` (both inclusive).
+        """
+        return NotImplemented
+
+    @abstractmethod
+    def choice(self, seq: Sequence[T]) -> T:
+        """
+        Uniformly chosen element of a non-empty sequence.
+        """
+        return NotImplemented
+
+    @abstractmethod
+    def getstate(self) -> bytes:
+        """
+        Compact binary state, a stream restored from it with `setstate` continues identically.
+        """
+        return NotImplemented
+
+    @abstractmethod
+    def setstate(self, state: bytes):
+        return NotImplemented
+
+
+class CompatRandomStream(RandomStream):
+    mode = RandomStreamMode.COMPAT
+
+    def __init__(self, seed: int):
+        self._random = random.Random(x=seed)
+        # Bound methods, so calls cost the same as calling `random.Random` directly
+        self.random = self._random.random
+        self.uniform = self._random.uniform
+        self.randint = self._random.randint
+        self.choice = self._random.choice
+
+    def random(self) -> float:
+        return self._random.random()
+
+    def uniform(self, a: float, b: float) -> float:
+        return self._random.uniform(a, b)
+
+    def randint(self, a: int, b: int) -> int:
+        return self._random.randint(a, b)
+
+    def choice(self, seq: Sequence[T]) -> T:
+        return self._random.choice(seq)
+
+    # Version, Mersenne Twister words and position, then the next gaussian (NaN if there is none)
+    _STATE = struct.Struct("<I625Id")
+
+    def getstate(self) -> bytes:
+        version, words, gauss_next = self._random.getstate()
+        return self._STATE.pack(version, *words, float("nan") if gauss_next is None else gauss_next)
+
+    def setstate(self, state: bytes):
+        version, *words, gauss_next = self._STATE.unpack(state)
+        self._random.setstate((version, tuple(words), None if gauss_next != gauss_next else gauss_next))
+
+
+class BatchedRandomStream(RandomStream):
+    mode = RandomStreamMode.BATCHED
+
+    def __init__(self, seed: int, batch_size: int = BATCH_SIZE):
+        self._bit_generator = np.random.PCG64(seed)
+        self._batch_size = batch_size
+        self._uniforms = iter(())
+
+    def _refill(self) -> float:
+        raw = self._bit_generator.random_raw(self._batch_size)
+        # 53 bit floats in [0, 1), the same conversion NumPy and `random.Random` use
+        self._uniforms = iter(((raw >> np.uint64(11)).astype(np.float64) * (1.0 / 9007199254740992.0)).tolist())
+        return next(self._uniforms)
+
+    def random(self) -> float:
+        u = next(self._uniforms, None)
+        return u if u is not None else self._refill()
+
+    def uniform(self, a: float, b: float) -> float:
+        u = next(self._uniforms, None)
+        return a + (b - a) * (u if u is not None else self._refill())
+
+    def randint(self, a: int, b: int) -> int:
+        u = next(self._uniforms, None)
+        return a + int((u if u is not None else self._refill()) * (b - a + 1))
+
+    def choice(self, seq: Sequence[T]) -> T:
+        u = next(self._uniforms, None)
+        return seq[int((u if u is not None else self._refill()) * len(seq))]
+
+    # PCG64 state and increment (128 bit each), buffered 32 bit value, then the number of pre-drawn uniforms left
+    _STATE = struct.Struct("<16s16sIII")
+
+    def getstate(self) -> bytes:
+        remaining = list(self._uniforms)
+        self._uniforms = iter(remaining)
+        state = self._bit_generator.state
+        return self._STATE.pack(
+            state["state"]["state"].to_bytes(16, "little"),
+            state["state"]["inc"].to_bytes(16, "little"),
+            state["has_uint32"],
+            state["uinteger"],
+            len(remaining),
+        ) + np.array(remaining, dtype="<f8").tobytes()
+
+    def setstate(self, state: bytes):
+        pcg_state, inc, has_uint32, uinteger, n = self._STATE.unpack_from(state, 0)
+        self._bit_generator.state = {
+            "bit_generator": "PCG64",
+            "state": {"state": int.from_bytes(pcg_state, "little"), "inc": int.from_bytes(inc, "little")},
+            "has_uint32": has_uint32,
+            "uinteger": uinteger,
+        }
+        self._uniforms = iter(np.frombuffer(state, dtype="<f8", count=n, offset=self._STATE.size).tolist())
+
+
+def create_random_stream(seed: int, mode: RandomStreamMode = RandomStreamMode.COMPAT) -> RandomStream:
+    if mode == RandomStreamMode.BATCHED:
+        return BatchedRandomStream(seed)
+    return CompatRandomStream(seed)
@@ -130,7 +130,7 @@ class EcosystemVisualizer:
                     self.simulation_speed = event.value
                     self.speed_label.set_text(f"Speed: {self.simulation_speed:.1f}x")
                 elif event.ui_element == self.progress_slider:
-                    self.player.tick = int(event.value * self.player.tick_count())
+                    self.player.seek(int(event.value * self.player.tick_count()))
 
             self.ui_manager.process_events(event)
 
@@ -179,9 +179,9 @@ class EcosystemVisualizer:
 
         # Draw entity counts
         counts_text = self.font.render(
-            f"Predators: {len(list(self.current_tick.state.predators()))} "
-            f"Prey: {len(list(self.current_tick.state.prey()))} "
-            f"Food: {len(list(self.current_tick.state.food()))}",
+            f"Predators: {self.current_tick.state.predator_count()} "
+            f"Prey: {self.current_tick.state.prey_count()} "
+            f"Food: {self.current_tick.state.food_count()}",
             True, TEXT_COLOR
         )
         self.screen.blit(counts_text, (10, 90))
@@ -209,6 +209,7 @@ class EcosystemVisualizer:
             self.draw()
             clock.tick(60)
 
+        self.player.close()
         pygame.quit()
 
 class EcosystemRecorder:
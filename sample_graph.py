@@ -1,14 +1,23 @@
+import argparse
+
 from ecosystem_simulation.simulation_grapher import SimulationGrapher, GraphOpts
 from ecosystem_simulation.simulation_player import *
 
 
 def main():
-    opts: SimulationOptions = SimulationOptions.from_json_file("optimization_results/best_20250116-224426_5000.json")
-    simulator = EcosystemSimulator(
-        options_=opts,
-    )
-
-    grapher = SimulationGrapher(simulator=simulator)
+    parser = argparse.ArgumentParser(description="Plot the graphs of a simulation.")
+    parser.add_argument("--recording", type=str, default=None, help="Graph this recording instead of running the simulation.")
+    args = parser.parse_args()
+
+    if args.recording is not None:
+        grapher = SimulationGrapher(recording=args.recording)
+    else:
+        opts: SimulationOptions = SimulationOptions.from_json_file("optimization_results/best_20250116-224426_5000.json")
+        simulator = EcosystemSimulator(
+            options_=opts,
+        )
+
+        grapher = SimulationGrapher(simulator=simulator)
 
     graphs = [
         GraphOpts(
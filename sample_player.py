@@ -9,7 +9,7 @@ from ecosystem_simulation.simulation_player import *
 
 def main():
     parser = argparse.ArgumentParser(description="Run the ecosystem simulation.")
-    parser.add_argument("--filename", type=str, default="recordings/simulation_data.json", help="The filename to save the simulation data to.")
+    parser.add_argument("--filename", type=str, default="recordings/simulation_data.eesrec", help="The filename to save the simulation data to.")
     args = parser.parse_args()
 
     player = SimulationPlayer(mode=PlayerMode.FILE, source=args.filename)
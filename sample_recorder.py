@@ -4,11 +4,13 @@ import argparse
 from ecosystem_simulation.simulator import EcosystemSimulator, SimulatedTick
 from ecosystem_simulation.simulator.options import SimulationOptions, EntitySimulationOptions
 from ecosystem_simulation.simulation_recorder import SimulationRecorder
+from ecosystem_simulation.recording import Codec
 from ecosystem_simulation.simulator.options import LogicType
 
 def main():
     parser = argparse.ArgumentParser(description="Run the ecosystem simulation.")
-    parser.add_argument("--filename", type=str, default="recordings/simulation_data.json", help="The filename to save the simulation data to.")
+    parser.add_argument("--filename", type=str, default="recordings/simulation_data.eesrec", help="The filename to save the simulation data to.")
+    parser.add_argument("--codec", type=str, default="none", choices=[c.name.lower() for c in Codec], help="Compression of the recorded ticks.")
     args = parser.parse_args()
 
     simulator = EcosystemSimulator(
@@ -47,17 +49,16 @@ def main():
         )
     )
 
-    sim_recorder = SimulationRecorder(simulator)
     time_before = time.time()
     tick_count = 1000
-    for _ in range(tick_count):
-        simulator.next_simulation_tick()
+    # Ticks are written to the file while the simulation runs
+    with SimulationRecorder(simulator, filename=args.filename, codec=Codec[args.codec.upper()]):
+        for _ in range(tick_count):
+            simulator.next_simulation_tick()
 
     time_elapsed = time.time() - time_before
     print(f"Simulated {tick_count} more ticks in {round(time_elapsed, 2)} seconds.")
 
-    sim_recorder.saveJson(args.filename)
-
     # Uncomment to record
     #gif_recorder = EcosystemRecorder(simulator)
     #gif_recorder.record("ecosystem_simulation.gif")